@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -129,3 +130,14 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/3.1/howto/static-files/
 
 STATIC_URL = '/static/'
+
+# Reports are cached by document and config hash.
+# Set a file path to keep them in SQLite; None keeps them in memory of each process.
+RESULT_CACHE_PATH = None
+
+# The async upload view (served through asgi.py) checks papers in this many worker processes
+# and answers 429 once this many uploads are waiting or being checked.
+# Both hold per server worker process: a server running N workers checks up to N * CHECK_WORKERS
+# papers at once and accepts up to N * CHECK_QUEUE_LIMIT.
+CHECK_WORKERS = os.cpu_count()
+CHECK_QUEUE_LIMIT = 4 * CHECK_WORKERS
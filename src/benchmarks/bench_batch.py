@@ -0,0 +1,45 @@
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.fixtures import make_thesis
+from core import ctrl
+
+CONFIG = os.path.join(os.path.dirname(__file__), 'config.yaml')
+
+
+def main(n_files: int = 48, workers: int = os.cpu_count()):
+    with open(CONFIG, encoding='utf-8') as file:
+        config = file.read()
+    with tempfile.TemporaryDirectory() as tmp:
+        filenames = []
+        for i in range(n_files):
+            filenames.append(os.path.join(tmp, '{}.docx'.format(i)))
+            with open(filenames[-1], 'wb') as file:
+                file.write(make_thesis(1 + i % 5))
+        filenames.append(os.path.join(tmp, 'broken.docx'))
+        with open(filenames[-1], 'wb') as file:
+            file.write(b'not a zip')
+
+        start = time.perf_counter()
+        serial = {filename: ctrl.main(filename, config) for filename in filenames[:-1]}
+        serial_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        first = None
+        batch = {}
+        for filename, ans in ctrl.check_batch(filenames, config, workers):
+            if first is None:
+                first = time.perf_counter() - start
+            batch[filename] = ans
+        batch_time = time.perf_counter() - start
+
+    assert all(batch[filename] == ans for filename, ans in serial.items())
+    print('{} files, serial: {:.2f} s'.format(n_files, serial_time))
+    print('{} files, {} workers: {:.2f} s (first result after {:.2f} s)'.format(n_files, workers, batch_time, first))
+    print(batch[filenames[-1]].text())
+
+
+if __name__ == '__main__':
+    main(*(int(n) for n in sys.argv[1:]))
@@ -0,0 +1,72 @@
+import io
+import os
+import sys
+import timeit
+
+import yaml
+
+from benchmarks.fixtures import make_thesis
+from core.ctrl import Config
+from core.pp.elements import Para
+from core.pp.engines import docx_stream
+from core.pp.properties import PropNotMatched
+from core.scanner import check_formats, rules
+
+CONFIG = os.path.join(os.path.dirname(__file__), 'config.yaml')
+
+
+def classify_raising(ctx: check_formats.Context, para: Para) -> int:
+    fmt = ctx.fmt
+    candidates = fmt.heading_fmts + [fmt.label_fmt, fmt.conclusion_title_fmt, fmt.keywords_fmt]
+    for i, pure_para_prop in enumerate(candidates):
+        try:
+            check_formats.check_pure_para(ctx, para, pure_para_prop)
+        except PropNotMatched:
+            continue
+        return i
+    return -1
+
+
+def classify_fast(ctx: check_formats.Context, para: Para) -> int:
+    fmt = ctx.fmt
+    candidates = fmt.heading_fmts + [fmt.label_fmt, fmt.conclusion_title_fmt, fmt.keywords_fmt]
+    for i, pure_para_prop in enumerate(candidates):
+        if check_formats.match_pure_para(ctx, para, pure_para_prop) is not None:
+            return i
+    return -1
+
+
+def classify_dispatch(ctx: check_formats.Context, para: Para) -> int:
+    fmt = ctx.fmt
+    candidates = fmt.heading_fmts + [fmt.label_fmt, fmt.conclusion_title_fmt, fmt.keywords_fmt]
+    kinds = ctx.rules.lookup(para)
+    for i, name in enumerate(ctx.rules.heading_names + ('label', 'conclusion_title', 'keywords')):
+        if name in kinds and check_formats.match_pure_para(ctx, para, candidates[i]) is not None:
+            return i
+    return -1
+
+
+def main(n_chapters: int = 20):
+    with open(CONFIG, encoding='utf-8') as file:
+        config: Config = yaml.load(file, Loader=yaml.FullLoader)
+    doc = docx_stream.main(io.BytesIO(make_thesis(n_chapters)))
+    # purifies the paragraphs in place
+    check_formats.main(doc, config.formats)
+    ctx = check_formats.Context(config.formats)
+    paras = [p for p in doc if type(p) is Para]
+    expected = [classify_raising(ctx, p) for p in paras]
+    assert expected == [classify_fast(ctx, p) for p in paras] == [classify_dispatch(ctx, p) for p in paras]
+
+    for name, classify in (('raising', classify_raising), ('fast', classify_fast), ('dispatch', classify_dispatch)):
+        t = min(timeit.repeat(lambda: [classify(ctx, p) for p in paras], number=10, repeat=3)) / 10
+        print('{:>8}: {:>8.2f} us/para ({} paras)'.format(name, t / len(paras) * 1e6, len(paras)))
+
+    # a freshly loaded copy of the same template reuses the compiled rules
+    with open(CONFIG, encoding='utf-8') as file:
+        again: Config = yaml.load(file, Loader=yaml.FullLoader)
+    assert rules.compile_rules(again.formats) is ctx.rules
+    print('compiled rules: {}'.format(rules.compile_stats))
+
+
+if __name__ == '__main__':
+    main(*(int(n) for n in sys.argv[1:]))
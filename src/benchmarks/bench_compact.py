@@ -0,0 +1,38 @@
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from typing import Tuple
+
+from benchmarks.fixtures import make_thesis
+from core import ctrl
+from core.pp.engines import docx_stream
+
+CONFIG = os.path.join(os.path.dirname(__file__), 'config.yaml')
+
+
+def measure(kind: str, n_chapters: int) -> Tuple[str, int, float]:
+    # runs in a fresh process, so ru_maxrss is the peak of this representation alone
+    with open(CONFIG, encoding='utf-8') as file:
+        config = ctrl.load_config(file.read())
+    data = make_thesis(n_chapters)
+    start = time.perf_counter()
+    doc = docx_stream.main(data, compact=kind == 'compact').load()
+    ans = ctrl.check_doc(doc, config, collect_all=True).text()
+    elapsed = time.perf_counter() - start
+    return ans, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, elapsed
+
+
+def main(n_chapters: int = 400):
+    results = {}
+    for kind in ('list', 'compact'):
+        with multiprocessing.get_context('spawn').Pool(1) as pool:
+            results[kind] = pool.apply(measure, (kind, n_chapters))
+    assert results['list'][0] == results['compact'][0]
+    for kind, (_, max_rss, elapsed) in results.items():
+        print('{:>8}: peak RSS {:>7.1f} MB, parse and check {:>7.2f} s'.format(kind, max_rss / 1024, elapsed))
+
+
+if __name__ == '__main__':
+    main(*(int(n) for n in sys.argv[1:]))
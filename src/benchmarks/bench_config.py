@@ -0,0 +1,23 @@
+import os
+import sys
+import timeit
+
+from core import ctrl
+
+CONFIG = os.path.join(os.path.dirname(__file__), 'config.yaml')
+
+
+def main(number: int = 50):
+    with open(CONFIG, encoding='utf-8') as file:
+        yaml_str = file.read()
+    compiled = ctrl.compile_config(yaml_str)
+    assert type(ctrl.load_compiled_config(compiled)) is ctrl.Config
+
+    parse = min(timeit.repeat(lambda: ctrl.parse_config(yaml_str), number=number, repeat=3)) / number
+    load = min(timeit.repeat(lambda: ctrl.load_compiled_config(compiled), number=number, repeat=3)) / number
+    print('yaml:     {:>8.3f} ms ({} bytes)'.format(parse * 1e3, len(yaml_str.encode('utf-8'))))
+    print('compiled: {:>8.3f} ms ({} bytes)'.format(load * 1e3, len(compiled)))
+
+
+if __name__ == '__main__':
+    main(*(int(n) for n in sys.argv[1:]))
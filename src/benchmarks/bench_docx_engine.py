@@ -0,0 +1,26 @@
+import io
+import sys
+import timeit
+
+from benchmarks.fixtures import make_docx
+from core.pp.engines import docx, docx_stream
+
+
+def bench(engine, data: bytes, number: int, repeat: int) -> float:
+    # both engines read lazily, so the document is loaded to time the whole read
+    return min(timeit.repeat(lambda: engine.main(io.BytesIO(data)).load(), number=number, repeat=repeat)) / number
+
+
+def main(sizes=(50, 500, 5000)):
+    print('{:>8} {:>12} {:>12} {:>14} {:>14}'.format('paras', 'docx (s)', 'stream (s)', 'docx us/para', 'stream us/para'))
+    for n in sizes:
+        data = make_docx(n, n_sections=3)
+        number = max(1, 500 // n)
+        # the python-docx engine is quadratic, one round is enough for big documents
+        old = bench(docx, data, number, 3 if n <= 500 else 1)
+        new = bench(docx_stream, data, number, 3)
+        print('{:>8} {:>12.4f} {:>12.4f} {:>14.1f} {:>14.1f}'.format(n, old, new, old / n * 1e6, new / n * 1e6))
+
+
+if __name__ == '__main__':
+    main(tuple(int(n) for n in sys.argv[1:]) or (50, 500, 5000))
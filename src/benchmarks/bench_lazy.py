@@ -0,0 +1,44 @@
+import io
+import os
+import sys
+import timeit
+import zipfile
+
+from benchmarks.fixtures import make_thesis
+from core import ctrl
+from core.pp.elements import Doc
+from core.pp.engines import docx_stream
+
+CONFIG = os.path.join(os.path.dirname(__file__), 'config.yaml')
+
+
+def check_eager(data: bytes, config: ctrl.Config) -> str:
+    with zipfile.ZipFile(io.BytesIO(data)) as zip_file:
+        doc = docx_stream.get_doc(docx_stream.Package(zip_file))
+    return ctrl.check_doc(doc, config).text()
+
+
+def check_lazy(data: bytes, config: ctrl.Config) -> str:
+    return ctrl.check_doc(docx_stream.main(data), config).text()
+
+
+def main(n_chapters: int = 40):
+    with open(CONFIG, encoding='utf-8') as file:
+        yaml_str = file.read()
+    data = make_thesis(n_chapters)
+    # the cover fails with the first config, the last section with the second
+    early = ctrl.load_config(yaml_str.replace('margin_left: !Length {value: 2.8', 'margin_left: !Length {value: 2.5'))
+    late = ctrl.load_config(yaml_str.replace('thanks_title_content: 致谢', 'thanks_title_content: 谢辞'))
+    for name, config in (('early failure', early), ('late failure', late)):
+        assert check_eager(data, config) == check_lazy(data, config)
+        eager = min(timeit.repeat(lambda: check_eager(data, config), number=3, repeat=3)) / 3
+        lazy = min(timeit.repeat(lambda: check_lazy(data, config), number=3, repeat=3)) / 3
+        print('{:>13}: eager {:>7.1f} ms, lazy {:>7.1f} ms'.format(name, eager * 1e3, lazy * 1e3))
+
+    doc = docx_stream.main(data)
+    ctrl.check_doc(doc, early)
+    print('elements read for the early failure: {} of {}'.format(list.__len__(doc), len(Doc(doc))))
+
+
+if __name__ == '__main__':
+    main(*(int(n) for n in sys.argv[1:]))
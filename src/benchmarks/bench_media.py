@@ -0,0 +1,56 @@
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from typing import Tuple
+
+import docx as python_docx
+
+from benchmarks.fixtures import make_docx
+from core.pp.elements import LazyDoc
+from core.pp.engines import docx, docx_stream
+
+READERS = {
+    'python-docx, all parts': lambda filename: LazyDoc(docx.iter_doc(python_docx.Document(filename))),
+    'python-docx, no media': docx.main,
+    'python-docx, mapped': lambda filename: docx.main(filename, mapped=True),
+    'streaming, read into memory': lambda filename: docx_stream.main(open(filename, 'rb').read()),
+    'streaming': docx_stream.main,
+    'streaming, mapped': lambda filename: docx_stream.main(filename, mapped=True),
+}
+
+
+def measure(reader: str, filename: str) -> Tuple[int, int, float]:
+    # runs in a fresh process, so ru_maxrss is the peak of this reader alone
+    start = time.perf_counter()
+    doc = READERS[reader](filename).load()
+    elapsed = time.perf_counter() - start
+    return len(doc), resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, elapsed
+
+
+def write_fixture(filename: str, n_images: int, image_mb: int, n_paras: int):
+    with open(filename, 'wb') as file:
+        file.write(make_docx(n_paras, 2, n_images, image_mb * 1024 * 1024))
+
+
+def main(n_images: int = 40, image_mb: int = 2, n_paras: int = 500):
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, 'figures.docx')
+        # children start with the peak RSS of their parent, so the big fixture is built elsewhere
+        with context.Pool(1) as pool:
+            pool.apply(write_fixture, (filename, n_images, image_mb, n_paras))
+        print('{} paragraphs, {} images, {:.1f} MB file'.format(n_paras, n_images, os.path.getsize(filename) / 2 ** 20))
+        lengths = set()
+        for reader in READERS:
+            with context.Pool(1) as pool:
+                length, max_rss, elapsed = pool.apply(measure, (reader, filename))
+            lengths.add(length)
+            print('{:>27}: peak RSS {:>7.1f} MB, {:>6.2f} s'.format(reader, max_rss / 1024, elapsed))
+        assert len(lengths) == 1
+
+
+if __name__ == '__main__':
+    main(*(int(n) for n in sys.argv[1:]))
@@ -0,0 +1,56 @@
+import io
+import os
+import sys
+import timeit
+import zipfile
+
+from benchmarks.fixtures import make_thesis
+from core import ctrl
+from core.pp.engines import docx_stream
+
+CONFIG = os.path.join(os.path.dirname(__file__), 'config.yaml')
+
+
+def edit_docx(data: bytes, old: str, new: str) -> bytes:
+    out = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(data)) as src, zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as dst:
+        for info in src.infolist():
+            content = src.read(info.filename)
+            if info.filename == 'word/document.xml':
+                assert old.encode('utf-8') in content
+                content = content.replace(old.encode('utf-8'), new.encode('utf-8'), 1)
+            dst.writestr(info, content)
+    return out.getvalue()
+
+
+def main(n_chapters: int = 20):
+    with open(CONFIG, encoding='utf-8') as file:
+        config = ctrl.load_config(file.read())
+    first = make_thesis(n_chapters)
+    # the student renames one chapter and uploads again
+    second = edit_docx(first, '第2章 章标题', '第2章 新的标题')
+
+    full = min(timeit.repeat(lambda: ctrl.check(io.BytesIO(second), config, True), number=3, repeat=3)) / 3
+
+    # only the parsing is memoized: classification and both checks still run over the whole document
+    def memoized():
+        memo = docx_stream.ElementMemo()
+        ctrl.check(io.BytesIO(first), config, True, memo=memo)
+        hits, misses = memo.hits, memo.misses
+        start = timeit.default_timer()
+        ans = ctrl.check(io.BytesIO(second), config, True, memo=memo)
+        return timeit.default_timer() - start, ans, memo.misses - misses, memo.hits - hits + memo.misses - misses
+
+    # what fingerprinting costs a document seen for the first time
+    cold = min(timeit.repeat(lambda: ctrl.check(io.BytesIO(second), config, True, memo=docx_stream.ElementMemo()),
+                             number=3, repeat=3)) / 3
+
+    again, ans, rebuilt, total = min((memoized() for _ in range(3)), key=lambda t: t[0])
+    assert ans == ctrl.check(io.BytesIO(second), config, True)
+    print('full check:        {:>8.1f} ms'.format(full * 1e3))
+    print('first upload:      {:>8.1f} ms'.format(cold * 1e3))
+    print('memoized parse:    {:>8.1f} ms ({} of {} elements rebuilt)'.format(again * 1e3, rebuilt, total))
+
+
+if __name__ == '__main__':
+    main(*(int(n) for n in sys.argv[1:]))
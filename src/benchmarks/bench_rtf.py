@@ -0,0 +1,47 @@
+import os
+import sys
+import tempfile
+import timeit
+from collections import deque
+
+from benchmarks.fixtures import make_thesis, make_thesis_rtf
+from benchmarks.parity_odt import describe
+from core import ctrl
+from core.pp.engines import docx_stream, rtf
+
+CONFIG = os.path.join(os.path.dirname(__file__), 'config.yaml')
+
+
+def main(n_chapters: int = 200):
+    with open(CONFIG, encoding='utf-8') as file:
+        config = ctrl.load_config(file.read())
+    data = make_thesis_rtf(n_chapters)
+    docx_data = make_thesis(n_chapters)
+
+    # the same thesis read from RTF and from DOCX gives the same document and the same report
+    rtf_doc = rtf.main(data).load()
+    docx_doc = docx_stream.main(docx_data).load()
+    assert [describe(e) for e in rtf_doc] == [describe(e) for e in docx_doc]
+    assert ctrl.check_doc(rtf_doc, config, collect_all=True) == ctrl.check_doc(docx_doc, config, collect_all=True)
+
+    mb = len(data) / 2 ** 20
+    print('{} chapters, {:.1f} MB of RTF, {} elements'.format(n_chapters, mb, len(rtf_doc)))
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, 'thesis.rtf')
+        with open(filename, 'wb') as file:
+            file.write(data)
+        runs = (
+            ('tokenize', lambda: deque(rtf.tokenize(data), maxlen=0)),
+            ('read', lambda: rtf.main(data).load()),
+            ('read, mapped', lambda: rtf.main(filename, mapped=True).load()),
+            ('read and check', lambda: ctrl.check_doc(rtf.main(data), config)),
+        )
+        for name, run in runs:
+            elapsed = min(timeit.repeat(run, number=1, repeat=3))
+            print('{:>15}: {:>7.1f} ms, {:>6.1f} MB/s'.format(name, elapsed * 1e3, mb / elapsed))
+    elapsed = min(timeit.repeat(lambda: docx_stream.main(docx_data).load(), number=1, repeat=3))
+    print('{:>15}: {:>7.1f} ms for the same thesis'.format('DOCX read', elapsed * 1e3))
+
+
+if __name__ == '__main__':
+    main(*(int(n) for n in sys.argv[1:]))
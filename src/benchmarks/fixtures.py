@@ -0,0 +1,480 @@
+import io
+import os
+import re
+import zipfile
+from typing import List, Dict, Tuple
+from xml.sax.saxutils import escape
+
+ns_w = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+ns_m = 'http://schemas.openxmlformats.org/officeDocument/2006/math'
+ns_r = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+ns_wp = 'http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing'
+
+content_types = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Default Extension="png" ContentType="image/png"/>
+<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>
+<Override PartName="/word/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>
+<Override PartName="/word/header1.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.header+xml"/>
+<Override PartName="/word/footer1.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.footer+xml"/>
+</Types>'''
+
+package_rels = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>
+</Relationships>'''
+
+document_rels_head = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>
+<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/header" Target="header1.xml"/>
+<Relationship Id="rId3" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/footer" Target="footer1.xml"/>
+'''
+
+styles = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:styles xmlns:w="{w}">
+<w:docDefaults>
+<w:rPrDefault><w:rPr><w:rFonts w:ascii="Times New Roman" w:eastAsia="SimSun"/><w:sz w:val="21"/></w:rPr></w:rPrDefault>
+<w:pPrDefault><w:pPr><w:spacing w:line="240" w:lineRule="auto"/></w:pPr></w:pPrDefault>
+</w:docDefaults>
+<w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/>
+<w:pPr><w:jc w:val="both"/><w:spacing w:line="400" w:lineRule="exact"/></w:pPr>
+<w:rPr><w:rFonts w:ascii="Times New Roman" w:eastAsia="SimSun"/><w:sz w:val="24"/></w:rPr></w:style>
+<w:style w:type="paragraph" w:styleId="Heading1"><w:name w:val="heading 1"/><w:basedOn w:val="Normal"/>
+<w:pPr><w:jc w:val="center"/></w:pPr><w:rPr><w:rFonts w:eastAsia="SimHei"/><w:b/><w:sz w:val="32"/></w:rPr></w:style>
+<w:style w:type="paragraph" w:styleId="Heading2"><w:name w:val="heading 2"/><w:basedOn w:val="Heading1"/>
+<w:pPr><w:jc w:val="left"/></w:pPr><w:rPr><w:sz w:val="28"/></w:rPr></w:style>
+<w:style w:type="paragraph" w:styleId="Caption"><w:name w:val="caption"/><w:basedOn w:val="Normal"/>
+<w:pPr><w:jc w:val="center"/></w:pPr><w:rPr><w:rFonts w:eastAsia="SimHei"/><w:sz w:val="21"/></w:rPr></w:style>
+<w:style w:type="paragraph" w:styleId="Header"><w:name w:val="header"/><w:basedOn w:val="Normal"/>
+<w:pPr><w:jc w:val="center"/></w:pPr><w:rPr><w:sz w:val="18"/></w:rPr></w:style>
+<w:style w:type="paragraph" w:styleId="Heading3"><w:name w:val="heading 3"/><w:basedOn w:val="Heading2"/>
+<w:rPr><w:sz w:val="24"/></w:rPr></w:style>
+<w:style w:type="paragraph" w:styleId="Title"><w:name w:val="Title"/><w:basedOn w:val="Heading1"/>
+<w:rPr><w:sz w:val="36"/></w:rPr></w:style>
+<w:style w:type="paragraph" w:styleId="TitleNoNum"><w:name w:val="title without number"/><w:basedOn w:val="Heading1"/>
+<w:rPr><w:b w:val="0"/></w:rPr></w:style>
+<w:style w:type="paragraph" w:styleId="Keywords"><w:name w:val="key words"/><w:basedOn w:val="Normal"/>
+<w:pPr><w:jc w:val="left"/></w:pPr><w:rPr><w:rFonts w:eastAsia="SimHei"/></w:rPr></w:style>
+<w:style w:type="paragraph" w:styleId="Reference"><w:name w:val="reference"/><w:basedOn w:val="Normal"/>
+<w:rPr><w:sz w:val="21"/></w:rPr></w:style>
+<w:style w:type="character" w:default="1" w:styleId="DefaultParagraphFont"><w:name w:val="Default Paragraph Font"/></w:style>
+<w:style w:type="character" w:styleId="Strong"><w:name w:val="Strong"/><w:basedOn w:val="DefaultParagraphFont"/>
+<w:rPr><w:b/></w:rPr></w:style>
+<w:style w:type="table" w:default="1" w:styleId="TableNormal"><w:name w:val="Normal Table"/></w:style>
+</w:styles>'''.format(w=ns_w)
+
+header = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:hdr xmlns:w="{w}"><w:p><w:pPr><w:pStyle w:val="Header"/></w:pPr><w:r><w:t>Bachelor Thesis</w:t></w:r></w:p></w:hdr>
+'''.format(w=ns_w)
+
+footer = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:ftr xmlns:w="{w}"><w:p><w:pPr><w:pStyle w:val="Header"/></w:pPr><w:r><w:t>1</w:t></w:r></w:p></w:ftr>
+'''.format(w=ns_w)
+
+sect_pr = '''<w:sectPr><w:headerReference w:type="default" r:id="rId2"/><w:footerReference w:type="default" r:id="rId3"/>
+<w:pgSz w:w="11906" w:h="16838"/>
+<w:pgMar w:top="1985" w:right="1304" w:bottom="1531" w:left="1588" w:header="1417" w:footer="1134" w:gutter="0"/></w:sectPr>'''
+
+png = bytes.fromhex(
+    '89504e470d0a1a0a0000000d4948445200000001000000010806000000'
+    '1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082'
+)
+
+
+def run(text: str, bold: bool = False, style: str = '') -> str:
+    rpr = ''
+    if bold or style:
+        rpr = '<w:rPr>{}{}</w:rPr>'.format(
+            '<w:rStyle w:val="{}"/>'.format(style) if style else '',
+            '<w:b/>' if bold else '',
+        )
+    return '<w:r>{}<w:t xml:space="preserve">{}</w:t></w:r>'.format(rpr, text)
+
+
+def para(body: str, style: str = '', extra_ppr: str = '') -> str:
+    ppr = ''
+    if style or extra_ppr:
+        ppr = '<w:pPr>{}{}</w:pPr>'.format('<w:pStyle w:val="{}"/>'.format(style) if style else '', extra_ppr)
+    return '<w:p>{}{}</w:p>'.format(ppr, body)
+
+
+def drawing(rid: str) -> str:
+    return ('<w:r><w:drawing><wp:inline><wp:extent cx="914400" cy="914400"/>'
+            '<a:graphic xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main">'
+            '<a:graphicData><pic:pic xmlns:pic="http://schemas.openxmlformats.org/drawingml/2006/picture">'
+            '<pic:blipFill><a:blip r:embed="{}"/></pic:blipFill></pic:pic></a:graphicData></a:graphic>'
+            '</wp:inline></w:drawing></w:r>').format(rid)
+
+
+def table(n_rows: int, n_cols: int) -> str:
+    rows = ''.join(
+        '<w:tr>{}</w:tr>'.format(''.join(
+            '<w:tc>{}</w:tc>'.format(para(run('cell {} {}'.format(i, j)))) for j in range(n_cols)
+        )) for i in range(n_rows)
+    )
+    return '<w:tbl><w:tblPr><w:jc w:val="center"/></w:tblPr>{}</w:tbl>'.format(rows)
+
+
+def make_body(n_paras: int, n_sections: int = 1, n_images: int = 0) -> List[str]:
+    body: List[str] = list()
+    per_section = max(1, n_paras // n_sections)
+    image = 0
+    for i in range(n_paras):
+        if i % 50 == 0:
+            page_break = '<w:r><w:br w:type="page"/></w:r>' if i > 0 else ''
+            body.append(para(page_break + run('Chapter {}'.format(i // 50 + 1)), style='Heading1'))
+        elif i % 10 == 0:
+            body.append(para(run('Section {}'.format(i // 10)), style='Heading2'))
+        elif n_images and i % max(1, n_paras // n_images) == 1 and image < n_images:
+            image += 1
+            body.append(para(drawing('rIdImg{}'.format(image)), style='Caption'))
+        elif i % 25 == 7:
+            body.append(table(3, 3))
+        elif i % 17 == 3:
+            body.append(para(''))
+        else:
+            body.append(para(
+                run('Paragraph {} starts here, '.format(i)) + run('continues with a second run ')
+                + run('strong', style='Strong') + run(' and ends plainly.')
+                + ('<m:oMath><m:r><m:t>x</m:t></m:r></m:oMath>' if i % 13 == 5 else '')
+            ))
+        if (i + 1) % per_section == 0 and i + 1 < n_paras and (i + 1) // per_section < n_sections:
+            body.append(para('', extra_ppr=sect_pr))
+    return body
+
+
+def make_docx(n_paras: int, n_sections: int = 1, n_images: int = 0, image_size: int = 0) -> bytes:
+    body = make_body(n_paras, n_sections, n_images)
+    document = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<w:document xmlns:w="{}" xmlns:m="{}" xmlns:r="{}" xmlns:wp="{}"><w:body>{}{}</w:body></w:document>'
+                ).format(ns_w, ns_m, ns_r, ns_wp, ''.join(body), sect_pr)
+    document_rels = document_rels_head + ''.join(
+        '<Relationship Id="rIdImg{0}" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/image" '
+        'Target="media/image{0}.png"/>\n'.format(i + 1) for i in range(n_images)
+    ) + '</Relationships>'
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as package:
+        package.writestr('[Content_Types].xml', content_types)
+        package.writestr('_rels/.rels', package_rels)
+        package.writestr('word/document.xml', document)
+        package.writestr('word/_rels/document.xml.rels', document_rels)
+        package.writestr('word/styles.xml', styles)
+        package.writestr('word/header1.xml', header)
+        package.writestr('word/footer1.xml', footer)
+        for i in range(n_images):
+            # incompressible padding keeps the zip member as large as a real scan
+            package.writestr('word/media/image{}.png'.format(i + 1), png + os.urandom(image_size))
+    return buffer.getvalue()
+
+
+# a thesis in a neutral form: ('para', style, [(text, character style)], page break before), ('empty',),
+# ('section',) for a section break, ('drawing',) and ('table', rows, columns); written out by make_thesis*
+Outline = List[tuple]
+
+
+def thesis_outline(n_chapters: int = 3, n_sections: int = 2, n_paras: int = 5) -> Outline:
+    def p(text: str, style: str = '', page_break: bool = False) -> tuple:
+        return 'para', style, [(text, '')], page_break
+
+    empty = ('empty',)
+    section_break = ('section',)
+
+    body: Outline = list()
+    body += [p('北京理工大学本科生毕业设计（论文）'), section_break]
+    body += [p('原创性声明'), p('本人郑重声明……'), section_break]
+
+    body += [p('论文题目', 'Title'), p('摘  要', 'Heading1')]
+    body += [p('摘要正文第{}段。'.format(i + 1)) for i in range(3)]
+    body += [empty, p('关键词：格式；检查', 'Keywords'), empty, section_break]
+
+    body += [p('Thesis Title', 'Title'), empty, p('Abstract', 'Heading1')]
+    body += [p('Abstract paragraph {}.'.format(i + 1)) for i in range(3)]
+    body += [empty, p('Key Words: format; check', 'Keywords'), empty, section_break]
+
+    body += [p('目  录', 'Heading1')]
+    body += [p('第{}章 标题'.format(i + 1)) for i in range(n_chapters)]
+    body.append(section_break)
+
+    for i in range(1, n_chapters + 1):
+        body.append(p('第{}章 章标题'.format(i), 'Heading1', page_break=i > 1))
+        body += [p('第{}章引言第{}段。'.format(i, k + 1)) for k in range(n_paras)]
+        for j in range(1, n_sections + 1):
+            body.append(p('{}.{} 节标题'.format(i, j), 'Heading2'))
+            body += [('para', '', [('第{}节正文第{}段，'.format(j, k + 1), ''), ('重点', 'Strong'), ('。', '')], False)
+                     for k in range(n_paras)]
+            body.append(p('{}.{}.1 小节标题'.format(i, j), 'Heading3'))
+            body += [p('小节正文第{}段。'.format(k + 1)) for k in range(n_paras)]
+            body += [empty, ('drawing',), p('图{}-{} 示意图'.format(i, j), 'Caption'), empty]
+            body += [empty, p('表{}-{} 数据表'.format(i, j), 'Caption'), ('table', 3, 3), empty]
+            body += [p('图表之后的正文。')]
+
+    body += [empty, p('结  论', 'TitleNoNum')]
+    body += [p('结论正文第{}段。'.format(k + 1)) for k in range(n_paras)]
+    body += [empty, p('参考文献', 'TitleNoNum')]
+    body += [p('[{}] 作者. 文献题名[J]. 刊名, 2021.'.format(k + 1), 'Reference') for k in range(n_paras)]
+    body += [empty, p('附录A 程序清单', 'TitleNoNum')]
+    body += [p('附录正文第{}段。'.format(k + 1)) for k in range(n_paras)]
+    body += [empty, p('致  谢', 'TitleNoNum')]
+    body += [p('感谢第{}位老师。'.format(k + 1)) for k in range(n_paras)]
+    return body
+
+
+def broken_outlines(n_chapters: int = 3) -> Dict[str, Outline]:
+    # theses a checker meets in practice, each breaking the front matter in one way
+    def restyle(outline: Outline, text: str, style: str) -> Outline:
+        return [('para', style) + item[2:] if item[0] == 'para' and item[2][0][0] == text else item
+                for item in outline]
+
+    outline = thesis_outline(n_chapters)
+    statements = outline.index(('para', '', [('本人郑重声明……', '')], False))
+    return {
+        'key words in the body style': restyle(outline, '关键词：格式；检查', ''),
+        'abstract styled as key words': restyle(restyle(outline, '摘要正文第2段。', 'Keywords'),
+                                                'Abstract paragraph 2.', 'Heading3'),
+        'no section break after the statements': outline[:statements + 1] + outline[statements + 2:],
+    }
+
+
+def make_thesis(n_chapters: int = 3, n_sections: int = 2, n_paras: int = 5) -> bytes:
+    return write_thesis(thesis_outline(n_chapters, n_sections, n_paras))
+
+
+def write_thesis(outline: Outline) -> bytes:
+    body: List[str] = list()
+    for item in outline:
+        if item[0] == 'para':
+            _, style, runs, page_break = item
+            body.append(para(('<w:r><w:br w:type="page"/></w:r>' if page_break else '')
+                             + ''.join(run(text, style=char_style) for text, char_style in runs), style=style))
+        elif item[0] == 'empty':
+            body.append(para(''))
+        elif item[0] == 'section':
+            body.append(para('', extra_ppr=sect_pr))
+        elif item[0] == 'drawing':
+            body.append(para(drawing('rId2'), style='Caption'))
+        elif item[0] == 'table':
+            body.append(table(item[1], item[2]))
+
+    document = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<w:document xmlns:w="{}" xmlns:m="{}" xmlns:r="{}" xmlns:wp="{}"><w:body>{}{}</w:body></w:document>'
+                ).format(ns_w, ns_m, ns_r, ns_wp, ''.join(body), sect_pr)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as package:
+        package.writestr('[Content_Types].xml', content_types)
+        package.writestr('_rels/.rels', package_rels)
+        package.writestr('word/document.xml', document)
+        package.writestr('word/_rels/document.xml.rels', document_rels_head + '</Relationships>')
+        package.writestr('word/styles.xml', styles)
+        package.writestr('word/header1.xml', header)
+        package.writestr('word/footer1.xml', footer)
+    return buffer.getvalue()
+
+
+odt_namespaces = ' '.join('xmlns:{}="urn:oasis:names:tc:opendocument:xmlns:{}"'.format(prefix, name) for prefix, name in (
+    ('office', 'office:1.0'), ('style', 'style:1.0'), ('text', 'text:1.0'), ('table', 'table:1.0'),
+    ('draw', 'drawing:1.0'), ('fo', 'xsl-fo-compatible:1.0'), ('svg', 'svg-compatible:1.0'),
+)) + ' xmlns:xlink="http://www.w3.org/1999/xlink" office:version="1.3"'
+
+odt_manifest = '''<?xml version="1.0" encoding="UTF-8"?>
+<manifest:manifest xmlns:manifest="urn:oasis:names:tc:opendocument:xmlns:manifest:1.0" manifest:version="1.3">
+<manifest:file-entry manifest:full-path="/" manifest:media-type="application/vnd.oasis.opendocument.text"/>
+<manifest:file-entry manifest:full-path="content.xml" manifest:media-type="text/xml"/>
+<manifest:file-entry manifest:full-path="styles.xml" manifest:media-type="text/xml"/>
+<manifest:file-entry manifest:full-path="Pictures/image1.png" manifest:media-type="image/png"/>
+</manifest:manifest>'''
+
+odt_fonts = '''<office:font-face-decls>
+<style:font-face style:name="Times New Roman" svg:font-family="&apos;Times New Roman&apos;"/>
+<style:font-face style:name="SimSun" svg:font-family="SimSun"/>
+<style:font-face style:name="SimHei" svg:font-family="SimHei"/>
+</office:font-face-decls>'''
+
+# the DOCX styles above, with lengths in points so that both read back to the same EMUs
+odt_styles = '''<?xml version="1.0" encoding="UTF-8"?>
+<office:document-styles {ns}>{fonts}
+<office:styles>
+<style:default-style style:family="paragraph"><style:paragraph-properties fo:line-height="100%"/>
+<style:text-properties style:font-name="Times New Roman" style:font-name-asian="SimSun" fo:font-size="10.5pt"/>
+</style:default-style>
+<style:style style:name="Standard" style:family="paragraph">
+<style:paragraph-properties fo:text-align="justify" fo:line-height="20pt"/>
+<style:text-properties style:font-name="Times New Roman" style:font-name-asian="SimSun" fo:font-size="12pt"/></style:style>
+<style:style style:name="Heading_20_1" style:display-name="Heading 1" style:family="paragraph"
+ style:parent-style-name="Standard"><style:paragraph-properties fo:text-align="center"/>
+<style:text-properties style:font-name-asian="SimHei" fo:font-weight="bold" fo:font-size="16pt"/></style:style>
+<style:style style:name="Heading_20_2" style:display-name="Heading 2" style:family="paragraph"
+ style:parent-style-name="Heading_20_1"><style:paragraph-properties fo:text-align="start"/>
+<style:text-properties fo:font-size="14pt"/></style:style>
+<style:style style:name="Caption" style:family="paragraph" style:parent-style-name="Standard">
+<style:paragraph-properties fo:text-align="center"/>
+<style:text-properties style:font-name-asian="SimHei" fo:font-size="10.5pt"/></style:style>
+<style:style style:name="Header" style:family="paragraph" style:parent-style-name="Standard">
+<style:paragraph-properties fo:text-align="center"/><style:text-properties fo:font-size="9pt"/></style:style>
+<style:style style:name="Heading_20_3" style:display-name="Heading 3" style:family="paragraph"
+ style:parent-style-name="Heading_20_2"><style:text-properties fo:font-size="12pt"/></style:style>
+<style:style style:name="Title" style:family="paragraph" style:parent-style-name="Heading_20_1">
+<style:text-properties fo:font-size="18pt"/></style:style>
+<style:style style:name="TitleNoNum" style:family="paragraph" style:parent-style-name="Heading_20_1">
+<style:text-properties fo:font-weight="normal"/></style:style>
+<style:style style:name="Keywords" style:family="paragraph" style:parent-style-name="Standard">
+<style:paragraph-properties fo:text-align="start"/><style:text-properties style:font-name-asian="SimHei"/></style:style>
+<style:style style:name="Reference" style:family="paragraph" style:parent-style-name="Standard">
+<style:text-properties fo:font-size="10.5pt"/></style:style>
+<style:style style:name="Strong" style:family="text"><style:text-properties fo:font-weight="bold"/></style:style>
+</office:styles>
+<office:automatic-styles>
+<style:page-layout style:name="pm1">
+<style:page-layout-properties fo:page-width="595.3pt" fo:page-height="841.9pt" fo:margin-top="70.85pt"
+ fo:margin-bottom="56.7pt" fo:margin-left="79.4pt" fo:margin-right="65.2pt"/>
+<style:header-style><style:header-footer-properties fo:min-height="28.4pt" fo:margin-bottom="0pt"/></style:header-style>
+<style:footer-style><style:header-footer-properties fo:min-height="19.85pt" fo:margin-top="0pt"/></style:footer-style>
+</style:page-layout>
+</office:automatic-styles>
+<office:master-styles>
+<style:master-page style:name="Standard" style:page-layout-name="pm1">
+<style:header><text:p text:style-name="Header">Bachelor Thesis</text:p></style:header>
+<style:footer><text:p text:style-name="Header">1</text:p></style:footer>
+</style:master-page>
+</office:master-styles>
+</office:document-styles>'''.format(ns=odt_namespaces, fonts=odt_fonts)
+
+odt_style_names: Dict[str, str] = {
+    '': 'Standard',
+    'Heading1': 'Heading_20_1',
+    'Heading2': 'Heading_20_2',
+    'Heading3': 'Heading_20_3',
+}
+
+
+def odt_text(text: str) -> str:
+    # ODF collapses runs of spaces, the second and later ones are written as text:s
+    return re.sub('  +', lambda m: ' <text:s text:c="{}"/>'.format(len(m.group()) - 1), escape(text))
+
+
+def make_thesis_odt(n_chapters: int = 3, n_sections: int = 2, n_paras: int = 5) -> bytes:
+    # automatic styles for paragraphs that start a page, by (parent style, page break, master page)
+    automatic: Dict[Tuple[str, bool, bool], str] = dict()
+
+    def style_name(style: str, page_break: bool, new_page: bool) -> str:
+        name = odt_style_names.get(style, style)
+        if not page_break and not new_page:
+            return name
+        key = name, page_break, new_page
+        if key not in automatic:
+            automatic[key] = 'P{}'.format(len(automatic) + 1)
+        return automatic[key]
+
+    body: List[str] = list()
+    n_tables = 0
+    # the first paragraph and the one after each section break start the page style again
+    new_page = True
+    for item in thesis_outline(n_chapters, n_sections, n_paras):
+        if item[0] == 'section':
+            new_page = True
+            continue
+        if item[0] == 'para':
+            _, style, runs, page_break = item
+            body.append('<text:p text:style-name="{}">{}</text:p>'.format(
+                style_name(style, page_break, new_page), ''.join(
+                    odt_text(text) if not char_style else
+                    '<text:span text:style-name="{}">{}</text:span>'.format(char_style, odt_text(text))
+                    for text, char_style in runs)))
+        elif item[0] == 'empty':
+            body.append('<text:p text:style-name="{}"/>'.format(style_name('', False, new_page)))
+        elif item[0] == 'drawing':
+            body.append('<text:p text:style-name="{}"><draw:frame draw:name="Image{}" text:anchor-type="as-char" '
+                        'svg:width="2.54cm" svg:height="2.54cm"><draw:image xlink:href="Pictures/image1.png"/>'
+                        '</draw:frame></text:p>'.format(style_name('Caption', False, new_page), len(body)))
+        elif item[0] == 'table':
+            n_tables += 1
+            rows = ''.join('<table:table-row>{}</table:table-row>'.format(''.join(
+                '<table:table-cell office:value-type="string"><text:p text:style-name="Standard">cell {} {}'
+                '</text:p></table:table-cell>'.format(i, j) for j in range(item[2]))) for i in range(item[1]))
+            body.append('<table:table table:name="Table{}" table:style-name="Table"><table:table-column '
+                        'table:number-columns-repeated="{}"/>{}</table:table>'.format(n_tables, item[2], rows))
+        new_page = False
+
+    automatic_styles = ''.join(
+        '<style:style style:name="{}" style:family="paragraph" style:parent-style-name="{}"{}>{}</style:style>'.format(
+            name, parent, ' style:master-page-name="Standard"' if new_page else '',
+            '<style:paragraph-properties fo:break-before="page"/>' if page_break else '')
+        for (parent, page_break, new_page), name in automatic.items())
+    content = ('<?xml version="1.0" encoding="UTF-8"?><office:document-content {}>{}<office:automatic-styles>'
+               '<style:style style:name="Table" style:family="table"><style:table-properties table:align="center"/>'
+               '</style:style>{}</office:automatic-styles><office:body><office:text>{}</office:text></office:body>'
+               '</office:document-content>').format(odt_namespaces, odt_fonts, automatic_styles, ''.join(body))
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as package:
+        # the media type comes first and uncompressed, as ODF requires
+        package.writestr(zipfile.ZipInfo('mimetype'), 'application/vnd.oasis.opendocument.text')
+        package.writestr('META-INF/manifest.xml', odt_manifest)
+        package.writestr('content.xml', content)
+        package.writestr('styles.xml', odt_styles)
+        package.writestr('Pictures/image1.png', png)
+    return buffer.getvalue()
+
+
+# the DOCX styles above written out on every paragraph, as Word writes RTF
+rtf_formats: Dict[str, str] = {
+    '': r'\qj\sl-400\slmult0\f0\dbch\af1\fs24',
+    'Heading1': r'\qc\sl-400\slmult0\f0\dbch\af2\b\fs32',
+    'Heading2': r'\ql\sl-400\slmult0\f0\dbch\af2\b\fs28',
+    'Heading3': r'\ql\sl-400\slmult0\f0\dbch\af2\b\fs24',
+    'Caption': r'\qc\sl-400\slmult0\f0\dbch\af2\fs21',
+    'Header': r'\qc\sl-400\slmult0\f0\dbch\af1\fs18',
+    'Title': r'\qc\sl-400\slmult0\f0\dbch\af2\b\fs36',
+    'TitleNoNum': r'\qc\sl-400\slmult0\f0\dbch\af2\b0\fs32',
+    'Keywords': r'\ql\sl-400\slmult0\f0\dbch\af2\fs24',
+    'Reference': r'\qj\sl-400\slmult0\f0\dbch\af1\fs21',
+    'Strong': r'\b',
+}
+
+rtf_head = (r'{\rtf1\ansi\ansicpg936\deff0\stshfdbch1'
+            r'{\fonttbl{\f0\froman\fcharset0 Times New Roman;}{\f1\fnil\fcharset134 SimSun;}'
+            r'{\f2\fnil\fcharset134 SimHei{\*\falt \'ba\'da\'cc\'e5};}}'
+            r'{\*\generator benchmarks.fixtures;}'
+            '\n\\paperw11906\\paperh16838\\margl1588\\margr1304\\margt1985\\margb1531\n')
+
+rtf_section = (r'\sectd\headery1417\footery1134'
+               r'{\header\pard\plain ' + rtf_formats['Header'] + r' Bachelor Thesis\par}'
+               r'{\footer\pard\plain ' + rtf_formats['Header'] + r' 1\par}' + '\n')
+
+
+def rtf_text(text: str) -> str:
+    ans = ''
+    for c in text:
+        if c in '\\{}':
+            ans += '\\' + c
+        elif ord(c) < 128:
+            ans += c
+        else:
+            ans += '\\u{}?'.format(ord(c) if ord(c) < 32768 else ord(c) - 65536)
+    return ans
+
+
+def make_thesis_rtf(n_chapters: int = 3, n_sections: int = 2, n_paras: int = 5) -> bytes:
+    body: List[str] = [rtf_head, rtf_section]
+    for item in thesis_outline(n_chapters, n_sections, n_paras):
+        if item[0] == 'para':
+            _, style, runs, page_break = item
+            body.append(r'\pard\plain {} {}{}\par'.format(rtf_formats[style], r'\page ' if page_break else '', ''.join(
+                rtf_text(text) if not char_style else '{{{} {}}}'.format(rtf_formats[char_style], rtf_text(text))
+                for text, char_style in runs)) + '\n')
+        elif item[0] == 'empty':
+            body.append(r'\pard\plain {}\par'.format(rtf_formats['']) + '\n')
+        elif item[0] == 'section':
+            body.append('\\sect' + rtf_section)
+        elif item[0] == 'drawing':
+            body.append(r'\pard\plain {} {{\*\shppict{{\pict\pngblip\picw1\pich1 {}}}}}{{\nonshppict{{\pict\wmetafile8 '
+                        r'0100}}}}\par'.format(rtf_formats['Caption'], png.hex()) + '\n')
+        elif item[0] == 'table':
+            row_def = r'\trowd\trqc' + ''.join(r'\cellx{}'.format(3000 * (j + 1)) for j in range(item[2]))
+            for i in range(item[1]):
+                body.append(row_def + ''.join(r'\pard\plain\intbl {} cell {} {}\cell'.format(rtf_formats[''], i, j)
+                                              for j in range(item[2])) + r'\row' + '\n')
+    body.append('}')
+    return ''.join(body).encode('ascii')
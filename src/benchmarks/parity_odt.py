@@ -0,0 +1,69 @@
+import os
+import sys
+import timeit
+from typing import Any
+
+from benchmarks.fixtures import make_thesis, make_thesis_odt
+from core import ctrl
+from core.pp.elements import *
+from core.pp.engines import docx_stream, odt
+
+CONFIG = os.path.join(os.path.dirname(__file__), 'config.yaml')
+
+
+def describe(e: Any) -> Any:
+    # properties are interned, so equal properties read by either engine are the same object
+    if isinstance(e, MasterPage):
+        return ('master page', e.page_layout, describe(e.header), describe(e.footer),
+                e.header_first is e.header, describe(e.footer_first))
+    if isinstance(e, Table):
+        return 'table', e.prop, [[[describe(p) for p in cell] for cell in row] for row in e]
+    if isinstance(e, (Header, Footer)):
+        return type(e).__name__, [describe(p) for p in e]
+    if isinstance(e, Para):
+        return type(e).__name__, e.prop, [describe(x) for x in e]
+    if isinstance(e, Span):
+        return str(e), e.prop
+    if isinstance(e, Frame):
+        return e.anchor_type, type(e.obj).__name__
+    return type(e).__name__, str(e)
+
+
+def main(n_chapters: int = 3):
+    with open(CONFIG, encoding='utf-8') as file:
+        yaml_str = file.read()
+    docx_data = make_thesis(n_chapters)
+    odt_data = make_thesis_odt(n_chapters)
+
+    docx_doc = docx_stream.main(docx_data).load()
+    for odt_doc in (odt.main(odt_data).load(), odt.main(odt_data, compact=True)):
+        assert len(docx_doc) == len(odt_doc), (len(docx_doc), len(odt_doc))
+        for i, (a, b) in enumerate(zip(docx_doc, odt_doc)):
+            assert describe(a) == describe(b), (i, describe(a), describe(b))
+    print('{} elements read alike from DOCX and ODT'.format(len(docx_doc)))
+
+    # a config that passes, one failing on the page layout, one failing on the contents and one where no
+    # chapter title matches
+    configs = (
+        ('passing', yaml_str),
+        ('page layout', yaml_str.replace('margin_left: !Length {value: 2.8', 'margin_left: !Length {value: 2.5')),
+        ('contents', yaml_str.replace('thanks_title_content: 致谢', 'thanks_title_content: 谢辞')),
+        ('chapters', yaml_str.replace('    - *heading1\n', '    - !PureParagraphProperty\n'
+                                      '      para_prop: !ParagraphProperty {align: center}\n'
+                                      '      text_prop: !TextProperty\n'
+                                      '        font: !Font {name_asia: SimHei, size: !Length {value: 17, unit: pt}, weight: bold}\n')),
+    )
+    for name, config_str in configs:
+        config = ctrl.load_config(config_str)
+        docx_report = ctrl.check_doc(docx_stream.main(docx_data), config, collect_all=True)
+        odt_report = ctrl.check_doc(odt.main(odt_data), config, collect_all=True)
+        assert docx_report == odt_report, (name, docx_report, odt_report)
+        print('{:>11}: same report, {} violations'.format(name, len(odt_report.violations)))
+
+    docx_time = min(timeit.repeat(lambda: docx_stream.main(docx_data).load(), number=3, repeat=3)) / 3
+    odt_time = min(timeit.repeat(lambda: odt.main(odt_data).load(), number=3, repeat=3)) / 3
+    print('read: DOCX {:.1f} ms, ODT {:.1f} ms'.format(docx_time * 1e3, odt_time * 1e3))
+
+
+if __name__ == '__main__':
+    main(*(int(n) for n in sys.argv[1:]))
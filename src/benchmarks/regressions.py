@@ -0,0 +1,96 @@
+import io
+import os
+import tempfile
+import warnings
+import zipfile
+
+from benchmarks.fixtures import broken_outlines, write_thesis, make_thesis, make_thesis_odt, make_thesis_rtf, make_docx
+from core import cli, ctrl
+from core.pp.engines import docx
+from core.pp.elements import Para, Span
+from core.pp.properties import Font, TextProp, ParaProp, Length
+from core.scanner import check_formats
+
+CONFIG = os.path.join(os.path.dirname(__file__), 'config.yaml')
+
+
+def load_config() -> ctrl.Config:
+    with open(CONFIG, encoding='utf-8') as file:
+        return ctrl.load_config(file.read())
+
+
+def span(text: str, prop: TextProp) -> Span:
+    ans = Span(text)
+    ans.prop = prop
+    return ans
+
+
+def check_span_merging():
+    # properties are interned by exact value, but spans a rounding error apart still read as one
+    ctx = check_formats.Context(load_config().formats)
+    para = Para(ParaProp(align='justify'))
+    para.append(span('正文', TextProp(Font(name_asia='SimSun', size=Length(12, 'pt')))))
+    para.append(span('内容', TextProp(Font(name_asia='SimSun', size=Length(12.004, 'pt')))))
+    para.append(span('加粗', TextProp(Font(name_asia='SimSun', size=Length(12, 'pt'), weight='bold'))))
+    ans = check_formats.purify(ctx, para)
+    assert [str(s) for s in ans] == ['正文内容', '加粗'], ans
+    assert ans[0].prop.font.size.value == 12
+    print('span merging: lengths within the tolerance merge, other properties do not')
+
+
+def check_broken_front_matter():
+    # collecting every violation must not crash where stopping at the first one doesn't,
+    # and it finds that first one too
+    config = load_config()
+    for name, outline in broken_outlines().items():
+        data = write_thesis(outline)
+        first = ctrl.check(io.BytesIO(data), config)
+        every = ctrl.check(io.BytesIO(data), config, collect_all=True)
+        assert len(first.violations) == 1 and every.violations[0] == first.violations[0], (name, first, every)
+        print('{}: {} violations'.format(name, len(every.violations)))
+
+
+def check_other_formats():
+    # uploads and the command line tool reach the ODT and RTF engines by the content of the file
+    config = load_config()
+    theses = {'thesis.docx': make_thesis(), 'thesis.odt': make_thesis_odt(), 'thesis.rtf': make_thesis_rtf()}
+    with tempfile.TemporaryDirectory() as root:
+        for name, data in theses.items():
+            filename = os.path.join(root, name)
+            with open(filename, 'wb') as file:
+                file.write(data)
+            assert ctrl.file_type(filename) == ctrl.file_type(data) == name.split('.')[1], name
+            for source in filename, data, io.BytesIO(data):
+                ans = ctrl.check(source, config, collect_all=True)
+                assert ans.violations == [], (name, ans)
+        assert [os.path.basename(f) for f in cli.find_docx(root)] == sorted(theses)
+    print('other formats: {} checked without violations'.format(', '.join(theses)))
+
+
+def check_shared_parts():
+    # a header that two sections point to is copied into the package python-docx reads once
+    out = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(make_docx(20)), 'r') as src, zipfile.ZipFile(out, 'w') as dst:
+        for info in src.infolist():
+            content = src.read(info.filename)
+            if info.filename == 'word/_rels/document.xml.rels':
+                content = content.replace(b'</Relationships>', b'<Relationship Id="rId9" Type="http://schemas.'
+                                          b'openxmlformats.org/officeDocument/2006/relationships/header" '
+                                          b'Target="header1.xml"/></Relationships>')
+            dst.writestr(info, content)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        doc = docx.main(io.BytesIO(out.getvalue())).load()
+    assert len(doc) > 0
+    print('shared parts: copied once')
+
+
+def main():
+    check_span_merging()
+    check_broken_front_matter()
+    check_other_formats()
+    check_shared_parts()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+import io
+import os
+import random
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fixtures import make_thesis, write_thesis, broken_outlines
+from core import ctrl
+
+CONFIG = os.path.join(os.path.dirname(__file__), 'config.yaml')
+
+# each variant breaks a different rule, so every (document, config) pair has its own answer
+MUTATIONS = (
+    ('', ''),
+    ('{value: 14, unit: pt}, weight: bold', '{value: 15, unit: pt}, weight: bold'),
+    ('{value: 10.5, unit: pt}}\n  picture', '{value: 11, unit: pt}}\n  picture'),
+    ('关键词：', '关键字：'),
+    ('margin_left: !Length {value: 2.8', 'margin_left: !Length {value: 2.5'),
+    ('第{}章', 'Chapter {}'),
+    ('{value: 16, unit: pt}, weight: normal', '{value: 16, unit: pt}, weight: bold'),
+    # no chapter title matches, so no chapter is open when the body goes on
+    ('    - *heading1\n', '    - !PureParagraphProperty\n'
+                         '      para_prop: !ParagraphProperty {align: center}\n'
+                         '      text_prop: !TextProperty\n'
+                         '        font: !Font {name_asia: SimHei, size: !Length {value: 17, unit: pt}, weight: bold}\n'),
+)
+
+
+def main(n_threads: int = 32, rounds: int = 4) -> int:
+    with open(CONFIG, encoding='utf-8') as file:
+        config = file.read()
+    configs = [config.replace(a, b, 1) for a, b in MUTATIONS]
+    docs = [make_thesis(n_chapters) for n_chapters in (1, 2, 3)]
+    docs += [write_thesis(outline) for outline in broken_outlines(1).values()]
+    jobs = [(d, c, collect_all) for d in range(len(docs)) for c in range(len(configs)) for collect_all in (False, True)]
+
+    def run(job) -> str:
+        d, c, collect_all = job
+        return ctrl.main(io.BytesIO(docs[d]), configs[c], collect_all).text()
+
+    # a crash here is a bug, not an answer to compare against
+    expected = {job: run(job) for job in jobs}
+    assert len(set(expected.values())) > len(configs)
+
+    failures = 0
+    with ThreadPoolExecutor(n_threads) as pool:
+        for _ in range(rounds):
+            batch = jobs * 2
+            random.shuffle(batch)
+            for job, future in [(job, pool.submit(run, job)) for job in batch]:
+                try:
+                    ans = future.result()
+                except Exception as e:
+                    failures += 1
+                    print('{!r} for document {} config {} collect_all={}'.format(e, *job))
+                    continue
+                if ans != expected[job]:
+                    failures += 1
+                    print('mismatch for document {} config {} collect_all={}'.format(*job))
+    print('{} checks on {} threads, {} mismatches'.format(len(jobs) * 2 * rounds, n_threads, failures))
+    return failures
+
+
+if __name__ == '__main__':
+    sys.exit(1 if main(*(int(n) for n in sys.argv[1:])) else 0)
@@ -0,0 +1,148 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional, Union, BinaryIO, Dict
+
+# bump whenever the checker may answer differently for the same document and config
+RESULT_VERSION = 2
+
+
+class Store(ABC):
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        pass
+
+    @abstractmethod
+    def put(self, key: str, value: str):
+        pass
+
+
+class MemoryStore(Store):
+    entries: 'OrderedDict[str, str]'
+    max_size: int
+    size: int
+    lock: threading.Lock
+
+    def __init__(self, max_size: int = 16 * 1024 * 1024):
+        self.entries = OrderedDict()
+        self.max_size = max_size
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: str):
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(key) + len(old)
+            self.entries[key] = value
+            self.size += len(key) + len(value)
+            while self.size > self.max_size and len(self.entries) > 1:
+                old_key, old = self.entries.popitem(last=False)
+                self.size -= len(old_key) + len(old)
+
+
+class SQLiteStore(Store):
+    path: str
+    max_entries: int
+    # when entries were last read, written back in batches instead of on every hit
+    used: Dict[str, float]
+    max_used: int
+    connection: sqlite3.Connection
+    lock: threading.Lock
+
+    def __init__(self, path: str, max_entries: int = 100000, max_used: int = 256):
+        self.path = path
+        self.max_entries = max_entries
+        self.used = {}
+        self.max_used = max_used
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL, used REAL NOT NULL)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS results_used ON results (used)')
+        self.connection.commit()
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self.lock:
+            row = self.connection.execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            self.used[key] = time.time()
+            if len(self.used) >= self.max_used:
+                self.write_used()
+                self.connection.commit()
+            return row[0]
+
+    def put(self, key: str, value: str):
+        with self.lock:
+            # entries read lately must not be the ones evicted
+            self.write_used()
+            self.connection.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?)', (key, value, time.time()))
+            self.connection.execute(
+                'DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY used DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,))
+            self.connection.commit()
+
+    def write_used(self):
+        # the lock is held by the caller
+        self.connection.executemany('UPDATE results SET used = ? WHERE key = ?',
+                                    [(used, key) for key, used in self.used.items()])
+        self.used.clear()
+
+
+def file_digest(filename: Union[str, bytes, BinaryIO]) -> str:
+    h = hashlib.sha256()
+    if isinstance(filename, (bytes, bytearray, memoryview)):
+        h.update(filename)
+    elif isinstance(filename, str):
+        with open(filename, 'rb') as file:
+            for chunk in iter(lambda: file.read(1 << 20), b''):
+                h.update(chunk)
+    else:
+        start = filename.tell()
+        for chunk in iter(lambda: filename.read(1 << 20), b''):
+            h.update(chunk)
+        filename.seek(start)
+    return h.hexdigest()
+
+
+class ResultCache:
+    store: Store
+    hits: int
+    misses: int
+    lock: threading.Lock
+
+    def __init__(self, store: Store):
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def key(self, filename: Union[str, bytes, BinaryIO], config_digest: str, collect_all: bool) -> str:
+        return '{}:{}:{}:{}'.format(RESULT_VERSION, config_digest, int(collect_all), file_digest(filename))
+
+    def get(self, key: str) -> Optional[str]:
+        ans = self.store.get(key)
+        with self.lock:
+            if ans is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return ans
+
+    def put(self, key: str, value: str):
+        self.store.put(key, value)
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,71 @@
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, Any, List, Optional
+
+from core import ctrl
+
+extensions = ('.docx', '.odt', '.rtf')
+
+
+def find_docx(root: str) -> List[str]:
+    ans = []
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            # skip the lock files Word leaves next to open documents
+            if filename.lower().endswith(extensions) and not filename.startswith('~$'):
+                ans.append(os.path.join(dirpath, filename))
+    return sorted(ans)
+
+
+def check_file(filename: str, collect_all: bool) -> Dict[str, Any]:
+    ans: Dict[str, Any] = {'file': filename}
+    try:
+        start = time.perf_counter()
+        # read it all here so parse_time covers the whole document
+        doc = ctrl.open_doc(filename).load()
+        ans['parse_time'] = time.perf_counter() - start
+        start = time.perf_counter()
+        ans['result'] = ctrl.check_doc(doc, ctrl.batch_config, collect_all).to_dict()
+        ans['check_time'] = time.perf_counter() - start
+    except Exception as e:
+        ans['error'] = '{}: {}'.format(type(e).__name__, e)
+    return ans
+
+
+def check(args: argparse.Namespace) -> int:
+    with open(args.config, encoding='utf-8') as file:
+        yaml_str = file.read()
+    filenames = find_docx(args.dir)
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    n_failed = 0
+    try:
+        for _, ans in ctrl.check_batch(filenames, yaml_str, args.jobs, args.all, check_file):
+            if 'error' in ans:
+                n_failed += 1
+            out.write(json.dumps(ans, ensure_ascii=False) + '\n')
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 1 if n_failed else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m core.cli', description='Check paper formats offline.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    check_parser = subparsers.add_parser('check', help='check every DOCX, ODT and RTF file under a directory')
+    check_parser.add_argument('dir', help='directory to walk for papers')
+    check_parser.add_argument('--config', required=True, help='YAML configuration file')
+    check_parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='worker processes')
+    check_parser.add_argument('--all', action='store_true', help='report every violation, not only the first')
+    check_parser.add_argument('--output', help='write JSON lines here instead of stdout')
+    check_parser.set_defaults(func=check)
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
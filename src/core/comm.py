@@ -1,15 +1,52 @@
-from typing import Any
+from functools import lru_cache
+from typing import Any, List, Optional, Tuple
 
 
 def satisfy(val: Any, req: Any) -> bool:
     if req is None:
         return True
-    ans: bool
+    if not hasattr(val, '__satisfy__'):
+        return val == req
+    ans, mismatch = judge(val, req)
+    if mismatch is not None:
+        e = mismatch[0]()
+        e.val, e.req = mismatch[1], mismatch[2]
+        raise e
+    return ans
+
+
+def matches(val: Any, req: Any) -> bool:
+    if req is None:
+        return True
+    if not hasattr(val, '__satisfy__'):
+        return val == req
+    ans, mismatch = judge(val, req)
+    return mismatch is None and ans is not False
+
+
+def judge(val: Any, req: Any) -> Tuple[Any, Optional[Tuple[type, Any, Any]]]:
     try:
-        ans = val.__satisfy__(req)
+        return judge_cached(val, req)
+    except TypeError:
+        return judge_cached.__wrapped__(val, req)
+
+
+# property objects are interned, so a verdict only has to be worked out once per (value, requirement) pair
+@lru_cache(maxsize=65536)
+def judge_cached(val: Any, req: Any) -> Tuple[Any, Optional[Tuple[type, Any, Any]]]:
+    try:
+        return val.__satisfy__(req), None
+    except NotMatched as nm:
+        return False, (type(nm), nm.val, nm.req)
     except AttributeError:
-        ans = (val == req)
-    return ans
+        return val == req, None
+
+
+def fail(e: Exception, errors: Optional[List[Exception]], cause: Optional[Exception] = None):
+    e.__cause__ = cause
+    if errors is None:
+        raise e
+    errors.append(e)
 
 
 def inherent(child: Any, parent: Any) -> Any:
@@ -28,10 +65,13 @@ class EnumError(Exception):
 
 
 class NotMatched(Exception):
+    # name of the mismatched property in reports
+    prop: str = ''
     val: Any
     req: Any
 
 
 class PartError(Exception):
+    # name of the violation in reports
+    kind: str = ''
     pos: Any
-
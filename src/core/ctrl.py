@@ -1,14 +1,20 @@
-from core.pp.engines import docx
-from core.pp.properties import *
+import hashlib
+import json
+import pickle
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Union, BinaryIO, Iterable, Iterator, Optional, Tuple, Callable, Any
+
+from core.cache import ResultCache
+from core.pp.elements import Doc
+from core.pp.engines import docx_stream, odt, rtf
+from core.pp.engines.docx_stream import ElementMemo
 from core.scanner import check_formats
 from core.parser import check_contents
 
-from core.scanner.check_formats import MasterPageBreakError, MasterPageLayoutError, MasterPageHeaderError, \
-    MasterPageFooterError, LackPartError, UnfamiliarPartError, \
-    LackEmptyLineBeforeError, LackEmptyLineAfterError, LackLabelBeforeError, LackLabelAfterError, \
-    LackPictureorTableNearError, WrongFormatError
-
-from core.parser.check_contents import EmptySectionError, WrongContentError, WordNotMatched
+from core.comm import PartError
+from core.result import Report, violation, from_dict, unreadable
 import yaml
 from yaml import YAMLObject
 
@@ -16,150 +22,174 @@ from yaml import YAMLObject
 
 class Config(YAMLObject):
     yaml_tag = u'!Configuration'
-    pass
+    # SHA-256 of the YAML text, set by load_config
+    digest: Optional[str] = None
+
+
+def parse_config(yaml_str: str) -> Config:
+    # with open('config.yaml', 'r') as file:
+    #     config: Config = yaml.load(file)
+    return yaml.load(yaml_str, Loader=yaml.FullLoader)
+
+
+# parsed configs by the SHA-256 of their YAML text, least recently used first
+config_cache: 'OrderedDict[str, Config]' = OrderedDict()
+config_cache_size = 16
+config_cache_lock = threading.Lock()
+
+
+# bump whenever a pickled Config could no longer be loaded by this code
+COMPILED_CONFIG_VERSION = 1
+
+
+def compile_config(yaml_str: str) -> bytes:
+    return pickle.dumps((COMPILED_CONFIG_VERSION, parse_config(yaml_str)), protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_compiled_config(data: bytes) -> Optional[Config]:
+    # only for configs compiled by us and kept in our own database: unpickling runs code
+    try:
+        version, config = pickle.loads(data)
+    except Exception:
+        return None
+    if version != COMPILED_CONFIG_VERSION or type(config) is not Config:
+        return None
+    return config
+
+
+def config_digest(yaml_str: str) -> str:
+    return hashlib.sha256(yaml_str.encode('utf-8')).hexdigest()
+
+
+def cached_config(digest: str) -> Optional[Config]:
+    # a config parsed before from the YAML text with this digest
+    with config_cache_lock:
+        config = config_cache.get(digest)
+        if config is not None:
+            config_cache.move_to_end(digest)
+        return config
+
+
+def load_config(yaml_str: str, compiled: Optional[bytes] = None) -> Config:
+    key = config_digest(yaml_str)
+    with config_cache_lock:
+        config = config_cache.get(key)
+        if config is not None:
+            config_cache.move_to_end(key)
+            return config
+    config = load_compiled_config(compiled) if compiled else None
+    if config is None:
+        config = parse_config(yaml_str)
+    config.digest = key
+    with config_cache_lock:
+        config_cache[key] = config
+        while len(config_cache) > config_cache_size:
+            config_cache.popitem(last=False)
+    return config
+
+
+def check(filename: Union[str, bytes, BinaryIO], config: Config, collect_all: bool = False,
+          cache: Optional[ResultCache] = None, memo: Optional[ElementMemo] = None) -> Report:
+    # with a memo, paragraphs and tables unchanged since an earlier upload are not parsed again,
+    # but every check still runs over the whole document
+    if cache is None or config.digest is None:
+        return check_source(filename, config, collect_all, memo)
+    key = cache.key(filename, config.digest, collect_all)
+    cached = cache.get(key)
+    if cached is not None:
+        return from_dict(json.loads(cached))
+    ans = check_source(filename, config, collect_all, memo)
+    cache.put(key, json.dumps(ans.to_dict(), ensure_ascii=False))
+    return ans
 
 
-def main(filename: str, yaml_str: str) -> str:
-    ans = ''
-    doc = docx.main(filename)
+def read_head(filename: Union[str, bytes, BinaryIO], size: int = 128) -> bytes:
+    if isinstance(filename, str):
+        with open(filename, 'rb') as file:
+            return file.read(size)
+    if isinstance(filename, (bytes, bytearray, memoryview)):
+        return bytes(filename[:size])
+    position = filename.tell()
     try:
+        return filename.read(size)
+    finally:
+        filename.seek(position)
 
-        # with open('config.yaml', 'r') as file:
-        #     config: Config = yaml.load(file)
-        config: Config = yaml.load(yaml_str)
-        body, _ = check_formats.main(doc, config.formats)
-        check_contents.main(body, config.contents)
+
+def file_type(filename: Union[str, bytes, BinaryIO]) -> str:
+    # by content rather than by name, since uploads come without one;
+    # an OpenDocument package must start with its media type, stored uncompressed
+    head = read_head(filename)
+    if head.startswith(b'{\\rtf'):
+        return 'rtf'
+    if head.startswith(b'PK\x03\x04') and head[30:38] == b'mimetype' \
+            and b'application/vnd.oasis.opendocument.text' in head[38:]:
+        return 'odt'
+    return 'docx'
+
+
+def open_doc(filename: Union[str, bytes, BinaryIO], memo: Optional[ElementMemo] = None) -> Doc:
+    # only DOCX documents reuse the elements of earlier uploads
+    kind = file_type(filename)
+    if kind == 'rtf':
+        return rtf.main(filename)
+    if kind == 'odt':
+        return odt.main(filename)
+    return docx_stream.main(filename, memo)
+
+
+def check_source(filename: Union[str, bytes, BinaryIO], config: Config, collect_all: bool = False,
+                 memo: Optional[ElementMemo] = None) -> Report:
+    doc = open_doc(filename, memo)
+    try:
+        return check_doc(doc, config, collect_all)
+    finally:
+        # a check that stops at the first violation leaves the rest of the package unread
+        doc.close()
+
+
+def check_doc(doc: Doc, config: Config, collect_all: bool = False) -> Report:
+    errors: List[PartError] = []
+    try:
+        body, _ = check_formats.main(doc, config.formats, errors if collect_all else None)
+        if body is not None:
+            check_contents.main(body, config.contents, errors if collect_all else None)
 
         # with open('config.yaml', 'w') as file:
         #     yaml.dump(config, file, encoding='utf-8', allow_unicode=True)
 
-    except MasterPageBreakError as e:
-        ans = 'Can\'t find the {}!\nMaybe the section break before is lack.'.format(e.pos)
-    except MasterPageLayoutError as e:
-        ans = 'Page format of the {} is wrong!\n'.format(e.pos)
-        fmt = ''
-        if type(e.__cause__) is MarginBottomNotMatched:
-            fmt = 'bottom margin (to footer)'
-        elif type(e.__cause__) is MarginLeftNotMatched:
-            fmt = 'left margin'
-        elif type(e.__cause__) is MarginRightNotMatched:
-            fmt = 'right margin'
-        elif type(e.__cause__) is MarginTopNotMatched:
-            fmt = 'top margin (to header)'
-        elif type(e.__cause__) is PageHeightLeftNotMatched:
-            fmt = 'page height'
-        elif type(e.__cause__) is PageWidthLeftNotMatched:
-            fmt = 'page width'
-        elif type(e.__cause__) is HeaderMarginTopNotMatched:
-            fmt = 'header margin'
-        elif type(e.__cause__) is FooterMarginBottomNotMatched:
-            fmt = 'footer margin'
-        ans += 'The {} is "{}", which should be "{}"'.format(fmt, e.__cause__.val, e.__cause__.req)
-    except MasterPageHeaderError as e:
-        ans = 'Header format of the {} is wrong!\n'.format(e.pos)
-        if type(e.__cause__) is ParaEmpty:
-            ans += 'It should not be empty line!'
-        elif type(e.__cause__) is ParaComplex:
-            ans += 'Text in it should not have more than one formats!'
-        else:
-            fmt = ''
-            if type(e.__cause__) is NameNotMatched:
-                fmt = 'font'
-            elif type(e.__cause__) is NameAsiaNotMatched:
-                fmt = 'Asian font'
-            elif type(e.__cause__) is SizeNotMatched:
-                fmt = 'size'
-            elif type(e.__cause__) is SizeAsiaNotMatched:
-                fmt = 'Asian size'
-            elif type(e.__cause__) is WeightNotMatched:
-                fmt = 'weight'
-            elif type(e.__cause__) is WeightAsiaNotMatched:
-                fmt = 'Asian weight'
-            elif type(e.__cause__) is LetterSpacingNotMatched:
-                fmt = 'letter spacing'
-            elif type(e.__cause__) is AlignNotMatched:
-                fmt = 'alignment'
-            elif type(e.__cause__) is LineHeightNotMatched:
-                fmt = 'line height'
-            ans += 'The {} is "{}", which should be "{}"'.format(fmt, e.__cause__.val, e.__cause__.req)
-    except MasterPageFooterError as e:
-        ans = 'Footer format of the {} is wrong!\n'.format(e.pos)
-        if type(e.__cause__) is ParaEmpty:
-            ans += 'It should not be empty line!'
-        elif type(e.__cause__) is ParaComplex:
-            ans += 'Text in it should not have more than one formats!'
-        else:
-            fmt = ''
-            if type(e.__cause__) is NameNotMatched:
-                fmt = 'font'
-            elif type(e.__cause__) is NameAsiaNotMatched:
-                fmt = 'Asian font'
-            elif type(e.__cause__) is SizeNotMatched:
-                fmt = 'size'
-            elif type(e.__cause__) is SizeAsiaNotMatched:
-                fmt = 'Asian size'
-            elif type(e.__cause__) is WeightNotMatched:
-                fmt = 'weight'
-            elif type(e.__cause__) is WeightAsiaNotMatched:
-                fmt = 'Asian weight'
-            elif type(e.__cause__) is LetterSpacingNotMatched:
-                fmt = 'letter spacing'
-            elif type(e.__cause__) is AlignNotMatched:
-                fmt = 'alignment'
-            elif type(e.__cause__) is LineHeightNotMatched:
-                fmt = 'line height'
-            ans += 'The {} is "{}", which should be "{}"'.format(fmt, e.__cause__.val, e.__cause__.req)
-    except LackPartError as e:
-        ans = 'Line {} in {}:\nThe {} is lack! Be sure that its format is right.'.format(e.pos[1], e.pos[0], e.part)
-    except UnfamiliarPartError as e:
-        ans = 'Line {} in {}:\nFormat of this line is unfamiliar! What\'s it?'.format(e.pos[1], e.pos[0])
-    except LackEmptyLineBeforeError as e:
-        ans = 'Line {} in {}:\nThere should be an empty line before this {}!'.format(e.pos[1], e.pos[0], e.part)
-    except LackEmptyLineAfterError as e:
-        ans = 'Line {} in {}:\nThere should be an empty line after this {}!'.format(e.pos[1], e.pos[0], e.part)
-    except LackLabelBeforeError as e:
-        ans = 'Line {} in {}:\nThere should be a label before this {}!'.format(e.pos[1], e.pos[0], e.part)
-    except LackLabelAfterError as e:
-        ans = 'Line {} in {}:\nThere should be an label after this {}!'.format(e.pos[1], e.pos[0], e.part)
-    except LackPictureorTableNearError as e:
-        ans = 'Line {} in {}:\nThere should be a {} next to this label!'.format(e.pos[1], e.pos[0], e.part)
-    except WrongFormatError as e:
-        ans = 'Line {} in {}:\n'.format(e.pos[1], e.pos[0])
-        if type(e.__cause__) is ParaEmpty:
-            ans += 'This {} should not be empty line!'.format(e.part)
-        elif type(e.__cause__) is ParaComplex:
-            ans += 'Text in this {} should not have more than one formats!'.format(e.part)
-        else:
-            fmt = ''
-            if type(e.__cause__) is NameNotMatched:
-                fmt = 'font'
-            elif type(e.__cause__) is NameAsiaNotMatched:
-                fmt = 'Asian font'
-            elif type(e.__cause__) is SizeNotMatched:
-                fmt = 'size'
-            elif type(e.__cause__) is SizeAsiaNotMatched:
-                fmt = 'Asian size'
-            elif type(e.__cause__) is WeightNotMatched:
-                fmt = 'weight'
-            elif type(e.__cause__) is WeightAsiaNotMatched:
-                fmt = 'Asian weight'
-            elif type(e.__cause__) is LetterSpacingNotMatched:
-                fmt = 'letter spacing'
-            elif type(e.__cause__) is AlignNotMatched:
-                fmt = 'alignment'
-            elif type(e.__cause__) is LineHeightNotMatched:
-                fmt = 'line height'
-
-            ans += 'The {} of this {} is "{}", which should be "{}"'.format(fmt, e.part, e.__cause__.val,
-                                                                            e.__cause__.req)
-    except EmptySectionError as e:
-        ans = '{}:\nThis section is empty! There should be something.'.format(e.pos)
-    except WrongContentError as e:
-        if type(e.__cause__) is WordNotMatched:
-            ans = 'The {} is "{}", which should be "{}".'.format(e.pos, e.__cause__.val, e.__cause__.req)
-        else:
-            ans = 'The {} contains "{}", which should start with "{}".'.format(e.pos, e.__cause__.val, e.__cause__.req)
-
-    if ans == '':
-        ans = "No error found.\nGood job."
-    return ans
+    except PartError as e:
+        errors.append(e)
+
+    return Report([violation(e) for e in errors])
+
+
+def main(filename: Union[str, bytes, BinaryIO], yaml_str: str, collect_all: bool = False,
+         compiled: Optional[bytes] = None, cache: Optional[ResultCache] = None) -> Report:
+    return check(filename, load_config(yaml_str, compiled), collect_all, cache)
+
+
+# the config of a batch, unpickled once in each worker process
+batch_config: Optional[Config] = None
+
+
+def init_batch_worker(config: Config):
+    global batch_config
+    batch_config = config
+
+
+def check_batch_file(filename: str, collect_all: bool) -> Report:
+    try:
+        return check(filename, batch_config, collect_all)
+    except Exception as e:
+        return unreadable(e)
+
+
+def check_batch(filenames: Iterable[str], yaml_str: str, workers: Optional[int] = None,
+                collect_all: bool = False, worker: Callable[[str, bool], Any] = check_batch_file) \
+        -> Iterator[Tuple[str, Any]]:
+    config = load_config(yaml_str)
+    with ProcessPoolExecutor(workers, initializer=init_batch_worker, initargs=(config,)) as pool:
+        futures = {pool.submit(worker, filename, collect_all): filename for filename in filenames}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
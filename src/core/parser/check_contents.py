@@ -1,5 +1,5 @@
-from typing import NoReturn
-from core.comm import NotMatched, PartError
+from typing import NoReturn, Optional, List
+from core.comm import NotMatched, PartError, fail
 from core.parser.contents import *
 from core.scanner.parts import *
 
@@ -10,23 +10,34 @@ def remove_blanks(s: str) -> str:
     return s
 
 
+class Context:
+    cnt: Contents
+    errors: Optional[List[PartError]]
+
+    def __init__(self, cnt: Contents, errors: Optional[List[PartError]] = None):
+        self.cnt = cnt
+        self.errors = errors
+
+
 class TextNotMatched(NotMatched):
     pass
 
 
 class WordNotMatched(TextNotMatched):
-    pass
+    prop = 'word'
 
 
 class PrefixNotMatched(TextNotMatched):
-    pass
+    prop = 'prefix'
 
 
 class WrongContentError(PartError):
+    kind = 'wrong_content'
     pos: str
 
 
 class EmptySectionError(PartError):
+    kind = 'empty_section'
     pos: str
 
 
@@ -44,76 +55,76 @@ def check_prefix(val: str, req: str) -> NoReturn:
         raise e
 
 
-def check_abstract_title(title: AbstractTitle) -> NoReturn:
+def check_abstract_title(ctx: Context, title: AbstractTitle) -> NoReturn:
     try:
-        check_word(title, cnt.abstract_title_content)
+        check_word(title, ctx.cnt.abstract_title_content)
     except WordNotMatched as nm:
         e = WrongContentError()
         e.pos = 'abstract title'
-        raise e from nm
+        fail(e, ctx.errors, nm)
 
 
-def check_abstract_title_en(title: AbstractTitleEN) -> NoReturn:
+def check_abstract_title_en(ctx: Context, title: AbstractTitleEN) -> NoReturn:
     try:
-        check_word(title, cnt.abstract_title_en_content)
+        check_word(title, ctx.cnt.abstract_title_en_content)
     except WordNotMatched as nm:
         e = WrongContentError()
         e.pos = 'English abstract title'
-        raise e from nm
+        fail(e, ctx.errors, nm)
 
 
-def check_keywords(keywords: Keywords) -> NoReturn:
+def check_keywords(ctx: Context, keywords: Keywords) -> NoReturn:
     try:
-        check_prefix(keywords, cnt.keywords_prefix)
+        check_prefix(keywords, ctx.cnt.keywords_prefix)
     except PrefixNotMatched as nm:
         e = WrongContentError()
         e.pos = 'key words'
-        raise e from nm
+        fail(e, ctx.errors, nm)
 
 
-def check_keywords_en(keywords_en: KeywordsEN) -> NoReturn:
+def check_keywords_en(ctx: Context, keywords_en: KeywordsEN) -> NoReturn:
     try:
-        check_prefix(keywords_en, cnt.keywords_en_prefix)
+        check_prefix(keywords_en, ctx.cnt.keywords_en_prefix)
     except PrefixNotMatched as nm:
         e = WrongContentError()
         e.pos = 'English key words'
-        raise e from nm
+        fail(e, ctx.errors, nm)
 
 
-def check_catalog_title(title: CatalogTitle) -> NoReturn:
+def check_catalog_title(ctx: Context, title: CatalogTitle) -> NoReturn:
     try:
-        check_word(title, cnt.catalog_title_content)
+        check_word(title, ctx.cnt.catalog_title_content)
     except WordNotMatched as nm:
         e = WrongContentError()
         e.pos = 'catalog title'
-        raise e from nm
+        fail(e, ctx.errors, nm)
 
 
-def check_conclusion_title(title: ConclusionTitle) -> NoReturn:
+def check_conclusion_title(ctx: Context, title: ConclusionTitle) -> NoReturn:
     try:
-        check_word(title, cnt.conclusion_title_content)
+        check_word(title, ctx.cnt.conclusion_title_content)
     except WordNotMatched as nm:
         e = WrongContentError()
         e.pos = 'conclusion title'
-        raise e from nm
+        fail(e, ctx.errors, nm)
 
 
-def check_references_title(title: ReferencesTitle) -> NoReturn:
+def check_references_title(ctx: Context, title: ReferencesTitle) -> NoReturn:
     try:
-        check_word(title, cnt.references_title_content)
+        check_word(title, ctx.cnt.references_title_content)
     except WordNotMatched as nm:
         e = WrongContentError()
         e.pos = 'references title'
-        raise e from nm
+        fail(e, ctx.errors, nm)
 
 
-def check_thanks_title(title: ThanksTitle) -> NoReturn:
+def check_thanks_title(ctx: Context, title: ThanksTitle) -> NoReturn:
     try:
-        check_word(title, cnt.thanks_title_content)
+        check_word(title, ctx.cnt.thanks_title_content)
     except WordNotMatched as nm:
         e = WrongContentError()
         e.pos = 'thanks title'
-        raise e from nm
+        fail(e, ctx.errors, nm)
 
 
 class Section:
@@ -138,73 +149,73 @@ def get_children(beg: int, sequence: List[Union[Heading, Normal, Picture, Table]
     return ans, i
 
 
-def check_section(sxn: Section, chapter_no: str, picture_no: int, table_no: int, title: str) -> (int, int):
+def check_section(ctx: Context, sxn: Section, chapter_no: str, picture_no: int, table_no: int,
+                  title: str) -> (int, int):
     try:
         check_prefix(sxn.title, title)
     except PrefixNotMatched as nm:
         e = WrongContentError()
         e.pos = sxn.title
-        raise e from nm
+        fail(e, ctx.errors, nm)
     if len(sxn.children) == 0:
-        e = EmptySectionError
+        e = EmptySectionError()
         e.pos = sxn.title
-        raise e
+        fail(e, ctx.errors)
     i = 1
     for child in sxn.children:
         if type(child) is Section:
-            picture_no, table_no = check_section(child, chapter_no, picture_no, table_no,
-                                                 cnt.heading_title_prefix.format(title[:-1], i))
+            picture_no, table_no = check_section(ctx, child, chapter_no, picture_no, table_no,
+                                                 ctx.cnt.heading_title_prefix.format(title[:-1], i))
             i += 1
             continue
         if type(child) is Picture:
             try:
-                check_prefix(child, cnt.picture_prefix.format(chapter_no, picture_no))
+                check_prefix(child, ctx.cnt.picture_prefix.format(chapter_no, picture_no))
             except PrefixNotMatched as nm:
                 e = WrongContentError()
                 e.pos = sxn.title
-                raise e from nm
+                fail(e, ctx.errors, nm)
             picture_no += 1
             continue
         if type(child) is Table:
             try:
-                check_prefix(child, cnt.table_prefix.format(chapter_no, table_no))
+                check_prefix(child, ctx.cnt.table_prefix.format(chapter_no, table_no))
             except PrefixNotMatched as nm:
                 e = WrongContentError()
                 e.pos = sxn.title
-                raise e from nm
+                fail(e, ctx.errors, nm)
             table_no += 1
             continue
     return picture_no, table_no
 
 
-def check_chapter(chapter: Chapter, chapter_no: str):
+def check_chapter(ctx: Context, chapter: Chapter, chapter_no: str):
     try:
-        check_prefix(chapter.title, cnt.chapter_prefix.format(chapter_no))
+        check_prefix(chapter.title, ctx.cnt.chapter_prefix.format(chapter_no))
     except PrefixNotMatched as nm:
         e = WrongContentError()
         e.pos = chapter.title
-        raise e from nm
+        fail(e, ctx.errors, nm)
     sxn = Section()
     sxn.title = chapter_no + ' '
     sxn.children = get_children(0, chapter, 0)[0]
-    check_section(sxn, chapter_no, 1, 1, chapter_no + ' ')
+    check_section(ctx, sxn, chapter_no, 1, 1, chapter_no + ' ')
 
 
-def main(body: Body, contents: Contents) -> Contents:
-    global cnt
-    cnt = contents
+def main(body: Body, contents: Contents, collect: Optional[List[PartError]] = None) -> Contents:
+    ctx = Context(contents, collect)
 
-    check_abstract_title(body.abstract_title)
-    check_abstract_title_en(body.abstract_title_en)
-    check_keywords(body.keywords)
-    check_keywords_en(body.keywords_en)
-    check_catalog_title(body.catalog_title)
-    check_conclusion_title(body.conclusion_title)
-    check_references_title(body.references_title)
-    check_thanks_title(body.thanks_title)
+    check_abstract_title(ctx, body.abstract_title)
+    check_abstract_title_en(ctx, body.abstract_title_en)
+    check_keywords(ctx, body.keywords)
+    check_keywords_en(ctx, body.keywords_en)
+    check_catalog_title(ctx, body.catalog_title)
+    check_conclusion_title(ctx, body.conclusion_title)
+    check_references_title(ctx, body.references_title)
+    check_thanks_title(ctx, body.thanks_title)
     i = 1
     for chapter in body.chapters:
-        check_chapter(chapter, str(i))
+        check_chapter(ctx, chapter, str(i))
         i += 1
 
-    return cnt
+    return ctx.cnt
@@ -1,4 +1,6 @@
-from typing import Optional, Union, List
+from array import array
+from collections import OrderedDict
+from typing import Optional, Union, List, Callable, Iterable, Iterator, Dict, Any
 
 from core.pp.properties import TextProp, ParaProp, PageLayout
 
@@ -90,5 +92,225 @@ class MasterPage:
         self.footer_first = footer_first
 
 
-class Doc(List[Union[MasterPage, Para, Table, Break]]):
-    pass
+Element = Union[MasterPage, Para, Table, Break]
+
+
+class Doc(List[Element]):
+    def has(self, i: int) -> bool:
+        return i < len(self)
+
+    def map(self, fn: Callable[[Element], Element]):
+        for i in range(len(self)):
+            self[i] = fn(self[i])
+
+    def load(self) -> 'Doc':
+        return self
+
+    def close(self):
+        pass
+
+
+class LazyDoc(Doc):
+    # elements are taken from the source only when a check gets to them,
+    # so a check that stops early doesn't pay for the rest of the document
+    source: Optional[Iterator[Element]]
+    maps: List[Callable[[Element], Element]]
+
+    def __init__(self, source: Iterable[Element]):
+        super().__init__()
+        self.source = iter(source)
+        self.maps = []
+
+    def has(self, i: int) -> bool:
+        if i < list.__len__(self):
+            return True
+        while self.source is not None and list.__len__(self) <= i:
+            try:
+                e = next(self.source)
+            except StopIteration:
+                self.source = None
+                break
+            for fn in self.maps:
+                e = fn(e)
+            self.append(e)
+        return i < list.__len__(self)
+
+    def map(self, fn: Callable[[Element], Element]):
+        # applies to the elements read so far and to every element read later
+        for i in range(list.__len__(self)):
+            self[i] = fn(list.__getitem__(self, i))
+        self.maps.append(fn)
+
+    def load(self) -> 'LazyDoc':
+        while self.source is not None:
+            self.has(list.__len__(self))
+        return self
+
+    def close(self):
+        # stops reading, so an engine reading the source lazily releases its file now
+        if self.source is not None:
+            if hasattr(self.source, 'close'):
+                self.source.close()
+            self.source = None
+
+    def __len__(self):
+        return list.__len__(self.load())
+
+    def __getitem__(self, i):
+        # the checks look at most elements more than once, so elements read before are returned first
+        if type(i) is int and 0 <= i < list.__len__(self):
+            return list.__getitem__(self, i)
+        if isinstance(i, slice) or i < 0:
+            self.load()
+        else:
+            self.has(i)
+        return list.__getitem__(self, i)
+
+    def __iter__(self):
+        i = 0
+        while self.has(i):
+            yield list.__getitem__(self, i)
+            i += 1
+
+
+class CompactDoc(Doc):
+    # paragraphs kept as columns instead of objects: all span text in one string,
+    # with offsets and property ids in arrays; elements are built again when looked at
+    kinds: array
+    refs: array
+    starts: array
+    ends: array
+    span_props: array
+    text: str
+    texts: List[str]
+    props: List[Any]
+    prop_ids: Dict[int, int]
+    objects: List[Any]
+    maps: List[Callable[[Element], Element]]
+    built: 'OrderedDict[int, Element]'
+
+    PARA = 0
+    EMPTY_PARA = 1
+    OBJECT = 2
+
+    cache_size = 256
+
+    def __init__(self, source: Iterable[Element] = ()):
+        super().__init__()
+        # per element: kind, para prop id or object index, and where its spans start
+        self.kinds = array('B')
+        self.refs = array('l')
+        self.starts = array('L', [0])
+        # per span: end offset in text, and text prop id, or -1 - index of a frame in objects
+        self.ends = array('L')
+        self.span_props = array('l')
+        self.text = ''
+        self.texts = []
+        self.props = []
+        self.prop_ids = {}
+        self.objects = []
+        self.maps = []
+        self.built = OrderedDict()
+        for e in source:
+            if type(e) is CompactDoc:
+                self.extend(e)
+            else:
+                self.append(e)
+
+    def prop_id(self, prop: Any) -> int:
+        # properties are interned, so the same object means the same property
+        ans = self.prop_ids.get(id(prop))
+        if ans is None:
+            ans = self.prop_ids[id(prop)] = len(self.props)
+            self.props.append(prop)
+        return ans
+
+    def append(self, e: Element):
+        if type(e) is Para or type(e) is EmptyPara:
+            self.kinds.append(self.PARA if type(e) is Para else self.EMPTY_PARA)
+            self.refs.append(self.prop_id(e.prop))
+            end = self.ends[-1] if len(self.ends) > 0 else 0
+            for s in e:
+                if type(s) is Span:
+                    self.texts.append(str(s))
+                    end += len(s)
+                    self.span_props.append(self.prop_id(s.prop))
+                else:
+                    self.span_props.append(-1 - len(self.objects))
+                    self.objects.append(s)
+                self.ends.append(end)
+        else:
+            self.kinds.append(self.OBJECT)
+            self.refs.append(len(self.objects))
+            self.objects.append(e)
+        self.starts.append(len(self.ends))
+
+    def extend(self, source: Iterable[Element]):
+        if type(source) is not CompactDoc or len(source.maps) > 0:
+            for e in source:
+                self.append(e)
+            return
+        # another compact document is copied column by column, without building its elements
+        prop_ids = [self.prop_id(prop) for prop in source.props]
+        n_objects = len(self.objects)
+        n_spans = len(self.ends)
+        end = self.ends[-1] if n_spans > 0 else 0
+        self.kinds.extend(source.kinds)
+        self.refs.extend(ref + n_objects if kind == self.OBJECT else prop_ids[ref]
+                         for kind, ref in zip(source.kinds, source.refs))
+        self.starts.extend(start + n_spans for start in source.starts[1:])
+        self.ends.extend(e + end for e in source.ends)
+        self.span_props.extend(ref - n_objects if ref < 0 else prop_ids[ref] for ref in source.span_props)
+        self.texts.append(source.text)
+        self.texts.extend(source.texts)
+        self.objects.extend(source.objects)
+
+    def build(self, i: int) -> Element:
+        if self.kinds[i] == self.OBJECT:
+            return self.objects[self.refs[i]]
+        if len(self.texts) > 0:
+            self.text += ''.join(self.texts)
+            self.texts = []
+        ans = (Para if self.kinds[i] == self.PARA else EmptyPara)(self.props[self.refs[i]])
+        for j in range(self.starts[i], self.starts[i + 1]):
+            ref = self.span_props[j]
+            if ref < 0:
+                ans.append(self.objects[-1 - ref])
+            else:
+                s = Span(self.text[self.ends[j - 1] if j > 0 else 0:self.ends[j]])
+                s.prop = self.props[ref]
+                ans.append(s)
+        return ans
+
+    def has(self, i: int) -> bool:
+        return i < len(self.kinds)
+
+    def map(self, fn: Callable[[Element], Element]):
+        self.maps.append(fn)
+        self.built.clear()
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('document index out of range')
+        ans = self.built.get(i)
+        if ans is None:
+            ans = self.build(i)
+            for fn in self.maps:
+                ans = fn(ans)
+            # the scan looks a few lines back and ahead, and reads the appendixes and the thanks from the end
+            # before reading them again from the front, so the last built elements are kept
+            self.built[i] = ans
+            if len(self.built) > self.cache_size:
+                self.built.popitem(last=False)
+        return ans
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
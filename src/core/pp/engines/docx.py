@@ -1,13 +1,19 @@
-from typing import Union, Optional, List
+import io
+import posixpath
+import zipfile
+from typing import Union, Optional, List, Iterator, BinaryIO, Dict
+
+from lxml import etree
 
 import core.comm
 import core.ctrl
 from core.pp.elements import *
+from core.pp.engines.docx_stream import Package, Styles, open_zip, style_cache_stats, style_cache_lock
 from core.pp.properties import *
 
 import docx
 from docx.document import Document as DocxDoc
-from docx.section import Section as DocxSxn
+from docx.section import Section as DocxSxn, _BaseHeaderFooter as DocxHF
 from docx.text.run import Run as DocxRun, Font as DocxFont
 from docx.styles.style import _CharacterStyle as DocxCharS, _ParagraphStyle as DocxParaS
 from docx.shared import Length as DocxLen
@@ -18,21 +24,24 @@ from docx.table import Table as DocxTable, _Row as DocxRow, _Cell as DocxCell
 docx_w: str = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
 docx_m: str = '{http://schemas.openxmlformats.org/officeDocument/2006/math}'
 
+# the only parts get_doc looks at; images and other media are never decompressed
+kept_rel_types = tuple('http://schemas.openxmlformats.org/officeDocument/2006/relationships/' + t
+                       for t in ('officeDocument', 'styles', 'settings', 'header', 'footer'))
+
 
 def get_size(docx_size: Union[DocxLen, float], unit: str) -> Size:
     ans: Size
     if type(docx_size) == float:
         ans = docx_size
     else:
-        ans = Length(0, unit)
         if unit == 'cm':
-            ans.value = docx_size.cm
+            ans = Length(docx_size.cm, unit)
         elif unit == 'mm':
-            ans.value = docx_size.mm
+            ans = Length(docx_size.mm, unit)
         elif unit == 'in':
-            ans.value = docx_size.inches
+            ans = Length(docx_size.inches, unit)
         elif unit == 'pt':
-            ans.value = docx_size.pt
+            ans = Length(docx_size.pt, unit)
         else:
             raise UnitError(unit)
 
@@ -55,19 +64,16 @@ def get_text_prop_from_docx_font(docx_font: DocxFont) -> TextProp:
     )
 
 
-def get_text_prop(docx_char_s: DocxCharS) -> TextProp:
-    ans = None if docx_char_s.font is None else get_text_prop_from_docx_font(docx_char_s.font)
-    if docx_char_s.base_style is not None:
-        ans = core.comm.inherent(ans, get_text_prop(docx_char_s.base_style))
-    return ans
+def get_text_prop(docx_char_s: Optional[DocxCharS], styles: Styles) -> TextProp:
+    return styles.get_text_prop(None if docx_char_s is None else docx_char_s.style_id)
 
 
-def get_span(docx_run: DocxRun) -> Span:
+def get_span(docx_run: DocxRun, styles: Styles) -> Span:
     prop = TextProp()
     if docx_run.font is not None:
         prop = get_text_prop_from_docx_font(docx_run.font)
     if docx_run.style is not None:
-        prop = core.comm.inherent(prop, get_text_prop(docx_run.style))
+        prop = core.comm.inherent(prop, get_text_prop(docx_run.style, styles))
 
     ans = Span(docx_run.text)
     ans.prop = prop
@@ -93,22 +99,17 @@ def get_para_prop_from_docx_par_fmt(docx_par_fmt: DocxParFmt) -> ParaProp:
     )
 
 
-def get_para_prop(docx_para_s: DocxParaS) -> ParaProp:
-    ans = None if docx_para_s.paragraph_format is None else get_para_prop_from_docx_par_fmt(
-        docx_para_s.paragraph_format)
-    if docx_para_s.base_style is not None:
-        ans = core.comm.inherent(ans, get_para_prop(docx_para_s.base_style))
-    return ans
+def get_para_prop(docx_para_s: Optional[DocxParaS], styles: Styles) -> ParaProp:
+    return styles.get_para_prop(None if docx_para_s is None else docx_para_s.style_id)
 
 
-def get_para(docx_para: DocxPara):
+def get_para(docx_para: DocxPara, styles: Styles):
     prop = ParaProp()
     if docx_para.paragraph_format is not None:
         prop = get_para_prop_from_docx_par_fmt(docx_para.paragraph_format)
-    if docx_para.style is not None:
-        prop = core.comm.inherent(prop, get_para_prop(docx_para.style))
+    prop = core.comm.inherent(prop, get_para_prop(docx_para.style, styles))
 
-    text_prop = get_text_prop(docx_para.style)
+    text_prop = get_text_prop(docx_para.style, styles)
 
     if len(docx_para._p) == 0:
         return EmptyPara(prop=prop)
@@ -134,7 +135,7 @@ def get_para(docx_para: DocxPara):
                 n_run += 1
                 if docx_run.text == '':
                     continue
-                span = get_span(docx_run)
+                span = get_span(docx_run, styles)
                 span.prop = core.comm.inherent(span.prop, text_prop)
                 # span.repair()
                 if last_is_span and span.prop == ans[-1].prop:
@@ -147,7 +148,7 @@ def get_para(docx_para: DocxPara):
     return ans
 
 
-def get_table(docx_table: DocxTable) -> Table:
+def get_table(docx_table: DocxTable, styles: Styles) -> Table:
     align: Optional[str] = None
     if docx_table.alignment is not None:
         if docx_table.alignment == 0:
@@ -173,11 +174,21 @@ def get_table(docx_table: DocxTable) -> Table:
             ans[-1].append(Cell())
             p: DocxPara
             for p in docx_cell.paragraphs:
-                ans[-1][-1].append(get_para(p))
+                ans[-1][-1].append(get_para(p, styles))
+    return ans
+
+
+def get_header_footer(docx_hf: DocxHF, cls: type, styles: Styles,
+                      parts: Dict[str, Union[Header, Footer]]) -> Union[Header, Footer]:
+    # sections linked to the previous one resolve to the same part, which is parsed once
+    part = docx_hf._get_or_add_definition()
+    ans = parts.get(part.partname)
+    if ans is None:
+        ans = parts[part.partname] = cls(get_para(p, styles) for p in docx_hf.paragraphs)
     return ans
 
 
-def get_master_page(docx_sxn: DocxSxn) -> MasterPage:
+def get_master_page(docx_sxn: DocxSxn, styles: Styles, parts: Dict[str, Union[Header, Footer]]) -> MasterPage:
     ans = MasterPage(
         page_layout=PageLayout(
             prop=PageProp(
@@ -196,86 +207,119 @@ def get_master_page(docx_sxn: DocxSxn) -> MasterPage:
                 margin_bottom=get_size(docx_sxn.footer_distance, 'cm'),
             )
         ),
-        header=Header(),
+        header=get_header_footer(docx_sxn.header, Header, styles, parts),
         header_first=Header(),
-        footer=Footer(),
+        footer=get_header_footer(docx_sxn.footer, Footer, styles, parts),
         footer_first=Footer(),
     )
-    for p in docx_sxn.header.paragraphs:
-        ans.header.append(get_para(p))
     if docx_sxn.different_first_page_header_footer:
-        for p in docx_sxn.first_page_header.paragraphs:
-            ans.header_first.append(get_para(p))
+        ans.header_first = get_header_footer(docx_sxn.first_page_header, Header, styles, parts)
+        ans.footer_first = get_header_footer(docx_sxn.first_page_footer, Footer, styles, parts)
     else:
         ans.header_first = ans.header
-    for p in docx_sxn.footer.paragraphs:
-        ans.footer.append(get_para(p))
-    if docx_sxn.different_first_page_header_footer:
-        for p in docx_sxn.first_page_footer.paragraphs:
-            ans.footer_first.append(get_para(p))
 
     return ans
 
 
-def get_doc(docx_doc: DocxDoc) -> Doc:
-    ans = Doc()
-    section: List[Union[Para, Table, Break]] = list()
-    n_master_page = 0
-    master_pages: List[MasterPage] = list()
-    for docx_sxn in docx_doc.sections:
-        master_pages.append(get_master_page(docx_sxn))
-    n_para = 0
-    n_table = 0
-    # elements = list()
-    # for e in docx_doc.element[0]:
-    #     if e.tag == docx_w + 'sdt':
-    #         if e.find(docx_w + 'sdtContent') is not None:
-    #             for ee in e.find(docx_w + 'sdtContent'):
-    #                 elements.append(ee)
-    #     else:
-    #         elements.append(e)
-    for e in docx_doc.element[0]:
-        if e.tag == docx_w + 'p':
-            docx_para = docx_doc.paragraphs[n_para]
-            n_para += 1
-            # print(n_para)
-
-            if len(
-                    docx_para.runs) == 0 and docx_para._p.pPr is not None and docx_para._p.pPr.get_or_add_sectPr() is not None and len(
-                    docx_para._p.pPr.get_or_add_sectPr()) > 0:
-                ans.append(master_pages[n_master_page])
-                n_master_page += 1
-                for child in section:
-                    ans.append(child)
-                section = list()
-            else:
-                section.append(get_para(docx_para))
-                if len(docx_para.runs) > 0:
-                    for docx_br in docx_para.runs[0].element.br_lst:
-                        if docx_br.get(docx_w + 'type') == 'page':
-                            section.append(Break('page'))
-                if docx_para._p.pPr is not None and docx_para._p.pPr.get_or_add_sectPr() is not None and len(
+def iter_doc(docx_doc: DocxDoc) -> Iterator[Element]:
+    styles = Styles(docx_doc.styles.element)
+    try:
+        section: List[Union[Para, Table, Break]] = list()
+        n_master_page = 0
+        master_pages: List[MasterPage] = list()
+        parts: Dict[str, Union[Header, Footer]] = dict()
+        for docx_sxn in docx_doc.sections:
+            master_pages.append(get_master_page(docx_sxn, styles, parts))
+        n_para = 0
+        n_table = 0
+        # elements = list()
+        # for e in docx_doc.element[0]:
+        #     if e.tag == docx_w + 'sdt':
+        #         if e.find(docx_w + 'sdtContent') is not None:
+        #             for ee in e.find(docx_w + 'sdtContent'):
+        #                 elements.append(ee)
+        #     else:
+        #         elements.append(e)
+        for e in docx_doc.element[0]:
+            if e.tag == docx_w + 'p':
+                docx_para = docx_doc.paragraphs[n_para]
+                n_para += 1
+                # print(n_para)
+
+                if len(
+                        docx_para.runs) == 0 and docx_para._p.pPr is not None and docx_para._p.pPr.get_or_add_sectPr() is not None and len(
                         docx_para._p.pPr.get_or_add_sectPr()) > 0:
-                    ans.append(master_pages[n_master_page])
+                    yield master_pages[n_master_page]
                     n_master_page += 1
-                    for child in section:
-                        ans.append(child)
+                    yield from section
                     section = list()
+                else:
+                    section.append(get_para(docx_para, styles))
+                    if len(docx_para.runs) > 0:
+                        for docx_br in docx_para.runs[0].element.br_lst:
+                            if docx_br.get(docx_w + 'type') == 'page':
+                                section.append(Break('page'))
+                    if docx_para._p.pPr is not None and docx_para._p.pPr.get_or_add_sectPr() is not None and len(
+                            docx_para._p.pPr.get_or_add_sectPr()) > 0:
+                        yield master_pages[n_master_page]
+                        n_master_page += 1
+                        yield from section
+                        section = list()
+
+
+            elif e.tag == docx_w + 'tbl':
+                docx_table = docx_doc.tables[n_table]
+                n_table += 1
+                section.append(get_table(docx_table, styles))
+            elif e.tag == docx_w + 'sectPr' or e.tag == docx_w + 'sdt':
+                yield master_pages[n_master_page]
+                n_master_page += 1
+                yield from section
+                section = list()
+    finally:
+        with style_cache_lock:
+            style_cache_stats['hits'] += styles.hits
+            style_cache_stats['misses'] += styles.misses
 
 
-        elif e.tag == docx_w + 'tbl':
-            docx_table = docx_doc.tables[n_table]
-            n_table += 1
-            section.append(get_table(docx_table))
-        elif e.tag == docx_w + 'sectPr' or e.tag == docx_w + 'sdt':
-            ans.append(master_pages[n_master_page])
-            n_master_page += 1
-            for child in section:
-                ans.append(child)
-            section = list()
-    return ans
+def get_doc(docx_doc: DocxDoc) -> Doc:
+    return Doc(iter_doc(docx_doc))
+
+
+def open_docx(filename: Union[str, BinaryIO], mapped: bool = False) -> DocxDoc:
+    # python-docx loads every part with a relationship to it, so it gets a copy of the package
+    # without the relationships to anything but the kept parts
+    out = io.BytesIO()
+    with open_zip(filename, mapped) as src, zipfile.ZipFile(out, 'w', zipfile.ZIP_STORED) as dst:
+        package = Package(src)
+        names = set(src.namelist())
+        dst.writestr('[Content_Types].xml', src.read('[Content_Types].xml'))
+        # a part can be the target of several relationships, as a header shared by two sections is
+        written = {''}
+        parts = ['']
+        while len(parts) > 0:
+            part_name = parts.pop()
+            directory, name = posixpath.split(part_name)
+            rels_name = posixpath.join(directory, '_rels', name + '.rels')
+            if rels_name not in names:
+                continue
+            rels = package.get_rels(part_name)
+            root = etree.fromstring(src.read(rels_name))
+            for rel in list(root):
+                if rel.get('TargetMode') == 'External':
+                    continue
+                if rel.get('Type') in kept_rel_types and rels[rel.get('Id')][0] in names:
+                    target = rels[rel.get('Id')][0]
+                    if target not in written:
+                        written.add(target)
+                        dst.writestr(target, src.read(target))
+                        parts.append(target)
+                else:
+                    root.remove(rel)
+            dst.writestr(rels_name, etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True))
+    return docx.Document(out)
 
 
-def main(filename: str) -> Doc:
-    docx_doc: DocxDoc = docx.Document(filename)
-    return get_doc(docx_doc)
+def main(filename: Union[str, BinaryIO], mapped: bool = False) -> LazyDoc:
+    # with mapped, a file on disk is read through a memory map instead of being read into memory
+    return LazyDoc(iter_doc(open_docx(filename, mapped)))
@@ -0,0 +1,609 @@
+import hashlib
+import io
+import mmap
+import posixpath
+import threading
+import zipfile
+from collections import Counter, OrderedDict
+from typing import Union, Optional, List, Dict, Tuple, Iterator, BinaryIO, Callable
+
+from lxml import etree
+
+import core.comm
+from core.pp.elements import *
+from core.pp.properties import *
+
+docx_w: str = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+docx_m: str = '{http://schemas.openxmlformats.org/officeDocument/2006/math}'
+docx_r: str = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+docx_wp: str = '{http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing}'
+
+rel_office_document: str = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument'
+rel_styles: str = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles'
+
+body_tags = (docx_w + 'p', docx_w + 'tbl', docx_w + 'sectPr', docx_w + 'sdt')
+
+# style table hits and misses summed over all documents, for monitoring
+style_cache_stats: Counter = Counter()
+style_cache_lock = threading.Lock()
+
+aligns: Dict[str, str] = {
+    'left': 'left',
+    'center': 'center',
+    'right': 'right',
+    'both': 'justify',
+}
+
+
+class Package:
+    zip_file: zipfile.ZipFile
+    document_name: str
+    styles_name: Optional[str]
+    rels: Dict[str, str]
+
+    def __init__(self, zip_file: zipfile.ZipFile):
+        self.zip_file = zip_file
+        self.document_name = 'word/document.xml'
+        for target, rel_type in self.get_rels('').values():
+            if rel_type == rel_office_document:
+                self.document_name = target
+        self.styles_name = None
+        self.rels = dict()
+        for rid, (target, rel_type) in self.get_rels(self.document_name).items():
+            self.rels[rid] = target
+            if rel_type == rel_styles:
+                self.styles_name = target
+
+    def get_rels(self, part_name: str) -> Dict[str, Tuple[str, str]]:
+        directory, name = posixpath.split(part_name)
+        rels_name = posixpath.join(directory, '_rels', name + '.rels')
+        if rels_name not in self.zip_file.namelist():
+            return dict()
+        ans = dict()
+        for rel in etree.fromstring(self.zip_file.read(rels_name)):
+            if rel.get('TargetMode') == 'External':
+                continue
+            target = rel.get('Target')
+            if target.startswith('/'):
+                target = target[1:]
+            else:
+                target = posixpath.normpath(posixpath.join(directory, target))
+            ans[rel.get('Id')] = target, rel.get('Type')
+        return ans
+
+    def get_part(self, part_name: str):
+        return etree.fromstring(self.zip_file.read(part_name))
+
+    def iter_body(self) -> Iterator:
+        # only finished children of w:body are handed out, then dropped to keep the tree small
+        with self.zip_file.open(self.document_name) as source:
+            for _, e in etree.iterparse(source, events=('end',), tag=body_tags):
+                body = e.getparent()
+                if body is None or body.tag != docx_w + 'body':
+                    continue
+                yield e
+                e.clear()
+                while e.getprevious() is not None:
+                    del body[0]
+
+
+def get_on_off(e) -> Optional[bool]:
+    if e is None:
+        return None
+    return e.get(docx_w + 'val') not in ('0', 'false', 'off')
+
+
+def get_size(emu: int, unit: str) -> Size:
+    if unit == 'cm':
+        return Length(emu / 360000, unit)
+    elif unit == 'mm':
+        return Length(emu / 36000, unit)
+    elif unit == 'in':
+        return Length(emu / 914400, unit)
+    elif unit == 'pt':
+        return Length(emu / 12700, unit)
+    raise UnitError(unit)
+
+
+def get_twips(e, attr: str) -> Optional[int]:
+    if e is None or e.get(docx_w + attr) is None:
+        return None
+    return int(e.get(docx_w + attr)) * 635
+
+
+def get_text_prop_from_rpr(rpr) -> TextProp:
+    if rpr is None:
+        return TextProp(font=Font())
+    r_fonts = rpr.find(docx_w + 'rFonts')
+    sz = rpr.find(docx_w + 'sz')
+    b = rpr.find(docx_w + 'b')
+    spacing = rpr.find(docx_w + 'spacing')
+    return TextProp(
+        font=Font(
+            name=None if r_fonts is None else r_fonts.get(docx_w + 'ascii'),
+            name_asia=None if r_fonts is None else r_fonts.get(docx_w + 'eastAsia'),
+            size=None if sz is None else get_size(int(float(sz.get(docx_w + 'val')) * 6350), 'pt'),
+            weight=None if b is None else 'bold' if get_on_off(b) else 'normal',
+        ),
+        letter_spacing=None if spacing is None else Length(float(spacing.get(docx_w + 'val')) / 20, 'pt'),
+    )
+
+
+def get_para_prop_from_ppr(ppr) -> ParaProp:
+    if ppr is None:
+        return ParaProp()
+    align: Optional[str] = None
+    jc = ppr.find(docx_w + 'jc')
+    if jc is not None:
+        if jc.get(docx_w + 'val') not in aligns:
+            raise AlignError(jc.get(docx_w + 'val'))
+        align = aligns[jc.get(docx_w + 'val')]
+    line_height: Optional[Size] = None
+    spacing = ppr.find(docx_w + 'spacing')
+    line = get_twips(spacing, 'line')
+    if line is not None:
+        line_rule = spacing.get(docx_w + 'lineRule')
+        if line_rule is None or line_rule == 'auto':
+            line_height = line / 152400
+        else:
+            line_height = get_size(line, 'pt')
+    return ParaProp(
+        align=align,
+        line_height=line_height,
+    )
+
+
+class Styles:
+    by_id: Dict[str, object]
+    defaults: Dict[str, str]
+    doc_defaults: Optional[object]
+    resolved: Dict[Optional[str], Tuple[ParaProp, TextProp]]
+    hits: int
+    misses: int
+
+    def __init__(self, styles_element=None):
+        self.by_id = dict()
+        self.defaults = dict()
+        self.doc_defaults = None
+        self.resolved = dict()
+        self.hits = 0
+        self.misses = 0
+        if styles_element is None:
+            return
+        self.doc_defaults = styles_element.find(docx_w + 'docDefaults')
+        for s in styles_element.iter(docx_w + 'style'):
+            style_id = s.get(docx_w + 'styleId')
+            if style_id is None:
+                continue
+            self.by_id.setdefault(style_id, s)
+            if s.get(docx_w + 'default') in ('1', 'true', 'on'):
+                self.defaults[s.get(docx_w + 'type', 'paragraph')] = style_id
+
+    def get(self, style_id: Optional[str], style_type: str) -> Optional[str]:
+        style = None if style_id is None else self.by_id.get(style_id)
+        if style is None or style.get(docx_w + 'type', 'paragraph') != style_type:
+            return self.defaults.get(style_type)
+        return style_id
+
+    def resolve(self, style_id: Optional[str]) -> Tuple[ParaProp, TextProp]:
+        # None stands for docDefaults, the root of every paragraph style chain
+        ans = self.resolved.get(style_id)
+        if ans is not None:
+            self.hits += 1
+            return ans
+        self.misses += 1
+        if style_id is None:
+            ans = (
+                get_para_prop_from_ppr(None if self.doc_defaults is None else self.doc_defaults.find(
+                    docx_w + 'pPrDefault/' + docx_w + 'pPr')),
+                get_text_prop_from_rpr(None if self.doc_defaults is None else self.doc_defaults.find(
+                    docx_w + 'rPrDefault/' + docx_w + 'rPr')),
+            )
+        else:
+            style = self.by_id[style_id]
+            ans = (
+                get_para_prop_from_ppr(style.find(docx_w + 'pPr')),
+                get_text_prop_from_rpr(style.find(docx_w + 'rPr')),
+            )
+            base_id = get_val(style, 'basedOn')
+            if base_id in self.by_id:
+                base = self.resolve(base_id)
+            elif style.get(docx_w + 'type', 'paragraph') == 'paragraph':
+                base = self.resolve(None)
+            else:
+                base = None
+            if base is not None:
+                ans = (core.comm.inherent(ans[0], base[0]), core.comm.inherent(ans[1], base[1]))
+        self.resolved[style_id] = ans
+        return ans
+
+    def get_para_prop(self, style_id: Optional[str]) -> ParaProp:
+        return self.resolve(style_id)[0]
+
+    def get_text_prop(self, style_id: Optional[str]) -> TextProp:
+        return self.resolve(style_id)[1]
+
+
+def get_val(e, child: str) -> Optional[str]:
+    if e is None or e.find(docx_w + child) is None:
+        return None
+    return e.find(docx_w + child).get(docx_w + 'val')
+
+
+def get_run_text(docx_run) -> str:
+    ans = ''
+    for e in docx_run:
+        if e.tag == docx_w + 't':
+            ans += e.text or ''
+        elif e.tag == docx_w + 'tab' or e.tag == docx_w + 'ptab':
+            ans += '\t'
+        elif e.tag == docx_w + 'br':
+            if e.get(docx_w + 'type', 'textWrapping') == 'textWrapping':
+                ans += '\n'
+        elif e.tag == docx_w + 'cr':
+            ans += '\n'
+        elif e.tag == docx_w + 'noBreakHyphen':
+            ans += '-'
+    return ans
+
+
+def get_span(docx_run, styles: Styles) -> Span:
+    rpr = docx_run.find(docx_w + 'rPr')
+    prop = get_text_prop_from_rpr(rpr)
+    style_id = styles.get(get_val(rpr, 'rStyle'), 'character')
+    if style_id is not None:
+        prop = core.comm.inherent(prop, styles.get_text_prop(style_id))
+
+    ans = Span(get_run_text(docx_run))
+    ans.prop = prop
+    return ans
+
+
+def get_para(docx_p, styles: Styles) -> Para:
+    ppr = docx_p.find(docx_w + 'pPr')
+    prop = get_para_prop_from_ppr(ppr)
+    style_id = styles.get(get_val(ppr, 'pStyle'), 'paragraph')
+    prop = core.comm.inherent(prop, styles.get_para_prop(style_id))
+
+    text_prop = styles.get_text_prop(style_id)
+
+    if len(docx_p) == 0:
+        return EmptyPara(prop=prop)
+
+    last_is_span: bool = False
+    ans = Para(
+        prop=prop,
+    )
+    for e in docx_p:
+        if e.tag == docx_m + 'oMath':
+            ans.append(Frame(anchor_type='as-char', obj=Math()))
+            last_is_span = False
+        elif e.tag == docx_w + 'r':
+            drawing = e.find(docx_w + 'drawing')
+            if drawing is not None:
+                if drawing.find(docx_wp + 'inline') is not None:
+                    ans.append(Frame(anchor_type='as-char', obj=Image()))
+                else:
+                    ans.append(Frame(anchor_type='other', obj=Image()))
+                last_is_span = False
+            else:
+                span = get_span(e, styles)
+                if span == '':
+                    continue
+                span.prop = core.comm.inherent(span.prop, text_prop)
+                if last_is_span and span.prop == ans[-1].prop:
+                    new_end = Span(ans[-1] + span)
+                    new_end.prop = ans[-1].prop
+                    ans[-1] = new_end
+                else:
+                    ans.append(span)
+                last_is_span = True
+    return ans
+
+
+def get_table(docx_tbl, styles: Styles) -> Table:
+    align: Optional[str] = None
+    jc = docx_tbl.find(docx_w + 'tblPr/' + docx_w + 'jc')
+    if jc is not None:
+        if jc.get(docx_w + 'val') not in aligns:
+            raise AlignError(jc.get(docx_w + 'val'))
+        align = aligns[jc.get(docx_w + 'val')]
+    ans = Table(
+        prop=ParaProp(
+            align=align,
+        ),
+    )
+    # merged cells are repeated, as python-docx reports them
+    cells: List[Cell] = list()
+    n_column = len(docx_tbl.findall(docx_w + 'tblGrid/' + docx_w + 'gridCol'))
+    for docx_tr in docx_tbl.iterfind(docx_w + 'tr'):
+        ans.append(Row())
+        for docx_tc in docx_tr.iterfind(docx_w + 'tc'):
+            tc_pr = docx_tc.find(docx_w + 'tcPr')
+            grid_span = int(get_val(tc_pr, 'gridSpan') or 1)
+            v_merge = None if tc_pr is None else tc_pr.find(docx_w + 'vMerge')
+            for i in range(grid_span):
+                if v_merge is not None and v_merge.get(docx_w + 'val', 'continue') == 'continue' \
+                        and len(cells) >= n_column > 0:
+                    cells.append(cells[-n_column])
+                elif i > 0:
+                    cells.append(cells[-1])
+                else:
+                    cells.append(Cell())
+                    for p in docx_tc.iterfind(docx_w + 'p'):
+                        cells[-1].append(get_para(p, styles))
+                ans[-1].append(cells[-1])
+    return ans
+
+
+class HeadersFooters:
+    package: Package
+    styles: Styles
+    last: Dict[Tuple[str, str], Optional[str]]
+    # parsed parts by tag and part name, shared by every master page that links to them
+    parts: Dict[Tuple[str, Optional[str]], Union[Header, Footer]]
+
+    def __init__(self, package: Package, styles: Styles):
+        self.package = package
+        self.styles = styles
+        self.last = dict()
+        self.parts = dict()
+
+    def update(self, docx_sect_pr):
+        # a section without its own reference links to the previous section's part
+        for tag in ('header', 'footer'):
+            for reference in docx_sect_pr.iterfind(docx_w + tag + 'Reference'):
+                self.last[tag, reference.get(docx_w + 'type')] = self.package.rels.get(reference.get(docx_r + 'id'))
+
+    def get(self, tag: str, hf_type: str) -> Union[Header, Footer]:
+        part_name = self.last.get((tag, hf_type))
+        ans = self.parts.get((tag, part_name))
+        if ans is None:
+            ans = self.parts[tag, part_name] = (Header if tag == 'header' else Footer)(self.parse(tag, part_name))
+        return ans
+
+    def parse(self, tag: str, part_name: Optional[str]) -> List[Para]:
+        if part_name is None:
+            # Word shows a blank paragraph in the Header/Footer style for an undefined part
+            ans = Para(prop=get_para_prop_from_ppr(None))
+            style_id = self.styles.get(tag.capitalize(), 'paragraph')
+            ans.prop = core.comm.inherent(ans.prop, self.styles.get_para_prop(style_id))
+            return [ans]
+        return [get_para(p, self.styles) for p in self.package.get_part(part_name).iterfind(docx_w + 'p')]
+
+
+def get_master_page(docx_sect_pr, headers_footers: HeadersFooters) -> MasterPage:
+    headers_footers.update(docx_sect_pr)
+    pg_sz = docx_sect_pr.find(docx_w + 'pgSz')
+    pg_mar = docx_sect_pr.find(docx_w + 'pgMar')
+    title_pg = get_on_off(docx_sect_pr.find(docx_w + 'titlePg'))
+    header_distance = get_size(get_twips(pg_mar, 'header'), 'cm')
+    footer_distance = get_size(get_twips(pg_mar, 'footer'), 'cm')
+    ans = MasterPage(
+        page_layout=PageLayout(
+            prop=PageProp(
+                margin_bottom=get_size(get_twips(pg_mar, 'bottom'), 'cm') - footer_distance,
+                margin_left=get_size(get_twips(pg_mar, 'left'), 'cm'),
+                margin_right=get_size(get_twips(pg_mar, 'right'), 'cm'),
+                margin_top=get_size(get_twips(pg_mar, 'top'), 'cm') - header_distance,
+
+                page_height=get_size(get_twips(pg_sz, 'h'), 'cm'),
+                page_width=get_size(get_twips(pg_sz, 'w'), 'cm'),
+            ),
+            header_style=HeaderStyle(
+                margin_top=header_distance,
+            ),
+            footer_style=FooterStyle(
+                margin_bottom=footer_distance,
+            )
+        ),
+        header=headers_footers.get('header', 'default'),
+        header_first=Header(),
+        footer=headers_footers.get('footer', 'default'),
+        footer_first=Footer(),
+    )
+    if title_pg:
+        ans.header_first = headers_footers.get('header', 'first')
+        ans.footer_first = headers_footers.get('footer', 'first')
+    else:
+        ans.header_first = ans.header
+
+    return ans
+
+
+def has_section_break(docx_p) -> bool:
+    sect_pr = docx_p.find(docx_w + 'pPr/' + docx_w + 'sectPr')
+    return sect_pr is not None and len(sect_pr) > 0
+
+
+class ElementMemo:
+    # paragraphs and tables built before, by the digest of their XML and of the styles part;
+    # they are shared between documents, so nothing may modify them after they are built.
+    # The memo is bounded by the length of the XML the elements were built from, which stands in for their size
+    elements: 'OrderedDict[bytes, Tuple[Union[Para, Table], int]]'
+    max_bytes: int
+    n_bytes: int
+    hits: int
+    misses: int
+    lock: threading.Lock
+
+    def __init__(self, max_bytes: int = 64 * 2 ** 20):
+        self.elements = OrderedDict()
+        self.max_bytes = max_bytes
+        self.n_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, e, styles_digest: bytes, build: Callable[[], Union[Para, Table]]) -> Union[Para, Table]:
+        xml = etree.tostring(e)
+        key = hashlib.blake2b(xml, digest_size=16, key=styles_digest).digest()
+        with self.lock:
+            entry = self.elements.get(key)
+            if entry is not None:
+                self.elements.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        ans = build()
+        with self.lock:
+            if key not in self.elements:
+                self.elements[key] = ans, len(xml)
+                self.n_bytes += len(xml)
+            while self.n_bytes > self.max_bytes:
+                self.n_bytes -= self.elements.popitem(last=False)[1][1]
+        return ans
+
+
+def iter_doc(package: Package, memo: Optional[ElementMemo] = None,
+             new_section: Callable[[], List[Element]] = list) -> Iterator[Element]:
+    # a section is held in new_section() until its master page has been read;
+    # sections held in anything but a list are yielded whole, for the caller to copy at once
+    styles = Styles(None if package.styles_name is None else package.get_part(package.styles_name))
+    headers_footers = HeadersFooters(package, styles)
+    styles_digest = b''
+    if memo is not None and package.styles_name is not None:
+        styles_digest = hashlib.blake2b(package.zip_file.read(package.styles_name), digest_size=16).digest()
+
+    section: List[Element] = new_section()
+    # sections closed before their w:sectPr has been read wait here for the master page
+    pending: List[List[Element]] = list()
+    n_master_page = 0
+    master_pages: List[MasterPage] = list()
+
+    def close_section() -> Iterator[Element]:
+        nonlocal section, n_master_page
+        pending.append(section)
+        section = new_section()
+        while len(pending) > 0 and n_master_page < len(master_pages):
+            yield master_pages[n_master_page]
+            n_master_page += 1
+            if new_section is list:
+                yield from pending.pop(0)
+            else:
+                yield pending.pop(0)
+
+    try:
+        for e in package.iter_body():
+            if e.tag == docx_w + 'p':
+                sect_pr = e.find(docx_w + 'pPr/' + docx_w + 'sectPr')
+                if sect_pr is not None:
+                    master_pages.append(get_master_page(sect_pr, headers_footers))
+                docx_rs = e.findall(docx_w + 'r')
+                if len(docx_rs) == 0 and has_section_break(e):
+                    yield from close_section()
+                else:
+                    if memo is None:
+                        section.append(get_para(e, styles))
+                    else:
+                        section.append(memo.get(e, styles_digest, lambda: get_para(e, styles)))
+                    if len(docx_rs) > 0:
+                        for docx_br in docx_rs[0].iterfind(docx_w + 'br'):
+                            if docx_br.get(docx_w + 'type') == 'page':
+                                section.append(Break('page'))
+                    if has_section_break(e):
+                        yield from close_section()
+            elif e.tag == docx_w + 'tbl':
+                if memo is None:
+                    section.append(get_table(e, styles))
+                else:
+                    section.append(memo.get(e, styles_digest, lambda: get_table(e, styles)))
+            elif e.tag == docx_w + 'sectPr':
+                master_pages.append(get_master_page(e, headers_footers))
+                yield from close_section()
+            elif e.tag == docx_w + 'sdt':
+                yield from close_section()
+        if len(pending) > 0:
+            raise IndexError('section {} has no w:sectPr'.format(n_master_page))
+    finally:
+        with style_cache_lock:
+            style_cache_stats['hits'] += styles.hits
+            style_cache_stats['misses'] += styles.misses
+
+
+def get_doc(package: Package, memo: Optional[ElementMemo] = None) -> Doc:
+    return Doc(iter_doc(package, memo))
+
+
+class MappedFile(io.RawIOBase):
+    # a file read through a memory map: zip members are inflated straight from the mapped pages,
+    # nothing of the package is copied into the process except what is being read
+    mapped: mmap.mmap
+    pos: int
+
+    def __init__(self, filename: str):
+        super().__init__()
+        with open(filename, 'rb') as file:
+            self.mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        n = max(0, min(len(b), len(self.mapped) - self.pos))
+        b[:n] = self.mapped[self.pos:self.pos + n]
+        self.pos += n
+        return n
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self.pos
+        elif whence == io.SEEK_END:
+            offset += len(self.mapped)
+        self.pos = offset
+        return self.pos
+
+    def tell(self) -> int:
+        return self.pos
+
+    def close(self):
+        if not self.closed:
+            self.mapped.close()
+        super().close()
+
+
+class MappedZipFile(zipfile.ZipFile):
+    # zipfile leaves a file object it was given open, so the map is released here when the zip file is closed
+    mapped_file: MappedFile
+
+    def __init__(self, filename: str):
+        self.mapped_file = MappedFile(filename)
+        try:
+            super().__init__(self.mapped_file)
+        except Exception:
+            self.mapped_file.close()
+            raise
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self.mapped_file.close()
+
+
+def open_zip(filename: Union[str, bytes, BinaryIO], mapped: bool = False) -> zipfile.ZipFile:
+    if isinstance(filename, (bytes, bytearray, memoryview)):
+        return zipfile.ZipFile(io.BytesIO(filename))
+    if mapped and isinstance(filename, str):
+        return MappedZipFile(filename)
+    return zipfile.ZipFile(filename)
+
+
+def read_doc(zip_file: zipfile.ZipFile, memo: Optional[ElementMemo] = None) -> Iterator[Element]:
+    # the zip file stays open until the last element has been read or the document is closed
+    with zip_file:
+        yield from iter_doc(Package(zip_file), memo)
+
+
+def main(filename: Union[str, bytes, BinaryIO], memo: Optional[ElementMemo] = None, compact: bool = False,
+         mapped: bool = False) -> Doc:
+    # compact documents are read at once but take a fraction of the memory;
+    # mapped reads a file on disk through a memory map
+    if compact:
+        with open_zip(filename, mapped) as zip_file:
+            return CompactDoc(iter_doc(Package(zip_file), memo, CompactDoc))
+    return LazyDoc(read_doc(open_zip(filename, mapped), memo))
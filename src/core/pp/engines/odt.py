@@ -0,0 +1,569 @@
+import posixpath
+import re
+import zipfile
+from typing import Union, Optional, List, Dict, Tuple, Iterator, BinaryIO, FrozenSet
+
+from lxml import etree
+
+import core.comm
+from core.pp.elements import *
+from core.pp.properties import *
+from core.pp.engines.docx_stream import get_size, open_zip, style_cache_stats, style_cache_lock
+
+odt_office: str = '{urn:oasis:names:tc:opendocument:xmlns:office:1.0}'
+odt_style: str = '{urn:oasis:names:tc:opendocument:xmlns:style:1.0}'
+odt_text: str = '{urn:oasis:names:tc:opendocument:xmlns:text:1.0}'
+odt_table: str = '{urn:oasis:names:tc:opendocument:xmlns:table:1.0}'
+odt_draw: str = '{urn:oasis:names:tc:opendocument:xmlns:drawing:1.0}'
+odt_fo: str = '{urn:oasis:names:tc:opendocument:xmlns:xsl-fo-compatible:1.0}'
+odt_svg: str = '{urn:oasis:names:tc:opendocument:xmlns:svg-compatible:1.0}'
+odt_manifest: str = '{urn:oasis:names:tc:opendocument:xmlns:manifest:1.0}'
+odt_math: str = '{http://www.w3.org/1998/Math/MathML}'
+odt_xlink: str = '{http://www.w3.org/1999/xlink}'
+
+media_type_formula: str = 'application/vnd.oasis.opendocument.formula'
+
+# children of office:text that hold paragraphs and tables, directly or in lists, sections and indexes
+body_tags = (
+    odt_text + 'p', odt_text + 'h', odt_table + 'table', odt_text + 'list', odt_text + 'section',
+    odt_text + 'table-of-content', odt_text + 'illustration-index', odt_text + 'table-index',
+    odt_text + 'object-index', odt_text + 'user-index', odt_text + 'alphabetical-index', odt_text + 'bibliography',
+)
+para_tags = (odt_text + 'p', odt_text + 'h')
+# their content is not shown in the line, or not at all
+skipped_tags = (
+    odt_text + 'note', odt_office + 'annotation', odt_office + 'annotation-end', odt_text + 'change',
+    odt_text + 'change-start', odt_text + 'change-end', odt_text + 'ruby-text',
+)
+
+aligns: Dict[str, str] = {
+    'start': 'left',
+    'left': 'left',
+    'center': 'center',
+    'end': 'right',
+    'right': 'right',
+    'justify': 'justify',
+}
+
+table_aligns: Dict[str, Optional[str]] = {
+    'left': 'left',
+    'center': 'center',
+    'right': 'right',
+    # as wide as the text area, like a DOCX table without w:jc
+    'margins': None,
+}
+
+emu_per_unit: Dict[str, int] = {
+    'cm': 360000,
+    'mm': 36000,
+    'in': 914400,
+    'pt': 12700,
+    'pc': 152400,
+    'px': 9525,
+}
+
+length_pattern = re.compile(r'\s*([-+]?[0-9]*\.?[0-9]+)\s*([a-z]+)\s*$')
+space_pattern = re.compile(r'[ \t\r\n]+')
+
+
+def get_emu(value: Optional[str]) -> Optional[int]:
+    # lengths are rounded to EMUs, the unit DOCX lengths are read in
+    if value is None:
+        return None
+    match = length_pattern.match(value)
+    if match is None or match.group(2) not in emu_per_unit:
+        raise UnitError(value)
+    return round(float(match.group(1)) * emu_per_unit[match.group(2)])
+
+
+def get_length(value: Optional[str], unit: str) -> Optional[Size]:
+    emu = get_emu(value)
+    return None if emu is None else get_size(emu, unit)
+
+
+def get_weight(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    if value.isdigit():
+        return 'bold' if int(value) >= 600 else 'normal'
+    return 'bold' if value == 'bold' else 'normal'
+
+
+def get_family(value: str) -> str:
+    # the first of a list of families, which are quoted when they contain spaces
+    return value.split(',')[0].strip().strip('\'"')
+
+
+def get_text_prop(props, fonts: Dict[str, str]) -> TextProp:
+    if props is None:
+        return TextProp(font=Font())
+
+    def get_name(name_attr: str, family_attr: str) -> Optional[str]:
+        name = props.get(odt_style + name_attr)
+        if name is not None:
+            return fonts.get(name, name)
+        family = props.get(family_attr)
+        return None if family is None else get_family(family)
+
+    def get_font_size(value: Optional[str]) -> Optional[Size]:
+        # percentages are relative to the parent style, whose size is kept
+        if value is None or value.endswith('%'):
+            return None
+        return get_length(value, 'pt')
+
+    letter_spacing = props.get(odt_fo + 'letter-spacing')
+    return TextProp(
+        font=Font(
+            name=get_name('font-name', odt_fo + 'font-family'),
+            name_asia=get_name('font-name-asian', odt_style + 'font-family-asian'),
+            size=get_font_size(props.get(odt_fo + 'font-size')),
+            size_asia=get_font_size(props.get(odt_style + 'font-size-asian')),
+            weight=get_weight(props.get(odt_fo + 'font-weight')),
+            weight_asia=get_weight(props.get(odt_style + 'font-weight-asian')),
+        ),
+        letter_spacing=None if letter_spacing in (None, 'normal') else get_length(letter_spacing, 'pt'),
+    )
+
+
+def get_para_prop(props) -> ParaProp:
+    if props is None:
+        return ParaProp()
+    align: Optional[str] = None
+    text_align = props.get(odt_fo + 'text-align')
+    if text_align is not None:
+        if text_align not in aligns:
+            raise AlignError(text_align)
+        align = aligns[text_align]
+    # proportional line heights are multiples of a single line, as lineRule="auto" in DOCX
+    line_height: Optional[Size] = None
+    value = props.get(odt_fo + 'line-height')
+    at_least = props.get(odt_style + 'line-height-at-least')
+    if value == 'normal':
+        line_height = 1.0
+    elif value is not None and value.endswith('%'):
+        line_height = float(value[:-1]) / 100
+    elif value is not None:
+        line_height = get_length(value, 'pt')
+    elif at_least is not None:
+        line_height = get_length(at_least, 'pt')
+    return ParaProp(
+        align=align,
+        line_height=line_height,
+    )
+
+
+class Styles:
+    # the common styles of styles.xml with the automatic styles of one part,
+    # since the names of automatic styles are only unique within their part
+    fonts: Dict[str, str]
+    common: Dict[Tuple[str, str], object]
+    defaults: Dict[str, object]
+    automatic: Dict[Tuple[str, str], object]
+    resolved: Dict[Tuple[str, Optional[str]], Tuple[ParaProp, TextProp]]
+    hits: int
+    misses: int
+
+    def __init__(self, common: Optional['Styles'] = None):
+        self.fonts = dict() if common is None else dict(common.fonts)
+        self.common = dict() if common is None else common.common
+        self.defaults = dict() if common is None else common.defaults
+        self.automatic = dict()
+        self.resolved = dict()
+        self.hits = 0
+        self.misses = 0
+
+    def add(self, e):
+        # office:font-face-decls, office:styles or office:automatic-styles
+        if e.tag == odt_office + 'font-face-decls':
+            for font_face in e.iterfind(odt_style + 'font-face'):
+                family = font_face.get(odt_svg + 'font-family')
+                if family is not None:
+                    self.fonts[font_face.get(odt_style + 'name')] = get_family(family)
+            return
+        by_name = self.automatic if e.tag == odt_office + 'automatic-styles' else self.common
+        for s in e:
+            if s.tag == odt_style + 'style':
+                by_name.setdefault((s.get(odt_style + 'family'), s.get(odt_style + 'name')), s)
+            elif s.tag == odt_style + 'default-style':
+                self.defaults.setdefault(s.get(odt_style + 'family'), s)
+        self.resolved.clear()
+
+    def get(self, family: str, name: Optional[str]):
+        if name is None:
+            return None
+        ans = self.automatic.get((family, name))
+        if ans is None:
+            ans = self.common.get((family, name))
+        return ans
+
+    def resolve(self, family: str, name: Optional[str]) -> Tuple[ParaProp, TextProp]:
+        # None stands for the default style, the root of every paragraph style chain
+        key = family, name
+        ans = self.resolved.get(key)
+        if ans is not None:
+            self.hits += 1
+            return ans
+        self.misses += 1
+        style = self.defaults.get(family) if name is None else self.get(family, name)
+        if style is None:
+            ans = (ParaProp(), TextProp(font=Font())) if name is None else self.resolve(family, None)
+        else:
+            ans = (
+                get_para_prop(style.find(odt_style + 'paragraph-properties')),
+                get_text_prop(style.find(odt_style + 'text-properties'), self.fonts),
+            )
+            parent_name = style.get(odt_style + 'parent-style-name')
+            if name is None:
+                base = None
+            elif parent_name is not None:
+                base = self.resolve(family, parent_name)
+            elif family == 'paragraph':
+                base = self.resolve(family, None)
+            else:
+                base = None
+            if base is not None:
+                ans = (core.comm.inherent(ans[0], base[0]), core.comm.inherent(ans[1], base[1]))
+        self.resolved[key] = ans
+        return ans
+
+    def get_master_page_name(self, e) -> Optional[str]:
+        # a paragraph or table whose own style names a master page starts a new page with it
+        family = 'table' if e.tag == odt_table + 'table' else 'paragraph'
+        style = self.get(family, e.get((odt_table if family == 'table' else odt_text) + 'style-name'))
+        if style is None:
+            return None
+        return style.get(odt_style + 'master-page-name') or None
+
+    def get_page_breaks(self, e) -> Tuple[bool, bool]:
+        # only breaks written on the paragraph itself, as Word keeps them in w:br
+        style = self.automatic.get(('paragraph', e.get(odt_text + 'style-name')))
+        props = None if style is None else style.find(odt_style + 'paragraph-properties')
+        if props is None:
+            return False, False
+        return props.get(odt_fo + 'break-before') == 'page', props.get(odt_fo + 'break-after') == 'page'
+
+
+class Package:
+    zip_file: zipfile.ZipFile
+    # embedded objects that are formulas, by their directory in the package
+    formulas: FrozenSet[str]
+
+    def __init__(self, zip_file: zipfile.ZipFile):
+        self.zip_file = zip_file
+        formulas = []
+        manifest = self.get_part('META-INF/manifest.xml')
+        if manifest is not None:
+            for entry in manifest.iterfind(odt_manifest + 'file-entry'):
+                if entry.get(odt_manifest + 'media-type') == media_type_formula:
+                    formulas.append(entry.get(odt_manifest + 'full-path').rstrip('/'))
+        self.formulas = frozenset(formulas)
+
+    def get_part(self, part_name: str):
+        if part_name not in self.zip_file.namelist():
+            return None
+        return etree.fromstring(self.zip_file.read(part_name))
+
+    def iter_body(self) -> Iterator:
+        # declarations before office:body and finished children of office:text are handed out,
+        # then dropped to keep the tree small
+        tags = (odt_office + 'font-face-decls', odt_office + 'automatic-styles') + body_tags
+        with self.zip_file.open('content.xml') as source:
+            for _, e in etree.iterparse(source, events=('end',), tag=tags):
+                parent = e.getparent()
+                if parent is None:
+                    continue
+                if parent.tag == odt_office + 'document-content':
+                    yield e
+                elif parent.tag == odt_office + 'text':
+                    yield e
+                    e.clear()
+                    while e.getprevious() is not None:
+                        del parent[0]
+
+
+def is_formula(odt_object, formulas: FrozenSet[str]) -> bool:
+    if odt_object.find(odt_math + 'math') is not None:
+        return True
+    href = odt_object.get(odt_xlink + 'href')
+    return href is not None and posixpath.normpath(href).rstrip('/') in formulas
+
+
+def get_frame(odt_frame, formulas: FrozenSet[str]) -> Frame:
+    anchor_type = 'as-char' if odt_frame.get(odt_text + 'anchor-type') == 'as-char' else 'other'
+    odt_object = odt_frame.find(odt_draw + 'object')
+    if odt_object is not None and is_formula(odt_object, formulas):
+        return Frame(anchor_type=anchor_type, obj=Math())
+    # pictures, charts and text boxes all count as pictures, as drawings do in DOCX
+    return Frame(anchor_type=anchor_type, obj=Image())
+
+
+def add_span(para: Para, text: str, prop: TextProp):
+    if text == '':
+        return
+    if len(para) > 0 and type(para[-1]) is Span and para[-1].prop == prop:
+        new_end = Span(para[-1] + text)
+        new_end.prop = prop
+        para[-1] = new_end
+    else:
+        span = Span(text)
+        span.prop = prop
+        para.append(span)
+
+
+def add_text(para: Para, text: Optional[str], prop: TextProp):
+    # white space collapses into one space, which is dropped at the start of a line or after another space
+    if not text:
+        return
+    text = space_pattern.sub(' ', text)
+    if text[0] == ' ' and (len(para) == 0 or type(para[-1]) is not Span or para[-1].endswith(' ')):
+        text = text[1:]
+    add_span(para, text, prop)
+
+
+def add_content(para: Para, e, prop: TextProp, styles: Styles, formulas: FrozenSet[str]):
+    add_text(para, e.text, prop)
+    for child in e:
+        if child.tag == odt_text + 'span':
+            style_name = child.get(odt_text + 'style-name')
+            if style_name is None:
+                add_content(para, child, prop, styles, formulas)
+            else:
+                add_content(para, child, core.comm.inherent(styles.resolve('text', style_name)[1], prop),
+                            styles, formulas)
+        elif child.tag == odt_text + 's':
+            add_span(para, ' ' * int(child.get(odt_text + 'c', '1')), prop)
+        elif child.tag == odt_text + 'tab':
+            add_span(para, '\t', prop)
+        elif child.tag == odt_text + 'line-break':
+            add_span(para, '\n', prop)
+        elif child.tag == odt_draw + 'frame':
+            para.append(get_frame(child, formulas))
+        elif child.tag not in skipped_tags:
+            # links, fields and bookmarks show their text in the line
+            add_content(para, child, prop, styles, formulas)
+        add_text(para, child.tail, prop)
+
+
+def get_para(odt_p, styles: Styles, formulas: FrozenSet[str] = frozenset()) -> Para:
+    prop, text_prop = styles.resolve('paragraph', odt_p.get(odt_text + 'style-name'))
+
+    if len(odt_p) == 0 and not odt_p.text:
+        return EmptyPara(prop=prop)
+
+    ans = Para(
+        prop=prop,
+    )
+    add_content(ans, odt_p, text_prop, styles, formulas)
+    return ans
+
+
+def iter_rows(e) -> Iterator:
+    for child in e:
+        if child.tag == odt_table + 'table-row':
+            for _ in range(int(child.get(odt_table + 'number-rows-repeated', '1'))):
+                yield child
+        elif child.tag in (odt_table + 'table-header-rows', odt_table + 'table-rows', odt_table + 'table-row-group'):
+            yield from iter_rows(child)
+
+
+def get_table(odt_table_e, styles: Styles, formulas: FrozenSet[str] = frozenset()) -> Table:
+    align: Optional[str] = None
+    style = styles.get('table', odt_table_e.get(odt_table + 'style-name'))
+    props = None if style is None else style.find(odt_style + 'table-properties')
+    if props is not None and props.get(odt_table + 'align') is not None:
+        if props.get(odt_table + 'align') not in table_aligns:
+            raise AlignError(props.get(odt_table + 'align'))
+        align = table_aligns[props.get(odt_table + 'align')]
+    ans = Table(
+        prop=ParaProp(
+            align=align,
+        ),
+    )
+    # merged cells are repeated, as python-docx reports them
+    above: List[Cell] = list()
+    for odt_tr in iter_rows(odt_table_e):
+        ans.append(Row())
+        spanned = 0
+        for odt_tc in odt_tr:
+            if odt_tc.tag not in (odt_table + 'table-cell', odt_table + 'covered-table-cell'):
+                continue
+            for _ in range(int(odt_tc.get(odt_table + 'number-columns-repeated', '1'))):
+                if odt_tc.tag == odt_table + 'table-cell':
+                    cell = Cell(get_para(p, styles, formulas) for p in odt_tc if p.tag in para_tags)
+                    spanned = int(odt_tc.get(odt_table + 'number-columns-spanned', '1')) - 1
+                elif spanned > 0:
+                    cell = ans[-1][-1]
+                    spanned -= 1
+                elif len(ans[-1]) < len(above):
+                    cell = above[len(ans[-1])]
+                else:
+                    cell = Cell()
+                ans[-1].append(cell)
+        above = ans[-1]
+    return ans
+
+
+def iter_blocks(e) -> Iterator:
+    # paragraphs and tables, in the lists, sections and indexes that group them
+    if e.tag in para_tags or e.tag == odt_table + 'table':
+        yield e
+        return
+    for child in e:
+        yield from iter_blocks(child)
+
+
+class MasterPages:
+    styles: Styles
+    by_name: Dict[str, object]
+    page_layouts: Dict[str, object]
+    default: Optional[str]
+    # parsed headers and footers by master page and tag, shared by every section that uses them
+    parts: Dict[Tuple[str, str], Union[Header, Footer]]
+
+    def __init__(self, styles_element, styles: Styles):
+        self.styles = styles
+        self.by_name = dict()
+        self.page_layouts = dict()
+        self.default = None
+        self.parts = dict()
+        if styles_element is None:
+            return
+        for layout in styles_element.iterfind(odt_office + 'automatic-styles/' + odt_style + 'page-layout'):
+            self.page_layouts[layout.get(odt_style + 'name')] = layout
+        for master in styles_element.iterfind(odt_office + 'master-styles/' + odt_style + 'master-page'):
+            self.by_name[master.get(odt_style + 'name')] = master
+            if self.default is None:
+                self.default = master.get(odt_style + 'name')
+        if 'Standard' in self.by_name:
+            self.default = 'Standard'
+
+    def get_part(self, name: Optional[str], tag: str) -> Union[Header, Footer]:
+        ans = self.parts.get((name, tag))
+        if ans is None:
+            ans = self.parts[name, tag] = (Header if tag.startswith('header') else Footer)(self.parse(name, tag))
+        return ans
+
+    def parse(self, name: Optional[str], tag: str) -> List[Para]:
+        master = self.by_name.get(name)
+        part = None if master is None else master.find(odt_style + tag)
+        if part is None or part.get(odt_style + 'display') == 'false':
+            # a blank paragraph in the Header/Footer style, as the DOCX engines read an undefined part
+            return [Para(prop=self.styles.resolve('paragraph', tag.split('-')[0].capitalize())[0])]
+        return [get_para(p, self.styles) for p in part if p.tag in para_tags]
+
+    def has_part(self, master, tag: str) -> bool:
+        part = None if master is None else master.find(odt_style + tag)
+        return part is not None and part.get(odt_style + 'display') != 'false'
+
+    def get(self, name: Optional[str]) -> MasterPage:
+        if name not in self.by_name:
+            name = self.default
+        master = self.by_name.get(name)
+        layout = None if master is None else self.page_layouts.get(master.get(odt_style + 'page-layout-name'))
+        props = None if layout is None else layout.find(odt_style + 'page-layout-properties')
+        if props is None:
+            props = etree.Element(odt_style + 'page-layout-properties')
+
+        # the page margins reach the header and footer; the body starts after them and their spacing,
+        # where DOCX puts w:pgMar top and bottom
+        header_distance = get_emu(props.get(odt_fo + 'margin-top')) or 0
+        footer_distance = get_emu(props.get(odt_fo + 'margin-bottom')) or 0
+        top, bottom = header_distance, footer_distance
+        for tag, spacing in (('header', 'margin-bottom'), ('footer', 'margin-top')):
+            hf_props = None if layout is None else layout.find(
+                odt_style + tag + '-style/' + odt_style + 'header-footer-properties')
+            if hf_props is None or not self.has_part(master, tag):
+                continue
+            height = get_emu(hf_props.get(odt_fo + 'min-height') or hf_props.get(odt_svg + 'height')) or 0
+            height += get_emu(hf_props.get(odt_fo + spacing)) or 0
+            if tag == 'header':
+                top += height
+            else:
+                bottom += height
+
+        ans = MasterPage(
+            page_layout=PageLayout(
+                prop=PageProp(
+                    margin_bottom=get_size(bottom, 'cm') - get_size(footer_distance, 'cm'),
+                    margin_left=get_length(props.get(odt_fo + 'margin-left'), 'cm'),
+                    margin_right=get_length(props.get(odt_fo + 'margin-right'), 'cm'),
+                    margin_top=get_size(top, 'cm') - get_size(header_distance, 'cm'),
+
+                    page_height=get_length(props.get(odt_fo + 'page-height'), 'cm'),
+                    page_width=get_length(props.get(odt_fo + 'page-width'), 'cm'),
+                ),
+                header_style=HeaderStyle(
+                    margin_top=get_size(header_distance, 'cm'),
+                ),
+                footer_style=FooterStyle(
+                    margin_bottom=get_size(footer_distance, 'cm'),
+                )
+            ),
+            header=self.get_part(name, 'header'),
+            header_first=Header(),
+            footer=self.get_part(name, 'footer'),
+            footer_first=Footer(),
+        )
+        if self.has_part(master, 'header-first'):
+            ans.header_first = self.get_part(name, 'header-first')
+        else:
+            ans.header_first = ans.header
+        if self.has_part(master, 'footer-first'):
+            ans.footer_first = self.get_part(name, 'footer-first')
+
+        return ans
+
+
+def iter_doc(package: Package) -> Iterator[Element]:
+    # a master page is yielded before the paragraph or table that starts it, there is no section to hold
+    styles_element = package.get_part('styles.xml')
+    master_styles = Styles()
+    if styles_element is not None:
+        for e in styles_element:
+            if e.tag in (odt_office + 'font-face-decls', odt_office + 'styles', odt_office + 'automatic-styles'):
+                master_styles.add(e)
+    master_pages = MasterPages(styles_element, master_styles)
+    styles = Styles(master_styles)
+
+    has_master_page = False
+    try:
+        for e in package.iter_body():
+            if e.tag in (odt_office + 'font-face-decls', odt_office + 'automatic-styles'):
+                styles.add(e)
+                continue
+            for block in iter_blocks(e):
+                name = styles.get_master_page_name(block)
+                if name is not None or not has_master_page:
+                    yield master_pages.get(name)
+                    has_master_page = True
+                if block.tag == odt_table + 'table':
+                    yield get_table(block, styles, package.formulas)
+                    continue
+                yield get_para(block, styles, package.formulas)
+                break_before, break_after = styles.get_page_breaks(block)
+                # the DOCX engines put the break of a paragraph after it; a new master page breaks already
+                if (break_before and name is None) or break_after:
+                    yield Break('page')
+        if not has_master_page:
+            yield master_pages.get(None)
+    finally:
+        with style_cache_lock:
+            style_cache_stats['hits'] += styles.hits + master_styles.hits
+            style_cache_stats['misses'] += styles.misses + master_styles.misses
+
+
+def get_doc(package: Package) -> Doc:
+    return Doc(iter_doc(package))
+
+
+def read_doc(zip_file: zipfile.ZipFile) -> Iterator[Element]:
+    # the zip file stays open until the last element has been read
+    with zip_file:
+        yield from iter_doc(Package(zip_file))
+
+
+def main(filename: Union[str, bytes, BinaryIO], compact: bool = False, mapped: bool = False) -> Doc:
+    if compact:
+        with open_zip(filename, mapped) as zip_file:
+            return CompactDoc(iter_doc(Package(zip_file)))
+    return LazyDoc(read_doc(open_zip(filename, mapped)))
@@ -0,0 +1,805 @@
+import codecs
+import mmap
+import re
+from typing import Union, Optional, List, Dict, Tuple, Iterator, BinaryIO, Any
+
+from core.pp.elements import *
+from core.pp.properties import *
+from core.pp.engines.docx_stream import get_size
+
+CONTROL_WORD, CONTROL_SYMBOL, GROUP_START, GROUP_END, TEXT = range(5)
+
+token_pattern = re.compile(
+    # text with the bytes (\'hh) and characters (\uN) escaped in it, so that a line of text is one token
+    rb"((?:[^\\{}\r\n]+|\\'[0-9a-fA-F]{2}|\\u-?[0-9]{1,5} ?)+)"
+    rb"|\\([a-zA-Z]{1,32})(-?[0-9]{1,10})? ?"  # a control word, its parameter and the space ending it
+    rb"|\\([^a-zA-Z'])"  # a control symbol
+    rb"|([{}])"
+    rb"|[\r\n]+"  # line ends are not text
+    rb"|\\",
+    re.S,
+)
+escape_pattern = re.compile(rb"\\'([0-9a-fA-F]{2})|\\u(-?[0-9]{1,5}) ?")
+
+# destinations whose text is not part of the document
+skipped_destinations = frozenset((
+    'colortbl', 'stylesheet', 'info', 'listtable', 'listoverridetable', 'rsidtbl', 'generator', 'xmlnstbl',
+    'themedata', 'colorschememapping', 'latentstyles', 'datastore', 'filetbl', 'revtbl', 'pgdsctbl', 'fldinst',
+    'nonshppict', 'footnote', 'annotation', 'atnid', 'atnauthor', 'bkmkstart', 'bkmkend', 'mmathPr', 'mmathPict',
+    'txfieldtext', 'template', 'docvar', 'userprops', 'listtext', 'pntext', 'pntxta', 'pntxtb', 'upr', 'ftnsep',
+    'ftnsepc', 'ftncn', 'aftnsep', 'aftnsepc', 'aftncn', 'objdata', 'datafield', 'falt', 'panose', 'title',
+    'author', 'operator', 'comment', 'company', 'doccomm', 'keywords', 'subject', 'category', 'manager',
+))
+# read, though they are marked as optional with \*
+optional_destinations = frozenset(('shppict', 'objclass', 'moMath', 'moMathPara'))
+math_destinations = frozenset(('mmath', 'moMath', 'moMathPara'))
+header_footer_destinations: Dict[str, str] = {
+    'header': 'header',
+    'headerr': 'header',
+    'headerf': 'header_first',
+    'headerl': 'header_left',
+    'footer': 'footer',
+    'footerr': 'footer',
+    'footerf': 'footer_first',
+    'footerl': 'footer_left',
+}
+
+aligns: Dict[str, str] = {
+    'ql': 'left',
+    'qc': 'center',
+    'qr': 'right',
+    'qj': 'justify',
+}
+
+table_aligns: Dict[str, str] = {
+    'trql': 'left',
+    'trqc': 'center',
+    'trqr': 'right',
+}
+
+special_chars: Dict[str, str] = {
+    'tab': '\t',
+    'line': '\n',
+    'emdash': '—',
+    'endash': '–',
+    'emspace': ' ',
+    'enspace': ' ',
+    'qmspace': ' ',
+    'bullet': '•',
+    'lquote': '‘',
+    'rquote': '’',
+    'ldblquote': '“',
+    'rdblquote': '”',
+}
+
+special_symbols: Dict[str, str] = {
+    '\\': '\\',
+    '{': '{',
+    '}': '}',
+    '~': '\xa0',
+    '_': '-',
+}
+
+code_pages_by_charset: Dict[int, str] = {
+    128: 'cp932',
+    129: 'cp949',
+    134: 'cp936',
+    136: 'cp950',
+    161: 'cp1253',
+    162: 'cp1254',
+    177: 'cp1255',
+    178: 'cp1256',
+    186: 'cp1257',
+    204: 'cp1251',
+    222: 'cp874',
+    238: 'cp1250',
+}
+
+# page and margins in twips when the document does not give them
+document_defaults: Dict[str, int] = {
+    'paperw': 12240,
+    'paperh': 15840,
+    'margl': 1800,
+    'margr': 1800,
+    'margt': 1440,
+    'margb': 1440,
+}
+
+section_words: Dict[str, str] = {
+    'pgwsxn': 'paperw',
+    'pghsxn': 'paperh',
+    'marglsxn': 'margl',
+    'margrsxn': 'margr',
+    'margtsxn': 'margt',
+    'margbsxn': 'margb',
+}
+
+
+# every word Reader.control_word acts on
+control_words = frozenset((
+    'pard', 'plain', 'sl', 'slmult', 'f', 'dbch', 'loch', 'hich', 'af', 'fs', 'b', 'par', 'intbl', 'cell', 'u', 'uc',
+    'expndtw', 'expnd', 'row', 'trowd', 'clmrg', 'clvmrg', 'cellx', 'page', 'sect', 'sectd', 'headery', 'footery',
+    'titlepg', 'fcharset', 'deff', 'stshfdbch', 'ansicpg', 'mac', 'pc', 'pca',
+)) | aligns.keys() | special_chars.keys() | table_aligns.keys() | section_words.keys() | document_defaults.keys()
+
+
+def tokenize(data: Union[bytes, mmap.mmap]) -> Iterator[Tuple[int, Any, Optional[int]]]:
+    pos = 0
+    while True:
+        for m in token_pattern.finditer(data, pos):
+            kind = m.lastindex
+            if kind == 1:
+                yield TEXT, m.group(1), None
+            elif kind == 2 or kind == 3:
+                word = m.group(2).decode('ascii')
+                param = None if kind == 2 else int(m.group(3))
+                if word == 'bin' and param:
+                    # raw bytes of a picture or an object, never text; the scan goes on after them
+                    pos = m.end() + param
+                    break
+                yield CONTROL_WORD, word, param
+            elif kind == 4:
+                yield CONTROL_SYMBOL, m.group(4).decode('latin-1'), None
+            elif kind == 5:
+                yield GROUP_START if m.group(5) == b'{' else GROUP_END, None, None
+        else:
+            return
+
+
+class ParaBuilder:
+    items: List[Union[Span, Frame]]
+    texts: List[str]
+    prop: Optional[TextProp]
+    page_break: bool
+    # paragraphs of a header or footer; None in the body, whose paragraphs are yielded
+    paras: Optional[List[Para]]
+
+    def __init__(self, paras: Optional[List[Para]] = None):
+        self.items = list()
+        self.texts = list()
+        self.prop = None
+        self.page_break = False
+        self.paras = paras
+
+    def add_text(self, text: str, prop: TextProp):
+        if prop is not self.prop:
+            self.close_span()
+            self.prop = prop
+        self.texts.append(text)
+
+    def add_frame(self, frame: Frame):
+        self.close_span()
+        self.items.append(frame)
+
+    def close_span(self):
+        if len(self.texts) == 0:
+            return
+        text = ''.join(self.texts)
+        self.texts = list()
+        if text == '':
+            return
+        span = Span(text)
+        span.prop = self.prop
+        self.items.append(span)
+
+    def has_content(self) -> bool:
+        return len(self.items) > 0 or any(self.texts)
+
+    def build(self, prop: ParaProp) -> Para:
+        self.close_span()
+        ans = EmptyPara(prop=prop) if len(self.items) == 0 else Para(prop=prop)
+        ans.extend(self.items)
+        self.items = list()
+        return ans
+
+
+class State:
+    # everything a group restores when it ends
+    __slots__ = ('font', 'font_asia', 'size', 'bold', 'letter_spacing', 'double_byte', 'uc', 'align', 'line',
+                 'line_multiple', 'in_table', 'skip', 'destination', 'part', 'builder', 'object_class', 'text_prop')
+
+    font: Optional[int]
+    font_asia: Optional[int]
+    size: Optional[int]
+    bold: Optional[bool]
+    letter_spacing: Optional[Size]
+    double_byte: bool
+    uc: int
+    align: Optional[str]
+    line: Optional[int]
+    line_multiple: bool
+    in_table: bool
+    skip: bool
+    destination: Optional[str]
+    # the kind of header or footer being read
+    part: Optional[str]
+    builder: ParaBuilder
+    object_class: Optional[bytearray]
+    text_prop: Optional[TextProp]
+
+    def __init__(self, builder: ParaBuilder):
+        self.font = None
+        self.font_asia = None
+        self.size = 24
+        self.bold = None
+        self.letter_spacing = None
+        self.double_byte = False
+        self.uc = 1
+        self.align = None
+        self.line = None
+        self.line_multiple = False
+        self.in_table = False
+        self.skip = False
+        self.destination = None
+        self.part = None
+        self.builder = builder
+        self.object_class = None
+        self.text_prop = None
+
+    def copy(self) -> 'State':
+        ans = State.__new__(State)
+        for name in State.__slots__:
+            setattr(ans, name, getattr(self, name))
+        return ans
+
+
+class Reader:
+    fonts: Dict[int, Tuple[str, Optional[str]]]
+    code_page: str
+    default_font: Optional[int]
+    default_font_asia: Optional[int]
+    state: State
+    stack: List[State]
+    out: List[Element]
+    group_start: bool
+    optional: bool
+    pending: bytearray
+    skip_chars: int
+    font_index: Optional[int]
+    font_code_page: Optional[str]
+    font_name: bytearray
+    text_props: Dict[Tuple[Any, ...], TextProp]
+    para_props: Dict[Tuple[Any, ...], ParaProp]
+    document: Dict[str, int]
+    section: Dict[str, int]
+    section_started: bool
+    # headers and footers by kind, shared by every section until one defines its own
+    parts: Dict[str, Union[Header, Footer]]
+    table: Optional[Table]
+    row: Row
+    cell: Cell
+    row_align: Optional[str]
+    merges: List[Optional[str]]
+    merge: Optional[str]
+
+    def __init__(self):
+        self.fonts = dict()
+        self.code_page = 'cp1252'
+        self.default_font = None
+        self.default_font_asia = None
+        self.state = State(ParaBuilder())
+        self.stack = list()
+        self.out = list()
+        self.group_start = False
+        self.optional = False
+        self.pending = bytearray()
+        self.skip_chars = 0
+        self.font_index = None
+        self.font_code_page = None
+        self.font_name = bytearray()
+        self.text_props = dict()
+        self.para_props = dict()
+        self.document = dict(document_defaults)
+        self.section = dict()
+        self.section_started = False
+        self.parts = dict()
+        self.table = None
+        self.row = Row()
+        self.cell = Cell()
+        self.row_align = None
+        self.merges = list()
+        self.merge = None
+
+    def read(self, data: Union[bytes, mmap.mmap]) -> Iterator[Element]:
+        out = self.out
+        pending = self.pending
+        # by how often they come
+        for kind, value, param in tokenize(data):
+            if kind == CONTROL_WORD:
+                if self.state.skip:
+                    continue
+                if pending:
+                    self.flush_text()
+                if self.group_start:
+                    self.group_start = False
+                    if self.start_destination(value):
+                        continue
+                self.control_word(value, param)
+                if out:
+                    yield from out
+                    out.clear()
+            elif kind == TEXT:
+                if self.state.skip:
+                    continue
+                self.group_start = False
+                if b'\\' in value:
+                    self.add_escaped(value)
+                else:
+                    self.add_bytes(value)
+            elif kind == GROUP_START:
+                if pending:
+                    self.flush_text()
+                self.stack.append(self.state)
+                self.state = self.state.copy()
+                self.group_start = True
+                self.optional = False
+            elif kind == GROUP_END:
+                if pending:
+                    self.flush_text()
+                self.end_group()
+                self.group_start = False
+            elif not self.state.skip:
+                if pending:
+                    self.flush_text()
+                if value == '*' and self.group_start:
+                    # the next control word names a destination that may be unknown to us
+                    self.optional = True
+                    continue
+                self.group_start = False
+                if value in special_symbols:
+                    self.add_text(special_symbols[value])
+                elif value in '\r\n':
+                    self.end_para()
+                    yield from out
+                    out.clear()
+        self.flush_text()
+        self.end_document()
+        yield from out
+        out.clear()
+
+    def add_escaped(self, value: bytes):
+        # the line is added as one text; bytes are decoded together, as a character of two bytes
+        # may be split over two escapes
+        state = self.state
+        pending = self.pending
+        skip_chars = self.skip_chars
+        parts: List[str] = list()
+        pos = 0
+        for m in escape_pattern.finditer(value):
+            start = m.start()
+            if start > pos:
+                if skip_chars > 0:
+                    n = min(skip_chars, start - pos)
+                    skip_chars -= n
+                    pos += n
+                pending += value[pos:start]
+            byte, code = m.groups()
+            if byte is not None:
+                if skip_chars > 0:
+                    skip_chars -= 1
+                else:
+                    pending.append(int(byte, 16))
+            else:
+                if state.destination is None:
+                    if pending:
+                        parts.append(self.decode_pending())
+                    code = int(code)
+                    parts.append(chr(code + 65536 if code < 0 else code))
+                # the characters that follow stand for it in readers without Unicode
+                skip_chars = state.uc
+            pos = m.end()
+        self.skip_chars = skip_chars
+        if pos < len(value):
+            self.add_bytes(value[pos:])
+        if parts:
+            if pending:
+                parts.append(self.decode_pending())
+            self.add_text(''.join(parts))
+
+    def add_bytes(self, value: bytes):
+        if self.skip_chars > 0:
+            n = min(self.skip_chars, len(value))
+            self.skip_chars -= n
+            value = value[n:]
+        self.pending += value
+
+    def flush_text(self):
+        if len(self.pending) == 0:
+            return
+        state = self.state
+        if state.destination == 'fonttbl':
+            self.font_name += self.pending
+            self.pending.clear()
+            # font names end with a semicolon
+            while b';' in self.font_name:
+                name, _, rest = self.font_name.partition(b';')
+                self.add_font(bytes(name))
+                self.font_name = bytearray(rest)
+            return
+        if state.destination == 'objclass':
+            if state.object_class is not None:
+                state.object_class += self.pending
+            self.pending.clear()
+            return
+        self.add_text(self.decode_pending())
+
+    def decode_pending(self) -> str:
+        state = self.state
+        font = state.font_asia if state.double_byte else state.font
+        code_page = self.fonts.get(font, (None, None))[1] or self.code_page
+        ans = self.pending.decode(code_page, errors='replace')
+        self.pending.clear()
+        return ans
+
+    def add_text(self, text: str):
+        if self.state.destination is not None:
+            return
+        self.state.builder.add_text(text, self.get_text_prop())
+
+    def add_font(self, name: bytes):
+        if self.font_index is not None:
+            name = name.strip()
+            self.fonts[self.font_index] = (
+                name.decode(self.font_code_page or self.code_page, errors='replace'), self.font_code_page)
+        self.font_index = None
+        self.font_code_page = None
+
+    def get_text_prop(self) -> TextProp:
+        state = self.state
+        if state.text_prop is not None:
+            return state.text_prop
+        key = state.font, state.font_asia, state.size, state.bold, state.letter_spacing
+        ans = self.text_props.get(key)
+        if ans is None:
+            ans = self.text_props[key] = TextProp(
+                font=Font(
+                    name=self.fonts.get(state.font, (None, None))[0],
+                    name_asia=self.fonts.get(state.font_asia, (None, None))[0],
+                    size=None if state.size is None else get_size(state.size * 6350, 'pt'),
+                    weight=None if state.bold is None else 'bold' if state.bold else 'normal',
+                ),
+                letter_spacing=state.letter_spacing,
+            )
+        state.text_prop = ans
+        return ans
+
+    def get_para_prop(self, state: State) -> ParaProp:
+        key = state.align, state.line, state.line_multiple
+        ans = self.para_props.get(key)
+        if ans is None:
+            line_height: Optional[Size] = None
+            if state.line:
+                if state.line_multiple:
+                    # \slmult1 is a multiple of single lines, as lineRule="auto" in DOCX
+                    line_height = abs(state.line) * 635 / 152400
+                else:
+                    # exact when negative, at least when positive
+                    line_height = get_size(abs(state.line) * 635, 'pt')
+            ans = self.para_props[key] = ParaProp(
+                align=state.align,
+                line_height=line_height,
+            )
+        return ans
+
+    def start_destination(self, word: str) -> bool:
+        state = self.state
+        optional = self.optional
+        self.optional = False
+        if word == 'fonttbl':
+            state.destination = 'fonttbl'
+        elif word in skipped_destinations or (optional and word not in optional_destinations):
+            state.skip = True
+        elif word in header_footer_destinations:
+            state.builder = ParaBuilder(list())
+            state.part = header_footer_destinations[word]
+        elif word == 'pict':
+            state.builder.add_frame(Frame(anchor_type='as-char', obj=Image()))
+            state.skip = True
+        elif word == 'shp':
+            # a floating shape, whose picture is repeated in the \shprslt fallback
+            state.builder.add_frame(Frame(anchor_type='other', obj=Image()))
+            state.skip = True
+        elif word in math_destinations:
+            state.builder.add_frame(Frame(anchor_type='as-char', obj=Math()))
+            state.skip = True
+        elif word == 'object':
+            state.object_class = bytearray()
+        elif word == 'objclass':
+            state.destination = 'objclass'
+        elif word == 'result':
+            # the picture of an equation object stands for the equation itself
+            if self.is_equation(state.object_class):
+                state.skip = True
+        else:
+            return False
+        return True
+
+    @staticmethod
+    def is_equation(object_class: Optional[bytearray]) -> bool:
+        return object_class is not None and object_class.startswith(b'Equation')
+
+    def end_group(self):
+        ended = self.state
+        if len(self.stack) == 0:
+            return
+        self.state = self.stack.pop()
+        self.skip_chars = 0
+        if ended.destination == 'fonttbl' and self.state.destination != 'fonttbl':
+            self.font_name.clear()
+        elif ended.destination == 'fonttbl' and len(self.font_name) > 0:
+            # the last name in a font group may lack its semicolon
+            self.add_font(bytes(self.font_name))
+            self.font_name.clear()
+        if ended.builder is not self.state.builder and ended.part is not None:
+            builder = ended.builder
+            if builder.has_content():
+                builder.paras.append(builder.build(self.get_para_prop(ended)))
+            self.parts[ended.part] = (Header if ended.part.startswith('header') else Footer)(builder.paras)
+        if ended.object_class is not None and ended.object_class is not self.state.object_class:
+            if self.is_equation(ended.object_class):
+                self.state.builder.add_frame(Frame(anchor_type='as-char', obj=Math()))
+
+    def control_word(self, word: str, param: Optional[int]):
+        # most words in Word's RTF are revision marks and the like, which are dropped here at once
+        if word not in control_words:
+            return
+        state = self.state
+        if word == 'pard':
+            state.align = None
+            state.line = None
+            state.line_multiple = False
+            state.in_table = False
+        elif word == 'plain':
+            state.font = self.default_font
+            state.font_asia = self.default_font_asia
+            state.size = 24
+            state.bold = None
+            state.letter_spacing = None
+            state.double_byte = False
+            state.text_prop = None
+        elif word in aligns:
+            state.align = aligns[word]
+        elif word == 'sl':
+            state.line = param
+        elif word == 'slmult':
+            state.line_multiple = param == 1
+        elif word == 'f':
+            if state.destination == 'fonttbl':
+                self.font_index = param
+                self.font_name.clear()
+            else:
+                state.font = param
+                state.text_prop = None
+        elif word == 'dbch':
+            state.double_byte = True
+        elif word == 'loch' or word == 'hich':
+            state.double_byte = False
+        elif word == 'af':
+            # the East Asian font of \dbch text; other associated fonts are for complex scripts
+            if state.double_byte:
+                state.font_asia = param
+                state.text_prop = None
+        elif word == 'fs':
+            state.size = param
+            state.text_prop = None
+        elif word == 'b':
+            state.bold = param != 0
+            state.text_prop = None
+        elif word == 'par':
+            self.end_para()
+        elif word == 'intbl':
+            state.in_table = True
+        elif word == 'cell':
+            self.end_cell()
+        elif word in special_chars:
+            self.add_text(special_chars[word])
+        elif word == 'u':
+            self.add_text(chr(param + 65536 if param < 0 else param))
+            self.skip_chars = state.uc
+        elif word == 'uc':
+            state.uc = param or 0
+        elif word == 'expndtw':
+            state.letter_spacing = None if not param else Length(param / 20, 'pt')
+            state.text_prop = None
+        elif word == 'expnd':
+            state.letter_spacing = None if not param else Length(param / 4, 'pt')
+            state.text_prop = None
+        elif word == 'row':
+            self.end_row()
+        elif word == 'trowd':
+            self.row_align = None
+            self.merges = list()
+            self.merge = None
+        elif word in table_aligns:
+            self.row_align = table_aligns[word]
+        elif word == 'clmrg':
+            self.merge = 'left'
+        elif word == 'clvmrg':
+            self.merge = 'above'
+        elif word == 'cellx':
+            self.merges.append(self.merge)
+            self.merge = None
+        elif word == 'page':
+            state.builder.page_break = True
+        elif word == 'sect':
+            self.end_section()
+        elif word == 'sectd':
+            self.section = dict()
+        elif word in section_words:
+            self.section[section_words[word]] = param
+        elif word in document_defaults:
+            self.document[word] = param
+        elif word == 'headery' or word == 'footery':
+            self.section[word] = param
+        elif word == 'titlepg':
+            self.section['titlepg'] = 1
+        elif word == 'fcharset':
+            if state.destination == 'fonttbl':
+                self.font_code_page = code_pages_by_charset.get(param)
+        elif word == 'deff':
+            self.default_font = state.font = param
+        elif word == 'stshfdbch':
+            self.default_font_asia = state.font_asia = param
+        elif word == 'ansicpg':
+            try:
+                self.code_page = codecs.lookup('cp{}'.format(param)).name
+            except LookupError:
+                pass
+        elif word == 'mac':
+            self.code_page = 'mac_roman'
+        elif word == 'pc':
+            self.code_page = 'cp437'
+        elif word == 'pca':
+            self.code_page = 'cp850'
+
+    def emit(self, e: Element):
+        # the master page of a section goes before its first element
+        if not self.section_started:
+            self.out.append(self.get_master_page())
+            self.section_started = True
+        self.out.append(e)
+
+    def end_table(self):
+        if self.table is not None:
+            table = self.table
+            self.table = None
+            self.emit(table)
+
+    def end_para(self):
+        state = self.state
+        builder = state.builder
+        para = builder.build(self.get_para_prop(state))
+        if builder.paras is not None:
+            builder.paras.append(para)
+        elif state.in_table:
+            self.cell.append(para)
+        else:
+            self.end_table()
+            self.emit(para)
+            # the DOCX engines put the break of a paragraph after it
+            if builder.page_break:
+                self.emit(Break('page'))
+        builder.page_break = False
+
+    def end_cell(self):
+        if self.state.builder.paras is not None:
+            self.end_para()
+            return
+        self.cell.append(self.state.builder.build(self.get_para_prop(self.state)))
+        self.state.builder.page_break = False
+        self.row.append(self.cell)
+        self.cell = Cell()
+
+    def end_row(self):
+        if self.state.builder.paras is not None:
+            return
+        # merged cells are repeated, as python-docx reports them
+        above = self.table[-1] if self.table is not None and len(self.table) > 0 else Row()
+        for i in range(len(self.row)):
+            merge = self.merges[i] if i < len(self.merges) else None
+            if merge == 'left' and i > 0:
+                self.row[i] = self.row[i - 1]
+            elif merge == 'above' and i < len(above):
+                self.row[i] = above[i]
+        if self.table is None:
+            self.table = Table(
+                prop=ParaProp(
+                    align=self.row_align,
+                ),
+            )
+        self.table.append(self.row)
+        self.row = Row()
+        self.cell = Cell()
+
+    def end_section(self):
+        if self.state.builder.has_content():
+            self.end_para()
+        self.end_table()
+        if not self.section_started:
+            self.out.append(self.get_master_page())
+        self.section_started = False
+
+    def end_document(self):
+        self.state = self.stack[0] if len(self.stack) > 0 else self.state
+        if self.state.builder.has_content():
+            self.end_para()
+        self.end_table()
+        if not self.section_started:
+            self.out.append(self.get_master_page())
+            self.section_started = True
+
+    def get_part(self, kind: str) -> Union[Header, Footer]:
+        ans = self.parts.get(kind)
+        if ans is None:
+            # a blank paragraph, as the DOCX engines read an undefined part
+            ans = self.parts[kind] = (Header if kind.startswith('header') else Footer)([Para(prop=ParaProp())])
+        return ans
+
+    def get_master_page(self) -> MasterPage:
+        def get_twips(word: str) -> int:
+            return self.section.get(word, self.document[word]) * 635
+
+        header_distance = get_size(self.section.get('headery', 720) * 635, 'cm')
+        footer_distance = get_size(self.section.get('footery', 720) * 635, 'cm')
+        ans = MasterPage(
+            page_layout=PageLayout(
+                prop=PageProp(
+                    margin_bottom=get_size(get_twips('margb'), 'cm') - footer_distance,
+                    margin_left=get_size(get_twips('margl'), 'cm'),
+                    margin_right=get_size(get_twips('margr'), 'cm'),
+                    margin_top=get_size(get_twips('margt'), 'cm') - header_distance,
+
+                    page_height=get_size(get_twips('paperh'), 'cm'),
+                    page_width=get_size(get_twips('paperw'), 'cm'),
+                ),
+                header_style=HeaderStyle(
+                    margin_top=header_distance,
+                ),
+                footer_style=FooterStyle(
+                    margin_bottom=footer_distance,
+                )
+            ),
+            header=self.get_part('header'),
+            header_first=Header(),
+            footer=self.get_part('footer'),
+            footer_first=Footer(),
+        )
+        if self.section.get('titlepg'):
+            ans.header_first = self.get_part('header_first')
+            ans.footer_first = self.get_part('footer_first')
+        else:
+            ans.header_first = ans.header
+
+        return ans
+
+
+def iter_doc(data: Union[bytes, mmap.mmap]) -> Iterator[Element]:
+    return Reader().read(data)
+
+
+def get_doc(data: Union[bytes, mmap.mmap]) -> Doc:
+    return Doc(iter_doc(data))
+
+
+def read_doc(filename: str) -> Iterator[Element]:
+    # the file stays mapped until the last element has been read
+    with open(filename, 'rb') as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield from iter_doc(data)
+
+
+def main(filename: Union[str, bytes, BinaryIO], compact: bool = False, mapped: bool = False) -> Doc:
+    # mapped reads a file on disk through a memory map instead of into memory
+    if isinstance(filename, str):
+        if mapped:
+            source = read_doc(filename)
+        else:
+            with open(filename, 'rb') as file:
+                source = iter_doc(file.read())
+    elif isinstance(filename, (bytes, bytearray, memoryview)):
+        source = iter_doc(bytes(filename))
+    else:
+        source = iter_doc(filename.read())
+    if compact:
+        return CompactDoc(source)
+    return LazyDoc(source)
@@ -1,4 +1,7 @@
-from typing import Optional, Union
+import threading
+from functools import lru_cache
+from typing import Optional, Union, Tuple, Any
+from weakref import WeakValueDictionary
 from yaml import YAMLObject
 
 from core.comm import satisfy, inherent, EnumError, NotMatched
@@ -13,32 +16,114 @@ class ParaNotPure(PropNotMatched):
 
 
 class ParaEmpty(ParaNotPure):
-    pass
+    prop = 'empty'
 
 
 class ParaComplex(ParaNotPure):
-    pass
+    prop = 'complex'
 
 
 class UnitError(EnumError):
     pass
 
 
+# frozen property values; equal values are interned into one instance, so == is an identity check
+class Prop(YAMLObject):
+    __slots__ = ('__weakref__',)
+
+    pool: WeakValueDictionary
+    pool_lock: threading.Lock
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.pool = WeakValueDictionary()
+        cls.pool_lock = threading.Lock()
+
+    @classmethod
+    def intern(cls, *values):
+        key = tuple(exact(value) for value in values)
+        ans = cls.pool.get(key)
+        if ans is None:
+            with cls.pool_lock:
+                ans = cls.pool.get(key)
+                if ans is None:
+                    ans = object.__new__(cls)
+                    for name, value in zip(cls.__slots__, values):
+                        object.__setattr__(ans, name, value)
+                    cls.pool[key] = ans
+        return ans
+
+    def values(self) -> Tuple[Any, ...]:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('{} is immutable'.format(type(self).__name__))
+
+    def __delattr__(self, name):
+        raise AttributeError('{} is immutable'.format(type(self).__name__))
+
+    def __reduce__(self):
+        return type(self), self.values()
+
+    def __getstate__(self):
+        return dict(zip(self.__slots__, self.values()))
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, ', '.join(
+            '{}={!r}'.format(name, value) for name, value in zip(self.__slots__, self.values())))
+
+    @classmethod
+    def from_yaml(cls, loader, node):
+        return cls(**loader.construct_mapping(node, deep=True))
+
+    def __inherent__(self, other):
+        if other is None:
+            return self
+        return inherent_fields(self, other)
+
+
+@lru_cache(maxsize=4096)
+def inherent_fields(child: Prop, parent: Prop) -> Prop:
+    return type(child)(*(inherent(c, p) for c, p in zip(child.values(), parent.values())))
+
+
 class Length(YAMLObject):
     yaml_tag = '!Length'
 
+    __slots__ = ('value', 'unit')
+
     value: float
     unit: str
 
     def __init__(self, value: float, unit: str):
-        self.value = value
-        self.unit = unit
+        object.__setattr__(self, 'value', value)
+        object.__setattr__(self, 'unit', unit)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Length is immutable')
 
     def __eq__(self, other):
-        if other is None:
-            return False
+        if not isinstance(other, Length):
+            return NotImplemented
         return self.unit == other.unit and 0.01 > self.value - other.value > -0.01
 
+    def __hash__(self):
+        # lengths within 0.01 are equal, so only the unit can take part in the hash
+        return hash(self.unit)
+
+    def __reduce__(self):
+        return Length, (self.value, self.unit)
+
+    def __getstate__(self):
+        return {'value': self.value, 'unit': self.unit}
+
+    def __repr__(self):
+        return 'Length({!r}, {!r})'.format(self.value, self.unit)
+
+    @classmethod
+    def from_yaml(cls, loader, node):
+        return cls(**loader.construct_mapping(node, deep=True))
+
     def __str__(self):
         return str(self.value) + ' ' + self.unit
 
@@ -51,6 +136,22 @@ class Length(YAMLObject):
         return Length(self.value - other.value, self.unit)
 
 
+def exact(value: Any) -> Any:
+    # lengths compare with a tolerance, which must not fold distinct lengths into one key
+    if type(value) is Length:
+        return Length, value.value, value.unit
+    return value
+
+
+def similar(a: Any, b: Any) -> bool:
+    # equal as the checker sees them: interned properties that differ only by lengths within the tolerance
+    if a is b:
+        return True
+    if isinstance(a, Prop) and type(a) is type(b):
+        return all(similar(x, y) for x, y in zip(a.values(), b.values()))
+    return a == b
+
+
 Size = Union[Length, float]
 
 
@@ -59,32 +160,34 @@ class TextPropNotMatched(PropNotMatched):
 
 
 class NameNotMatched(TextPropNotMatched):
-    pass
+    prop = 'name'
 
 
 class NameAsiaNotMatched(TextPropNotMatched):
-    pass
+    prop = 'name_asia'
 
 
 class SizeNotMatched(TextPropNotMatched):
-    pass
+    prop = 'size'
 
 
 class SizeAsiaNotMatched(TextPropNotMatched):
-    pass
+    prop = 'size_asia'
 
 
 class WeightNotMatched(TextPropNotMatched):
-    pass
+    prop = 'weight'
 
 
 class WeightAsiaNotMatched(TextPropNotMatched):
-    pass
+    prop = 'weight_asia'
 
 
-class Font(YAMLObject):
+class Font(Prop):
     yaml_tag = '!Font'
 
+    __slots__ = ('name', 'name_asia', 'size', 'size_asia', 'weight', 'weight_asia')
+
     name: Optional[str]
 
     name_asia: Optional[str]
@@ -97,28 +200,15 @@ class Font(YAMLObject):
 
     weight_asia: Optional[str]
 
-    def __init__(self,
-                 name: Optional[str] = None,
-                 name_asia: Optional[str] = None,
-                 size: Optional[Size] = None,
-                 size_asia: Optional[Size] = None,
-                 weight: Optional[str] = None,
-                 weight_asia: Optional[str] = None,
-                 ):
-        self.name = name
-        self.name_asia = name_asia
-        self.size = size
-        self.size_asia = size_asia
-        self.weight = weight
-        self.weight_asia = weight_asia
-
-    def __eq__(self, other):
-        return self.name == other.name \
-               and self.name_asia == other.name_asia \
-               and self.size == other.size \
-               and self.size_asia == other.size_asia \
-               and self.weight == other.weight \
-               and self.weight_asia == other.weight_asia
+    def __new__(cls,
+                name: Optional[str] = None,
+                name_asia: Optional[str] = None,
+                size: Optional[Size] = None,
+                size_asia: Optional[Size] = None,
+                weight: Optional[str] = None,
+                weight_asia: Optional[str] = None,
+                ):
+        return cls.intern(name, name_asia, size, size_asia, weight, weight_asia)
 
     def __satisfy__(self, other):
 
@@ -148,39 +238,24 @@ class Font(YAMLObject):
             raise e
         return True
 
-    def __inherent__(self,
-                     other):
-        ans = self
-        if other is not None:
-            ans.name = inherent(ans.name, other.name)
-            ans.name_asia = inherent(ans.name_asia, other.name_asia)
-            ans.size = inherent(ans.size, other.size)
-            ans.size_asia = inherent(ans.size_asia, other.size_asia)
-            ans.weight = inherent(ans.weight, other.weight)
-            ans.weight_asia = inherent(ans.weight_asia, other.weight_asia)
-        return ans
-
 
 class LetterSpacingNotMatched(TextPropNotMatched):
-    pass
+    prop = 'letter_spacing'
 
 
-class TextProp(YAMLObject):
+class TextProp(Prop):
     yaml_tag = '!TextProperty'
 
+    __slots__ = ('font', 'letter_spacing')
+
     font: Font
 
     letter_spacing: Optional[Size]
 
-    def __init__(self,
-                 font: Font = Font(),
-                 letter_spacing: Optional[Size] = None):
-        self.font = font
-        self.letter_spacing = letter_spacing
-
-    def __eq__(self, other):
-        return self.font == other.font \
-               and self.letter_spacing == other.letter_spacing
+    def __new__(cls,
+                font: Optional[Font] = None,
+                letter_spacing: Optional[Size] = None):
+        return cls.intern(Font() if font is None else font, letter_spacing)
 
     def __satisfy__(self, other):
         satisfy(self.font, other.font)
@@ -190,20 +265,13 @@ class TextProp(YAMLObject):
             e.val, e.req = self.letter_spacing, other.letter_spacing
             raise e
 
-    def __inherent__(self, other):
-        ans = self
-        if other is not None:
-            ans.font = inherent(ans.font, other.font)
-            ans.letter_spacing = inherent(ans.letter_spacing, other.letter_spacing)
-        return ans
-
 
 class ParaPropNotMatched(PropNotMatched):
     pass
 
 
 class AlignNotMatched(ParaPropNotMatched):
-    pass
+    prop = 'align'
 
 
 class AlignError(EnumError):
@@ -211,22 +279,23 @@ class AlignError(EnumError):
 
 
 class LineHeightNotMatched(ParaPropNotMatched):
-    pass
+    prop = 'line_height'
 
 
-class ParaProp(YAMLObject):
+class ParaProp(Prop):
     yaml_tag = '!ParagraphProperty'
 
+    __slots__ = ('align', 'line_height')
+
     align: Optional[str]
 
     line_height: Optional[Size]
 
-    def __init__(self,
-                 align: Optional[str] = None,
-                 line_height: Optional[Size] = None,
-                 ):
-        self.align = align
-        self.line_height = line_height
+    def __new__(cls,
+                align: Optional[str] = None,
+                line_height: Optional[Size] = None,
+                ):
+        return cls.intern(align, line_height)
 
     def __satisfy__(self, other):
         if not satisfy(self.align, other.align):
@@ -238,45 +307,40 @@ class ParaProp(YAMLObject):
             e.val, e.req = self.line_height, other.line_height
             raise e
 
-    def __inherent__(self, other):
-        ans = self
-        if other is not None:
-            ans.align = inherent(ans.align, other.align)
-            ans.line_height = inherent(ans.line_height, other.line_height)
-        return ans
-
 
 class PageLayoutNotMatched(PropNotMatched):
     pass
 
 
 class MarginBottomNotMatched(PageLayoutNotMatched):
-    pass
+    prop = 'margin_bottom'
 
 
 class MarginLeftNotMatched(PageLayoutNotMatched):
-    pass
+    prop = 'margin_left'
 
 
 class MarginRightNotMatched(PageLayoutNotMatched):
-    pass
+    prop = 'margin_right'
 
 
 class MarginTopNotMatched(PageLayoutNotMatched):
-    pass
+    prop = 'margin_top'
 
 
 class PageHeightLeftNotMatched(PageLayoutNotMatched):
-    pass
+    prop = 'page_height'
 
 
 class PageWidthLeftNotMatched(PageLayoutNotMatched):
-    pass
+    prop = 'page_width'
 
 
-class PageProp(YAMLObject):
+class PageProp(Prop):
     yaml_tag = '!PageProperty'
 
+    __slots__ = ('margin_bottom', 'margin_left', 'margin_right', 'margin_top', 'page_height', 'page_width')
+
     margin_bottom: Optional[Size]
 
     margin_left: Optional[Size]
@@ -289,25 +353,16 @@ class PageProp(YAMLObject):
 
     page_width: Optional[Size]
 
-    def __init__(self,
-                 margin_bottom: Optional[Size] = None,
-                 margin_left: Optional[Size] = None,
-                 margin_right: Optional[Size] = None,
-                 margin_top: Optional[Size] = None,
-
-                 page_height: Optional[Size] = None,
-                 page_width: Optional[Size] = None,
-                 ):
-        self.margin_bottom = margin_bottom
-        self.margin_left = margin_left
-        self.margin_right = margin_right
-        self.margin_top = margin_top
+    def __new__(cls,
+                margin_bottom: Optional[Size] = None,
+                margin_left: Optional[Size] = None,
+                margin_right: Optional[Size] = None,
+                margin_top: Optional[Size] = None,
 
-        self.page_height = page_height
-        self.page_width = page_width
-
-    def __eq__(self, other):
-        return self.margin_bottom == other.margin_bottom and self.margin_left == other.margin_left and self.margin_right == other.margin_right and self.margin_top == other.margin_top and self.page_height == other.page_height and self.page_width == other.page_width
+                page_height: Optional[Size] = None,
+                page_width: Optional[Size] = None,
+                ):
+        return cls.intern(margin_bottom, margin_left, margin_right, margin_top, page_height, page_width)
 
     def __satisfy__(self, other):
         if not satisfy(self.margin_bottom, other.margin_bottom):
@@ -338,19 +393,18 @@ class PageProp(YAMLObject):
 
 
 class HeaderMarginTopNotMatched(PageLayoutNotMatched):
-    pass
+    prop = 'header_margin_top'
 
 
-class HeaderStyle(YAMLObject):
+class HeaderStyle(Prop):
     yaml_tag = '!HeaderProperty'
 
-    margin_top: Optional[Size]
+    __slots__ = ('margin_top',)
 
-    def __init__(self, margin_top: Optional[Size] = None):
-        self.margin_top = margin_top
+    margin_top: Optional[Size]
 
-    def __eq__(self, other):
-        return self.margin_top == other.margin_top
+    def __new__(cls, margin_top: Optional[Size] = None):
+        return cls.intern(margin_top)
 
     def __satisfy__(self, other):
         if not satisfy(self.margin_top, other.margin_top):
@@ -361,19 +415,18 @@ class HeaderStyle(YAMLObject):
 
 
 class FooterMarginBottomNotMatched(PageLayoutNotMatched):
-    pass
+    prop = 'footer_margin_bottom'
 
 
-class FooterStyle(YAMLObject):
+class FooterStyle(Prop):
     yaml_tag = '!FooterProperty'
 
+    __slots__ = ('margin_bottom',)
+
     margin_bottom: Optional[Size]
 
-    def __init__(self, margin_bottom: Optional[Size] = None):
-        self.margin_bottom = margin_bottom
-
-    def __eq__(self, other):
-        return self.margin_bottom == other.margin_bottom
+    def __new__(cls, margin_bottom: Optional[Size] = None):
+        return cls.intern(margin_bottom)
 
     def __satisfy__(self, other):
         if not satisfy(self.margin_bottom, other.margin_bottom):
@@ -383,26 +436,23 @@ class FooterStyle(YAMLObject):
         return True
 
 
-class PageLayout(YAMLObject):
+class PageLayout(Prop):
     yaml_tag = '!PageLayout'
 
+    __slots__ = ('prop', 'header_style', 'footer_style')
+
     prop: PageProp
 
     header_style: Optional[HeaderStyle]
 
     footer_style: Optional[FooterStyle]
 
-    def __init__(self,
-                 prop: PageProp,
-                 header_style: Optional[HeaderStyle] = None,
-                 footer_style: Optional[FooterStyle] = None,
-                 ):
-        self.prop = prop
-        self.header_style = header_style
-        self.footer_style = footer_style
-
-    def __eq__(self, other):
-        return self.prop == other.prop and self.header_style == other.header_style and self.footer_style == other.footer_style
+    def __new__(cls,
+                prop: PageProp,
+                header_style: Optional[HeaderStyle] = None,
+                footer_style: Optional[FooterStyle] = None,
+                ):
+        return cls.intern(prop, header_style, footer_style)
 
     def __satisfy__(self, other):
         satisfy(self.prop, other.prop)
@@ -0,0 +1,153 @@
+from typing import Any, Dict, List, Optional
+
+from core.comm import PartError, NotMatched
+
+PROP_LABELS: Dict[str, str] = {
+    'margin_bottom': 'bottom margin (to footer)',
+    'margin_left': 'left margin',
+    'margin_right': 'right margin',
+    'margin_top': 'top margin (to header)',
+    'page_height': 'page height',
+    'page_width': 'page width',
+    'header_margin_top': 'header margin',
+    'footer_margin_bottom': 'footer margin',
+    'name': 'font',
+    'name_asia': 'Asian font',
+    'size': 'size',
+    'size_asia': 'Asian size',
+    'weight': 'weight',
+    'weight_asia': 'Asian weight',
+    'letter_spacing': 'letter spacing',
+    'align': 'alignment',
+    'line_height': 'line height',
+}
+
+# by kind, or by 'kind:prop' where the property changes the wording
+MESSAGES: Dict[str, str] = {
+    'master_page_break': 'Can\'t find the {section}!\nMaybe the section break before is lack.',
+    'master_page_layout': 'Page format of the {section} is wrong!\n'
+                          'The {label} is "{actual}", which should be "{required}"',
+    'master_page_header': 'Header format of the {section} is wrong!\n'
+                          'The {label} is "{actual}", which should be "{required}"',
+    'master_page_header:empty': 'Header format of the {section} is wrong!\nIt should not be empty line!',
+    'master_page_header:complex': 'Header format of the {section} is wrong!\n'
+                                  'Text in it should not have more than one formats!',
+    'master_page_footer': 'Footer format of the {section} is wrong!\n'
+                          'The {label} is "{actual}", which should be "{required}"',
+    'master_page_footer:empty': 'Footer format of the {section} is wrong!\nIt should not be empty line!',
+    'master_page_footer:complex': 'Footer format of the {section} is wrong!\n'
+                                  'Text in it should not have more than one formats!',
+    'lack_part': 'Line {line} in {section}:\nThe {part} is lack! Be sure that its format is right.',
+    'unfamiliar_part': 'Line {line} in {section}:\nFormat of this line is unfamiliar! What\'s it?',
+    'lack_empty_line_before': 'Line {line} in {section}:\nThere should be an empty line before this {part}!',
+    'lack_empty_line_after': 'Line {line} in {section}:\nThere should be an empty line after this {part}!',
+    'lack_label_before': 'Line {line} in {section}:\nThere should be a label before this {part}!',
+    'lack_label_after': 'Line {line} in {section}:\nThere should be an label after this {part}!',
+    'lack_picture_or_table_near': 'Line {line} in {section}:\nThere should be a {part} next to this label!',
+    'wrong_format': 'Line {line} in {section}:\n'
+                    'The {label} of this {part} is "{actual}", which should be "{required}"',
+    'wrong_format:empty': 'Line {line} in {section}:\nThis {part} should not be empty line!',
+    'wrong_format:complex': 'Line {line} in {section}:\nText in this {part} should not have more than one formats!',
+    'empty_section': '{section}:\nThis section is empty! There should be something.',
+    'wrong_content': 'The {section} contains "{actual}", which should start with "{required}".',
+    'wrong_content:word': 'The {section} is "{actual}", which should be "{required}".',
+    'unreadable': 'This file can\'t be checked!\n{actual}',
+}
+
+
+class Violation:
+    kind: str
+    section: str
+    line: Optional[int]
+    part: Optional[str]
+    prop: Optional[str]
+    actual: Any
+    required: Any
+
+    def __init__(self, kind: str, section: str, line: Optional[int] = None, part: Optional[str] = None,
+                 prop: Optional[str] = None, actual: Any = None, required: Any = None):
+        self.kind = kind
+        self.section = section
+        self.line = line
+        self.part = part
+        self.prop = prop
+        self.actual = actual
+        self.required = required
+
+    def __eq__(self, other):
+        return type(other) is Violation and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return 'Violation({})'.format(self.to_dict())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'kind': self.kind,
+            'section': self.section,
+            'line': self.line,
+            'part': self.part,
+            'property': self.prop,
+            'actual': plain(self.actual),
+            'required': plain(self.required),
+        }
+
+    def describe(self) -> str:
+        template = MESSAGES.get('{}:{}'.format(self.kind, self.prop)) or MESSAGES.get(self.kind, '')
+        return template.format(section=self.section, line=self.line, part=self.part,
+                               label=PROP_LABELS.get(self.prop, ''), actual=self.actual, required=self.required)
+
+
+class Report:
+    violations: List[Violation]
+
+    def __init__(self, violations: Optional[List[Violation]] = None):
+        self.violations = violations if violations is not None else []
+
+    def __eq__(self, other):
+        return type(other) is Report and self.violations == other.violations
+
+    def __repr__(self):
+        return 'Report({})'.format(self.violations)
+
+    @property
+    def ok(self) -> bool:
+        return len(self.violations) == 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'ok': self.ok, 'violations': [v.to_dict() for v in self.violations]}
+
+    def text(self) -> str:
+        if self.ok:
+            return 'No error found.\nGood job.'
+        return '\n\n'.join(v.describe() for v in self.violations)
+
+
+def plain(val: Any) -> Any:
+    # property values such as lengths are reported as they are written in configs
+    if val is None or type(val) in (str, int, float, bool):
+        return val
+    return str(val)
+
+
+def violation(e: PartError) -> Violation:
+    if isinstance(e.pos, tuple):
+        section, line = e.pos
+    else:
+        section, line = e.pos, None
+    ans = Violation(e.kind, section, line, getattr(e, 'part', None))
+    cause = e.__cause__
+    if isinstance(cause, NotMatched):
+        ans.prop = cause.prop
+        ans.actual = getattr(cause, 'val', None)
+        ans.required = getattr(cause, 'req', None)
+    return ans
+
+
+def unreadable(e: Exception) -> Report:
+    # a file that could not be read or checked at all
+    return Report([Violation('unreadable', 'file', actual='{}: {}'.format(type(e).__name__, e))])
+
+
+def from_dict(data: Dict[str, Any]) -> Report:
+    return Report([Violation(v['kind'], v['section'], v['line'], v['part'], v['property'], v['actual'], v['required'])
+                   for v in data['violations']])
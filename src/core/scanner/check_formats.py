@@ -1,64 +1,88 @@
-from typing import NoReturn, Tuple
+from typing import NoReturn, Tuple, Optional, List, Dict, Any
 
-from core.pp.elements import Doc, Para, EmptyPara, MasterPage, Break, Table as Tbl, Frame, Math, Span, Image
+from core.pp.elements import Doc, Element, Para, EmptyPara, MasterPage, Break, Table as Tbl, Frame, Math, Span, Image
 from core.scanner.formats import *
-from core.comm import satisfy, inherent, PartError
-from core.pp.properties import PropNotMatched, ParaEmpty, ParaComplex
+from core.comm import satisfy, matches, inherent, fail, PartError
+from core.pp.properties import PropNotMatched, ParaEmpty, ParaComplex, similar
 from core.scanner.parts import *
+from core.scanner.rules import Rules, compile_rules
 
-section_name: str = ''
-line_base: int = 0
-n_line: int = 0
+
+class Context:
+    fmt: Formats
+    rules: Rules
+    errors: Optional[List[PartError]]
+    section_name: str
+    line_base: int
+    n_line: int
+    # outcome of checking a header or footer against a requirement, by their ids
+    checked_parts: Dict[Tuple[int, int], Tuple[List[Para], Any, Optional[PropNotMatched]]]
+
+    def __init__(self, fmt: Formats, errors: Optional[List[PartError]] = None):
+        self.fmt = fmt
+        self.rules = compile_rules(fmt)
+        self.errors = errors
+        self.section_name = ''
+        self.line_base = 0
+        self.n_line = 0
+        self.checked_parts = {}
 
 
 class MasterPageBreakError(PartError):
+    kind = 'master_page_break'
     pos: str
 
 
 class MasterPageLayoutError(PartError):
+    kind = 'master_page_layout'
     pos: str
 
 
 class MasterPageHeaderError(PartError):
+    kind = 'master_page_header'
     pos: str
 
 
 class MasterPageFooterError(PartError):
+    kind = 'master_page_footer'
     pos: str
 
 
 class LackPartError(PartError):
+    kind = 'lack_part'
     pos: Tuple[str, int]
     part: str
 
 
 class UnfamiliarPartError(PartError):
+    kind = 'unfamiliar_part'
     pos: Tuple[str, int]
 
 
 class WrongFormatError(PartError):
+    kind = 'wrong_format'
     pos: Tuple[str, int]
     part: str
 
 
 class LackEmptyLineBeforeError(WrongFormatError):
-    pass
+    kind = 'lack_empty_line_before'
 
 
 class LackLabelBeforeError(WrongFormatError):
-    pass
+    kind = 'lack_label_before'
 
 
 class LackPictureorTableNearError(WrongFormatError):
-    pass
+    kind = 'lack_picture_or_table_near'
 
 
 class LackLabelAfterError(WrongFormatError):
-    pass
+    kind = 'lack_label_after'
 
 
 class LackEmptyLineAfterError(WrongFormatError):
-    pass
+    kind = 'lack_empty_line_after'
 
 
 def is_empty_span(s: Span) -> bool:
@@ -76,32 +100,62 @@ def is_empty_para(p: Para) -> bool:
     return True
 
 
-def check_pure_para(para: Para, pure_para_prop: PureParaProp) -> str:
+def para_text(para: Para) -> str:
+    return ''.join(s for s in para if type(s) is Span)
+
+
+def check_pure_para(ctx: Context, para: Para, pure_para_prop: PureParaProp) -> str:
     if len(para) == 0:
         raise ParaEmpty
     if len(para) > 1 or type(para[0]) is not Span:
         raise ParaComplex
-    satisfy(inherent(para.prop, fmt.default_fmt.para_prop), pure_para_prop.para_prop)
-    satisfy(inherent(para[0].prop, fmt.default_fmt.text_prop), pure_para_prop.text_prop)
+    satisfy(inherent(para.prop, ctx.fmt.default_fmt.para_prop), pure_para_prop.para_prop)
+    satisfy(inherent(para[0].prop, ctx.fmt.default_fmt.text_prop), pure_para_prop.text_prop)
     return para[0]
 
 
-def check_master_page(master_page: MasterPage, pos: str) -> NoReturn:
+def match_pure_para(ctx: Context, para: Para, pure_para_prop: PureParaProp) -> Optional[str]:
+    # same test as check_pure_para, but answers None instead of raising
+    if len(para) != 1 or type(para[0]) is not Span:
+        return None
+    if not matches(inherent(para.prop, ctx.fmt.default_fmt.para_prop), pure_para_prop.para_prop):
+        return None
+    if not matches(inherent(para[0].prop, ctx.fmt.default_fmt.text_prop), pure_para_prop.text_prop):
+        return None
+    return para[0]
+
+
+def check_header_footer(ctx: Context, paras: List[Para], pure_para_prop: PureParaProp) -> Optional[PropNotMatched]:
+    # sections linked to the same part share its paragraphs, so each part is checked once
+    key = id(paras), id(pure_para_prop)
+    checked = ctx.checked_parts.get(key)
+    if checked is not None:
+        return checked[2]
+    ans = None
     try:
-        satisfy(master_page.page_layout, fmt.page_fmt[0])
+        for h in paras:
+            check_pure_para(ctx, h, pure_para_prop)
     except PropNotMatched as nm:
-        e = MasterPageLayoutError()
-        e.pos = pos
-        raise e from nm
+        ans = nm
+    # the objects are kept so that their ids are not reused
+    ctx.checked_parts[key] = paras, pure_para_prop, ans
+    return ans
+
+
+def check_master_page(ctx: Context, master_page: MasterPage, pos: str) -> NoReturn:
     try:
-        # for h in master_page.header_first:
-        #     check_pure_para(h, page_fmt[1])
-        for h in master_page.header:
-            check_pure_para(h, fmt.page_fmt[1])
+        satisfy(master_page.page_layout, ctx.fmt.page_fmt[0])
     except PropNotMatched as nm:
+        e = MasterPageLayoutError()
+        e.pos = pos
+        fail(e, ctx.errors, nm)
+    # for h in master_page.header_first:
+    #     check_pure_para(h, page_fmt[1])
+    nm = check_header_footer(ctx, master_page.header, ctx.fmt.page_fmt[1])
+    if nm is not None:
         e = MasterPageHeaderError()
         e.pos = pos
-        raise e from nm
+        fail(e, ctx.errors, nm)
     try:
         pass
         # for h in master_page.footer_first:
@@ -111,199 +165,169 @@ def check_master_page(master_page: MasterPage, pos: str) -> NoReturn:
     except PropNotMatched as nm:
         e = MasterPageFooterError()
         e.pos = pos
-        raise e from nm
+        fail(e, ctx.errors, nm)
 
 
-def check_title(para: Para) -> NoReturn:
-    global section_name
-    global line_base
-    global n_line
+def check_title(ctx: Context, para: Para) -> NoReturn:
     try:
-        check_pure_para(para, fmt.title_fmt)
+        check_pure_para(ctx, para, ctx.fmt.title_fmt)
     except PropNotMatched as nm:
         e = WrongFormatError()
         e.part = 'title'
-        e.pos = section_name, n_line - line_base
-        raise e from nm
+        e.pos = ctx.section_name, ctx.n_line - ctx.line_base
+        fail(e, ctx.errors, nm)
 
 
-def check_abstract_title(para: Para) -> str:
-    global section_name
-    global line_base
-    global n_line
+def check_abstract_title(ctx: Context, para: Para) -> str:
     try:
-        return check_pure_para(para, fmt.abstract_title_fmt)
+        return check_pure_para(ctx, para, ctx.fmt.abstract_title_fmt)
     except PropNotMatched as nm:
         e = WrongFormatError()
         e.part = 'abstract title'
-        e.pos = section_name, n_line - line_base
-        raise e from nm
+        e.pos = ctx.section_name, ctx.n_line - ctx.line_base
+        fail(e, ctx.errors, nm)
+        return para_text(para)
 
 
-def check_abstract(para: Para) -> NoReturn:
-    global section_name
-    global line_base
-    global n_line
+def check_abstract(ctx: Context, para: Para) -> NoReturn:
     try:
-        check_pure_para(para, fmt.abstract_fmt)
+        check_pure_para(ctx, para, ctx.fmt.abstract_fmt)
     except PropNotMatched as nm:
         e = WrongFormatError()
         e.part = 'abstract'
-        e.pos = section_name, n_line - line_base
-        raise e from nm
+        e.pos = ctx.section_name, ctx.n_line - ctx.line_base
+        fail(e, ctx.errors, nm)
 
 
-def is_keywords(para: Para) -> (bool, str):
-    try:
-        content = check_pure_para(para, fmt.keywords_fmt)
-    except PropNotMatched:
+def is_keywords(ctx: Context, para: Para) -> (bool, str):
+    if 'keywords' not in ctx.rules.lookup(para):
         return False, ''
-    return True, content
+    content = match_pure_para(ctx, para, ctx.fmt.keywords_fmt)
+    return content is not None, content or ''
 
 
-def check_title_en(para: Para) -> NoReturn:
-    global section_name
-    global line_base
-    global n_line
+def check_title_en(ctx: Context, para: Para) -> NoReturn:
     try:
-        check_pure_para(para, fmt.title_en_fmt)
+        check_pure_para(ctx, para, ctx.fmt.title_en_fmt)
     except PropNotMatched as nm:
         e = WrongFormatError()
         e.part = 'English title'
-        e.pos = section_name, n_line - line_base
-        raise e from nm
+        e.pos = ctx.section_name, ctx.n_line - ctx.line_base
+        fail(e, ctx.errors, nm)
 
 
-def check_abstract_title_en(para: Para) -> str:
-    global section_name
-    global line_base
-    global n_line
+def check_abstract_title_en(ctx: Context, para: Para) -> str:
     try:
-        return check_pure_para(para, fmt.abstract_title_en_fmt)
+        return check_pure_para(ctx, para, ctx.fmt.abstract_title_en_fmt)
     except PropNotMatched as nm:
         e = WrongFormatError()
         e.part = 'English abstract title'
-        e.pos = section_name, n_line - line_base
-        raise e from nm
+        e.pos = ctx.section_name, ctx.n_line - ctx.line_base
+        fail(e, ctx.errors, nm)
+        return para_text(para)
 
 
-def check_abstract_en(para: Para) -> NoReturn:
-    global section_name
-    global line_base
-    global n_line
+def check_abstract_en(ctx: Context, para: Para) -> NoReturn:
     try:
-        check_pure_para(para, fmt.abstract_en_fmt)
+        check_pure_para(ctx, para, ctx.fmt.abstract_en_fmt)
     except PropNotMatched as nm:
         e = WrongFormatError()
         e.part = 'English abstract'
-        e.pos = section_name, n_line - line_base
-        raise e from nm
+        e.pos = ctx.section_name, ctx.n_line - ctx.line_base
+        fail(e, ctx.errors, nm)
 
 
-def is_keywords_en(para: Para) -> (bool, str):
-    try:
-        content = check_pure_para(para, fmt.keywords_en_fmt)
-    except PropNotMatched:
+def is_keywords_en(ctx: Context, para: Para) -> (bool, str):
+    if 'keywords_en' not in ctx.rules.lookup(para):
         return False, ''
-    return True, content
+    content = match_pure_para(ctx, para, ctx.fmt.keywords_en_fmt)
+    return content is not None, content or ''
 
 
-def check_catalog_title(para: Para) -> str:
-    global section_name
-    global line_base
-    global n_line
+def check_catalog_title(ctx: Context, para: Para) -> str:
     try:
-        return check_pure_para(para, fmt.catalog_title_fmt)
+        return check_pure_para(ctx, para, ctx.fmt.catalog_title_fmt)
     except PropNotMatched as nm:
         e = WrongFormatError()
         e.part = 'catalog title'
-        e.pos = section_name, n_line - line_base
-        raise e from nm
+        e.pos = ctx.section_name, ctx.n_line - ctx.line_base
+        fail(e, ctx.errors, nm)
+        return para_text(para)
 
 
-def is_heading(para: Para, level: int) -> (bool, str):
-    try:
-        heading_content = check_pure_para(para, fmt.heading_fmts[level])
-    except PropNotMatched:
+def is_heading(ctx: Context, para: Para, level: int) -> (bool, str):
+    if ctx.rules.heading_names[level] not in ctx.rules.lookup(para):
         return False, ''
-    return True, heading_content
+    heading_content = match_pure_para(ctx, para, ctx.fmt.heading_fmts[level])
+    return heading_content is not None, heading_content or ''
 
 
-def is_conclusion_title(para: Para) -> (bool, str):
-    try:
-        content = check_pure_para(para, fmt.conclusion_title_fmt)
-    except PropNotMatched:
+def is_conclusion_title(ctx: Context, para: Para) -> (bool, str):
+    if 'conclusion_title' not in ctx.rules.lookup(para):
         return False, ''
-    return True, content
+    content = match_pure_para(ctx, para, ctx.fmt.conclusion_title_fmt)
+    return content is not None, content or ''
 
 
-def is_references_title(para: Para) -> (bool, str):
-    try:
-        content = check_pure_para(para, fmt.references_title_fmt)
-    except PropNotMatched:
+def is_references_title(ctx: Context, para: Para) -> (bool, str):
+    if 'references_title' not in ctx.rules.lookup(para):
         return False, ''
-    return True, content
+    content = match_pure_para(ctx, para, ctx.fmt.references_title_fmt)
+    return content is not None, content or ''
 
 
-def check_reference(para: Para) -> str:
-    global section_name
-    global line_base
-    global n_line
+def check_reference(ctx: Context, para: Para) -> str:
     try:
-        return check_pure_para(para, fmt.reference_fmt)
+        return check_pure_para(ctx, para, ctx.fmt.reference_fmt)
     except PropNotMatched as nm:
         e = WrongFormatError()
         e.part = 'references'
-        e.pos = section_name, n_line - line_base
-        raise e from nm
+        e.pos = ctx.section_name, ctx.n_line - ctx.line_base
+        fail(e, ctx.errors, nm)
+        return para_text(para)
 
 
-def is_appendix_title(para: Para) -> (bool, str):
-    try:
-        content = check_pure_para(para, fmt.appendix_title_fmt)
-    except PropNotMatched:
+def is_appendix_title(ctx: Context, para: Para) -> (bool, str):
+    if 'appendix_title' not in ctx.rules.lookup(para):
         return False, ''
-    return True, content
+    content = match_pure_para(ctx, para, ctx.fmt.appendix_title_fmt)
+    return content is not None, content or ''
 
 
-def is_thanks_title(para: Para) -> (bool, str):
-    try:
-        content = check_pure_para(para, fmt.thanks_title_fmt)
-    except PropNotMatched:
+def is_thanks_title(ctx: Context, para: Para) -> (bool, str):
+    if 'thanks_title' not in ctx.rules.lookup(para):
         return False, ''
-    return True, content
+    content = match_pure_para(ctx, para, ctx.fmt.thanks_title_fmt)
+    return content is not None, content or ''
 
 
-def is_label(para: Para) -> (bool, str):
-    try:
-        label_content = check_pure_para(para, fmt.label_fmt)
-    except PropNotMatched:
+def is_label(ctx: Context, para: Para) -> (bool, str):
+    if 'label' not in ctx.rules.lookup(para):
         return False, ''
-    return True, label_content
+    label_content = match_pure_para(ctx, para, ctx.fmt.label_fmt)
+    return label_content is not None, label_content or ''
 
 
-def is_normal(para: Para) -> bool:
-    try:
-        satisfy(inherent(para.prop, fmt.default_fmt.para_prop), fmt.normal_fmt.para_prop)
-        for s in para:
-            if type(s) is Frame:
-                if type(s.obj) is not Math:
-                    return False
-            else:
-                if type(s) is not Span:
-                    return False
-                else:
-                    satisfy(inherent(s.prop, fmt.default_fmt.text_prop), fmt.normal_fmt.text_prop)
-    except PropNotMatched:
+def is_normal(ctx: Context, para: Para) -> bool:
+    if not isinstance(para, Para):
         return False
-    else:
-        return True
+    if not matches(inherent(para.prop, ctx.fmt.default_fmt.para_prop), ctx.fmt.normal_fmt.para_prop):
+        return False
+    for s in para:
+        if type(s) is Frame:
+            if type(s.obj) is not Math:
+                return False
+        else:
+            if type(s) is not Span:
+                return False
+            elif not matches(inherent(s.prop, ctx.fmt.default_fmt.text_prop), ctx.fmt.normal_fmt.text_prop):
+                return False
+    return True
 
 
-def check_normal(para: Para, pos: int):
-    global section_name
+def check_normal(ctx: Context, para: Para, pos: int):
     try:
-        satisfy(inherent(para.prop, fmt.default_fmt.para_prop), fmt.normal_fmt.para_prop)
+        satisfy(inherent(para.prop, ctx.fmt.default_fmt.para_prop), ctx.fmt.normal_fmt.para_prop)
         for s in para:
             if type(s) is Frame:
                 pass
@@ -311,74 +335,91 @@ def check_normal(para: Para, pos: int):
                 if type(s) is not Span:
                     pass
                 else:
-                    satisfy(inherent(s.prop, fmt.default_fmt.text_prop), fmt.normal_fmt.text_prop)
+                    satisfy(inherent(s.prop, ctx.fmt.default_fmt.text_prop), ctx.fmt.normal_fmt.text_prop)
     except PropNotMatched as nm:
         e = WrongFormatError()
         e.part = 'normal'
-        e.pos = section_name, pos
-        raise e from nm
+        e.pos = ctx.section_name, pos
+        fail(e, ctx.errors, nm)
 
 
 def is_picture(para: Para) -> bool:
-    if len(para) != 1:
+    if not isinstance(para, Para) or len(para) != 1:
         return False
     if type(para[0]) is not Frame or type(para[0].obj) is not Image:
         return False
     return True
 
 
-def check_picture(para: Para, pos: int):
-    global section_name
+def check_picture(ctx: Context, para: Para, pos: int):
     try:
-        satisfy(inherent(para.prop, fmt.default_fmt.para_prop), fmt.picture_fmt.para_prop)
+        satisfy(inherent(para.prop, ctx.fmt.default_fmt.para_prop), ctx.fmt.picture_fmt.para_prop)
     except PropNotMatched as nm:
         e = WrongFormatError()
         e.part = 'picture'
-        e.pos = section_name, pos
-        raise e from nm
+        e.pos = ctx.section_name, pos
+        fail(e, ctx.errors, nm)
 
 
-def check_table(table: Tbl, pos: int):
-    global section_name
+def check_table(ctx: Context, table: Tbl, pos: int):
     try:
-        satisfy(inherent(table.prop, fmt.default_fmt.para_prop), fmt.table_fmt.para_prop)
+        satisfy(inherent(table.prop, ctx.fmt.default_fmt.para_prop), ctx.fmt.table_fmt.para_prop)
     except PropNotMatched as nm:
         e = WrongFormatError()
         e.part = 'table'
-        e.pos = section_name, pos
-        raise e from nm
+        e.pos = ctx.section_name, pos
+        fail(e, ctx.errors, nm)
 
 
-def main(doc: Doc, formats: Formats) -> (Body, Formats):
-    global fmt
-    fmt = formats
-
-    global section_name
-    global line_base
-    # purify all paragraphs
-    for i in range(len(doc)):
-        if type(doc[i]) is Para:
-            if is_empty_para(doc[i]):
-                doc[i] = EmptyPara(doc[i].prop)
+def check_float_gaps(ctx: Context, doc: Doc, part: str) -> int:
+    # a picture or table with its label is wrapped in empty lines; answers how many lines it takes
+    if type(doc[ctx.n_line - 1]) is not EmptyPara:
+        e = LackEmptyLineBeforeError()
+        e.pos = ctx.section_name, ctx.n_line - ctx.line_base
+        e.part = part
+        fail(e, ctx.errors)
+    if doc.has(ctx.n_line + 2) and type(doc[ctx.n_line + 2]) is EmptyPara:
+        return 3
+    e = LackEmptyLineAfterError()
+    e.pos = ctx.section_name, ctx.n_line - ctx.line_base + 1
+    e.part = part
+    fail(e, ctx.errors)
+    return 2
+
+
+def purify(ctx: Context, e: Element) -> Element:
+    if type(e) is not Para:
+        return e
+    if is_empty_para(e):
+        return EmptyPara(e.prop)
+    last_is_span: bool = False
+    new_para = Para(inherent(e.prop, ctx.fmt.default_fmt.para_prop))
+    for s in e:
+        if type(s) is not Span:
+            new_para.append(s)
+            last_is_span = False
+        else:
+            if s == '':
+                continue
+            # spans may be shared with other documents, so purify a copy
+            prop = inherent(s.prop, ctx.fmt.default_fmt.text_prop)
+            if last_is_span and similar(prop, new_para[-1].prop):
+                new_end = Span(new_para[-1] + s)
+                new_end.prop = new_para[-1].prop
+                new_para[-1] = new_end
             else:
-                last_is_span: bool = False
-                new_para = Para(inherent(doc[i].prop, fmt.default_fmt.para_prop))
-                for s in doc[i]:
-                    if type(s) is not Span:
-                        new_para.append(s)
-                        last_is_span = False
-                    else:
-                        if s == '':
-                            continue
-                        s.prop = inherent(s.prop, fmt.default_fmt.text_prop)
-                        if last_is_span and s.prop == new_para[-1].prop:
-                            new_end = Span(new_para[-1] + s)
-                            new_end.prop = new_para[-1].prop
-                            new_para[-1] = new_end
-                        else:
-                            new_para.append(s)
-                        last_is_span = True
-                doc[i] = new_para
+                new_s = Span(s)
+                new_s.prop = prop
+                new_para.append(new_s)
+            last_is_span = True
+    return new_para
+
+
+def main(doc: Doc, formats: Formats, collect: Optional[List[PartError]] = None) -> (Optional[Body], Formats):
+    ctx = Context(formats, collect)
+
+    # paragraphs are purified as the scan reaches them
+    doc.map(lambda e: purify(ctx, e))
 
     ans = Body()
     ans.chapters = []
@@ -386,369 +427,393 @@ def main(doc: Doc, formats: Formats) -> (Body, Formats):
     ans.references = []
 
     # check cover and statements
-    global n_line
-    n_line = 0
 
     (n_section, section_names) = (
         1,
         [
             'cover and statements',
         ],
-    ) if fmt.merge_cover_and_statements else (
+    ) if ctx.fmt.merge_cover_and_statements else (
         2,
         [
             'cover',
             'statements',
         ]
     )
+    # when collecting, a missing part is recorded and the check goes on;
+    # only running out of document ends it early, with no body to parse
     for i in range(n_section):
-        if n_line >= len(doc) or type(doc[n_line]) is not MasterPage:
+        if not doc.has(ctx.n_line) or type(doc[ctx.n_line]) is not MasterPage:
             e = MasterPageBreakError()
             e.pos = section_names[i]
-            raise e
-        check_master_page(doc[n_line], section_names[i])
-        n_line += 1
-        while n_line < len(doc):
-            if type(doc[n_line]) is MasterPage:
+            fail(e, ctx.errors)
+            if not doc.has(ctx.n_line):
+                return None, ctx.fmt
+        else:
+            check_master_page(ctx, doc[ctx.n_line], section_names[i])
+            ctx.n_line += 1
+        while doc.has(ctx.n_line):
+            if type(doc[ctx.n_line]) is MasterPage:
                 break
             else:
-                n_line += 1
+                ctx.n_line += 1
 
-    line_base = n_line
-    section_name = 'abstracts and catalog' if fmt.merge_abstracts_and_catalog else 'abstract'
-    if n_line >= len(doc) or type(doc[n_line]) is not MasterPage:
+    ctx.line_base = ctx.n_line
+    ctx.section_name = 'abstracts and catalog' if ctx.fmt.merge_abstracts_and_catalog else 'abstract'
+    if not doc.has(ctx.n_line) or type(doc[ctx.n_line]) is not MasterPage:
         e = MasterPageBreakError()
-        e.pos = section_name
-        raise e
-    check_master_page(doc[n_line], section_name)
-    n_line += 1
-    if n_line >= len(doc) or type(doc[n_line]) is not Para:
+        e.pos = ctx.section_name
+        fail(e, ctx.errors)
+        if not doc.has(ctx.n_line):
+            return None, ctx.fmt
+    else:
+        check_master_page(ctx, doc[ctx.n_line], ctx.section_name)
+        ctx.n_line += 1
+    if not doc.has(ctx.n_line) or type(doc[ctx.n_line]) is not Para:
         e = LackPartError()
-        e.pos = section_name, n_line - line_base
+        e.pos = ctx.section_name, ctx.n_line - ctx.line_base
         e.part = 'title'
-        raise e
-    check_title(doc[n_line])
-    n_line += 1
-    if n_line >= len(doc) or type(doc[n_line]) is not Para:
+        fail(e, ctx.errors)
+        if not doc.has(ctx.n_line):
+            return None, ctx.fmt
+    else:
+        check_title(ctx, doc[ctx.n_line])
+    ctx.n_line += 1
+    if not doc.has(ctx.n_line) or type(doc[ctx.n_line]) is not Para:
         e = LackPartError()
-        e.pos = section_name, n_line - line_base
+        e.pos = ctx.section_name, ctx.n_line - ctx.line_base
         e.part = 'abstract title'
-        raise e
-    ans.abstract_title = check_abstract_title(doc[n_line])
-    n_line += 1
-    while n_line < len(doc) and not is_keywords(doc[n_line])[0]:
-        if type(doc[n_line]) is not EmptyPara:
-            check_abstract(doc[n_line])
-        n_line += 1
-    if n_line >= len(doc):
+        fail(e, ctx.errors)
+        if not doc.has(ctx.n_line):
+            return None, ctx.fmt
+    else:
+        ans.abstract_title = check_abstract_title(ctx, doc[ctx.n_line])
+    ctx.n_line += 1
+    # the section ends at the next master page, whether or not its key words were found
+    while doc.has(ctx.n_line) and type(doc[ctx.n_line]) is not MasterPage and not is_keywords(ctx, doc[ctx.n_line])[0]:
+        if type(doc[ctx.n_line]) is not EmptyPara:
+            check_abstract(ctx, doc[ctx.n_line])
+        ctx.n_line += 1
+    if not doc.has(ctx.n_line) or type(doc[ctx.n_line]) is MasterPage:
         e = LackPartError()
-        e.pos = section_name, n_line - line_base
-        e.part = 'key words'
-        raise e
-    if type(doc[n_line - 1]) is not EmptyPara:
-        e = LackEmptyLineBeforeError()
-        e.pos = section_name, n_line - line_base
+        e.pos = ctx.section_name, ctx.n_line - ctx.line_base
         e.part = 'key words'
-        raise e
-    ans.keywords = is_keywords(doc[n_line])[1]
-    n_line += 1
-    while n_line < len(doc) and type(doc[n_line]) is EmptyPara:
-        n_line += 1
-
-    if not fmt.merge_abstracts_and_catalog:
-        section_name = 'English abstract'
-        line_base = n_line
-        if n_line >= len(doc) or type(doc[n_line]) is not MasterPage:
+        fail(e, ctx.errors)
+        if not doc.has(ctx.n_line):
+            return None, ctx.fmt
+    else:
+        if type(doc[ctx.n_line - 1]) is not EmptyPara:
+            e = LackEmptyLineBeforeError()
+            e.pos = ctx.section_name, ctx.n_line - ctx.line_base
+            e.part = 'key words'
+            fail(e, ctx.errors)
+        ans.keywords = is_keywords(ctx, doc[ctx.n_line])[1]
+        ctx.n_line += 1
+    while doc.has(ctx.n_line) and type(doc[ctx.n_line]) is EmptyPara:
+        ctx.n_line += 1
+
+    if not ctx.fmt.merge_abstracts_and_catalog:
+        ctx.section_name = 'English abstract'
+        ctx.line_base = ctx.n_line
+        if not doc.has(ctx.n_line) or type(doc[ctx.n_line]) is not MasterPage:
             e = MasterPageBreakError()
-            e.pos = section_name
-            raise e
-        check_master_page(doc[n_line], section_name)
-        n_line += 1
-    if n_line >= len(doc) or type(doc[n_line]) is not Para:
+            e.pos = ctx.section_name
+            fail(e, ctx.errors)
+            if not doc.has(ctx.n_line):
+                return None, ctx.fmt
+        else:
+            check_master_page(ctx, doc[ctx.n_line], ctx.section_name)
+            ctx.n_line += 1
+    if not doc.has(ctx.n_line) or type(doc[ctx.n_line]) is not Para:
         e = LackPartError()
-        e.pos = section_name, n_line - line_base
+        e.pos = ctx.section_name, ctx.n_line - ctx.line_base
         e.part = 'English title'
-        raise e
-    check_title_en(doc[n_line])
-    n_line += 1
-    if n_line >= len(doc) or type(doc[n_line]) is not EmptyPara:
+        fail(e, ctx.errors)
+        if not doc.has(ctx.n_line):
+            return None, ctx.fmt
+    else:
+        check_title_en(ctx, doc[ctx.n_line])
+    ctx.n_line += 1
+    if not doc.has(ctx.n_line) or type(doc[ctx.n_line]) is not EmptyPara:
         e = LackEmptyLineBeforeError()
-        e.pos = section_name, n_line - line_base
+        e.pos = ctx.section_name, ctx.n_line - ctx.line_base
         e.part = 'English abstract title'
-        raise e
-    n_line += 1
-    if n_line >= len(doc) or type(doc[n_line]) is not Para:
+        fail(e, ctx.errors)
+        if not doc.has(ctx.n_line):
+            return None, ctx.fmt
+    else:
+        ctx.n_line += 1
+    if not doc.has(ctx.n_line) or type(doc[ctx.n_line]) is not Para:
         e = LackPartError()
-        e.pos = section_name, n_line - line_base
+        e.pos = ctx.section_name, ctx.n_line - ctx.line_base
         e.part = 'English abstract title'
-        raise e
-    ans.abstract_title_en = check_abstract_title_en(doc[n_line])
-    n_line += 1
-    while n_line < len(doc) and not is_keywords_en(doc[n_line])[0]:
-        if type(doc[n_line]) is not EmptyPara:
-            check_abstract_en(doc[n_line])
-        n_line += 1
-    if n_line >= len(doc):
+        fail(e, ctx.errors)
+        if not doc.has(ctx.n_line):
+            return None, ctx.fmt
+    else:
+        ans.abstract_title_en = check_abstract_title_en(ctx, doc[ctx.n_line])
+    ctx.n_line += 1
+    # the section ends at the next master page, whether or not its key words were found
+    while doc.has(ctx.n_line) and type(doc[ctx.n_line]) is not MasterPage and not is_keywords_en(ctx, doc[ctx.n_line])[0]:
+        if type(doc[ctx.n_line]) is not EmptyPara:
+            check_abstract_en(ctx, doc[ctx.n_line])
+        ctx.n_line += 1
+    if not doc.has(ctx.n_line) or type(doc[ctx.n_line]) is MasterPage:
         e = LackPartError()
-        e.pos = section_name, n_line - line_base
-        e.part = 'English key words'
-        raise e
-    if type(doc[n_line - 1]) is not EmptyPara:
-        e = LackEmptyLineBeforeError()
-        e.pos = section_name, n_line - line_base
+        e.pos = ctx.section_name, ctx.n_line - ctx.line_base
         e.part = 'English key words'
-        raise e
-    ans.keywords_en = is_keywords_en(doc[n_line])[1]
-    n_line += 1
-    while n_line < len(doc) and type(doc[n_line]) is EmptyPara:
-        n_line += 1
-
-    if not fmt.merge_abstracts_and_catalog:
-        section_name = 'catalog'
-        line_base = n_line
-        if n_line >= len(doc) or type(doc[n_line]) is not MasterPage:
+        fail(e, ctx.errors)
+        if not doc.has(ctx.n_line):
+            return None, ctx.fmt
+    else:
+        if type(doc[ctx.n_line - 1]) is not EmptyPara:
+            e = LackEmptyLineBeforeError()
+            e.pos = ctx.section_name, ctx.n_line - ctx.line_base
+            e.part = 'English key words'
+            fail(e, ctx.errors)
+        ans.keywords_en = is_keywords_en(ctx, doc[ctx.n_line])[1]
+        ctx.n_line += 1
+    while doc.has(ctx.n_line) and type(doc[ctx.n_line]) is EmptyPara:
+        ctx.n_line += 1
+
+    if not ctx.fmt.merge_abstracts_and_catalog:
+        ctx.section_name = 'catalog'
+        ctx.line_base = ctx.n_line
+        if not doc.has(ctx.n_line) or type(doc[ctx.n_line]) is not MasterPage:
             e = MasterPageBreakError()
-            e.pos = section_name
-            raise e
-        check_master_page(doc[n_line], section_name)
-        n_line += 1
-    if n_line >= len(doc) or type(doc[n_line]) is not Para:
+            e.pos = ctx.section_name
+            fail(e, ctx.errors)
+            if not doc.has(ctx.n_line):
+                return None, ctx.fmt
+        else:
+            check_master_page(ctx, doc[ctx.n_line], ctx.section_name)
+            ctx.n_line += 1
+    if not doc.has(ctx.n_line) or type(doc[ctx.n_line]) is not Para:
         e = LackPartError()
-        e.pos = section_name, n_line - line_base
+        e.pos = ctx.section_name, ctx.n_line - ctx.line_base
         e.part = 'catalog title'
-        raise e
-    ans.catalog_title = check_catalog_title(doc[n_line])
-    n_line += 1
-    while n_line < len(doc):
-        if type(doc[n_line]) is MasterPage:
+        fail(e, ctx.errors)
+        if not doc.has(ctx.n_line):
+            return None, ctx.fmt
+    else:
+        ans.catalog_title = check_catalog_title(ctx, doc[ctx.n_line])
+    ctx.n_line += 1
+    while doc.has(ctx.n_line):
+        if type(doc[ctx.n_line]) is MasterPage:
             break
         else:
-            n_line += 1
+            ctx.n_line += 1
 
     # enter the last section
-    section_name = 'chapters, conclusion, references, appendixes and thanks'
-    line_base = n_line
-    if n_line >= len(doc) or type(doc[n_line]) is not MasterPage:
+    ctx.section_name = 'chapters, conclusion, references, appendixes and thanks'
+    ctx.line_base = ctx.n_line
+    if not doc.has(ctx.n_line) or type(doc[ctx.n_line]) is not MasterPage:
         e = MasterPageBreakError()
-        e.pos = section_name
-        raise e
-    check_master_page(doc[n_line], section_name)
-    n_line += 1
-
-    while n_line < len(doc):
-        if type(doc[n_line]) is Break or type(doc[n_line]) is EmptyPara:
-            n_line += 1
+        e.pos = ctx.section_name
+        fail(e, ctx.errors)
+        return None, ctx.fmt
+    check_master_page(ctx, doc[ctx.n_line], ctx.section_name)
+    ctx.n_line += 1
+
+    while doc.has(ctx.n_line):
+        if type(doc[ctx.n_line]) is Break or type(doc[ctx.n_line]) is EmptyPara:
+            ctx.n_line += 1
             continue
-        if type(doc[n_line]) is Tbl:
+        if type(doc[ctx.n_line]) is Tbl:
             e = LackLabelBeforeError()
-            e.pos = section_name, n_line - line_base
+            e.pos = ctx.section_name, ctx.n_line - ctx.line_base
             e.part = 'table'
-            raise e
+            fail(e, ctx.errors)
+            ctx.n_line += 1
+            continue
+        kinds = ctx.rules.lookup(doc[ctx.n_line])
         n_heading_fmt: int = 0
-        while n_heading_fmt < len(fmt.heading_fmts):
-            (heading, heading_content) = is_heading(doc[n_line], n_heading_fmt)
+        while n_heading_fmt < len(ctx.fmt.heading_fmts):
+            if ctx.rules.heading_names[n_heading_fmt] not in kinds:
+                n_heading_fmt += 1
+                continue
+            (heading, heading_content) = is_heading(ctx, doc[ctx.n_line], n_heading_fmt)
             if heading:
                 if n_heading_fmt == 0:
                     ans.chapters.append(Chapter())
                     ans.chapters[-1].title = heading_content
-                else:
-                    ans.chapters[-1].append(Heading(heading_content))  # out of range!
+                elif ans.chapters:
+                    # when collecting, a chapter title in the wrong format leaves no chapter to add to
+                    ans.chapters[-1].append(Heading(heading_content))
                     ans.chapters[-1][-1].level = n_heading_fmt
                 break
             else:
                 n_heading_fmt += 1
-        if n_heading_fmt < len(fmt.heading_fmts):
-            n_line += 1
+        if n_heading_fmt < len(ctx.fmt.heading_fmts):
+            ctx.n_line += 1
             continue
-        (label, label_content) = is_label(doc[n_line])
+        (label, label_content) = is_label(ctx, doc[ctx.n_line])
         if label:
-            if n_line + 1 < len(doc) and type(doc[n_line + 1]) is Tbl:
-                check_table(doc[n_line + 1], n_line + 1 - line_base)
-                if type(doc[n_line - 1]) is EmptyPara:
-                    if n_line + 2 < len(doc) and type(doc[n_line + 2]) is EmptyPara:
-                        ans.chapters[-1].append(Table(label_content))
-                        n_line += 3
-                        continue
-                    else:
-                        e = LackEmptyLineAfterError()
-                        e.pos = section_name, n_line - line_base + 1
-                        e.part = 'table'
-                        raise e
-                else:
-                    e = LackEmptyLineBeforeError()
-                    e.pos = section_name, n_line - line_base
-                    e.part = 'table'
-                    raise e
+            if doc.has(ctx.n_line + 1) and type(doc[ctx.n_line + 1]) is Tbl:
+                check_table(ctx, doc[ctx.n_line + 1], ctx.n_line + 1 - ctx.line_base)
+                if ans.chapters:
+                    ans.chapters[-1].append(Table(label_content))
+                ctx.n_line += check_float_gaps(ctx, doc, 'table')
+                continue
             else:
                 e = LackPictureorTableNearError()
-                e.pos = section_name, n_line - line_base + 1
+                e.pos = ctx.section_name, ctx.n_line - ctx.line_base + 1
                 e.part = 'table'
-                raise e
-        if is_picture(doc[n_line]):
-            check_picture(doc[n_line], n_line - line_base)
-            if n_line + 1 < len(doc) and is_label(doc[n_line + 1])[0]:
-                if type(doc[n_line - 1]) is EmptyPara:
-                    if n_line + 2 < len(doc) and type(doc[n_line + 2]) is EmptyPara:
-                        ans.chapters[-1].append(Picture(is_label(doc[n_line + 1])[1]))
-                        n_line += 3
-                        continue
-                    else:
-                        e = LackEmptyLineAfterError()
-                        e.pos = section_name, n_line - line_base + 1
-                        e.part = 'picture'
-                        raise e
-                else:
-                    e = LackEmptyLineBeforeError()
-                    e.pos = section_name, n_line - line_base
-                    e.part = 'picture'
-                    raise e
+                fail(e, ctx.errors)
+                ctx.n_line += 1
+                continue
+        if is_picture(doc[ctx.n_line]):
+            check_picture(ctx, doc[ctx.n_line], ctx.n_line - ctx.line_base)
+            if doc.has(ctx.n_line + 1) and is_label(ctx, doc[ctx.n_line + 1])[0]:
+                if ans.chapters:
+                    ans.chapters[-1].append(Picture(is_label(ctx, doc[ctx.n_line + 1])[1]))
+                ctx.n_line += check_float_gaps(ctx, doc, 'picture')
+                continue
             else:
                 e = LackLabelAfterError()
-                e.pos = section_name, n_line - line_base
+                e.pos = ctx.section_name, ctx.n_line - ctx.line_base
                 e.part = 'picture'
-                raise e
-        normal = is_normal(doc[n_line])
+                fail(e, ctx.errors)
+                ctx.n_line += 1
+                continue
+        normal = is_normal(ctx, doc[ctx.n_line])
         if normal:
-            ans.chapters[-1].append(Normal())
-            n_line += 1
+            if ans.chapters:
+                ans.chapters[-1].append(Normal())
+            ctx.n_line += 1
             continue
-        (conclusion_title, _) = is_conclusion_title(doc[n_line])
+        (conclusion_title, _) = is_conclusion_title(ctx, doc[ctx.n_line])
         if conclusion_title:
             break
         e = UnfamiliarPartError()
-        e.pos = section_name, n_line - line_base
-        raise e
+        e.pos = ctx.section_name, ctx.n_line - ctx.line_base
+        fail(e, ctx.errors)
+        ctx.n_line += 1
 
-    if n_line >= len(doc):
+    if not doc.has(ctx.n_line):
         e = LackPartError()
-        e.pos = section_name, n_line - line_base
+        e.pos = ctx.section_name, ctx.n_line - ctx.line_base
         e.part = 'conclusion title'
-        raise e
-    if type(doc[n_line - 1]) is not EmptyPara:
+        fail(e, ctx.errors)
+        return None, ctx.fmt
+    if type(doc[ctx.n_line - 1]) is not EmptyPara:
         e = LackEmptyLineBeforeError()
-        e.pos = section_name, n_line - line_base
+        e.pos = ctx.section_name, ctx.n_line - ctx.line_base
         e.part = 'conclusion title'
-        raise e
-    (_, conclusion_title_content) = is_conclusion_title(doc[n_line])
+        fail(e, ctx.errors)
+    (_, conclusion_title_content) = is_conclusion_title(ctx, doc[ctx.n_line])
     ans.conclusion_title = conclusion_title_content
-    n_line += 1
-    while n_line < len(doc) and not is_references_title(doc[n_line])[0]:
-        if type(doc[n_line]) is not EmptyPara and type(doc[n_line]) is not Break:
-            check_normal(doc[n_line], n_line - line_base)
-        n_line += 1
+    ctx.n_line += 1
+    while doc.has(ctx.n_line) and not is_references_title(ctx, doc[ctx.n_line])[0]:
+        if type(doc[ctx.n_line]) not in (EmptyPara, Break, MasterPage):
+            check_normal(ctx, doc[ctx.n_line], ctx.n_line - ctx.line_base)
+        ctx.n_line += 1
 
-    if n_line >= len(doc):
+    if not doc.has(ctx.n_line):
         e = LackPartError()
-        e.pos = section_name, n_line - line_base
+        e.pos = ctx.section_name, ctx.n_line - ctx.line_base
         e.part = 'references title'
-        raise e
-    if type(doc[n_line - 1]) is not EmptyPara:
+        fail(e, ctx.errors)
+        return None, ctx.fmt
+    if type(doc[ctx.n_line - 1]) is not EmptyPara:
         e = LackEmptyLineBeforeError()
-        e.pos = section_name, n_line - line_base
+        e.pos = ctx.section_name, ctx.n_line - ctx.line_base
         e.part = 'references title'
-        raise e
-    ans.references_title = is_references_title(doc[n_line])[1]
-    n_line += 1
-    while n_line < len(doc) and type(doc[n_line]) is not EmptyPara and type(doc[n_line]) is not Break:
-        reference_content = check_reference(doc[n_line])
+        fail(e, ctx.errors)
+    ans.references_title = is_references_title(ctx, doc[ctx.n_line])[1]
+    ctx.n_line += 1
+    while doc.has(ctx.n_line) and type(doc[ctx.n_line]) not in (EmptyPara, Break, MasterPage):
+        reference_content = check_reference(ctx, doc[ctx.n_line])
         ans.references.append(Reference(reference_content))
-        n_line += 1
-    while n_line < len(doc) and type(doc[n_line]) is EmptyPara or type(doc[n_line]) is Break:
-        n_line += 1
+        ctx.n_line += 1
+    while doc.has(ctx.n_line) and type(doc[ctx.n_line]) in (EmptyPara, Break):
+        ctx.n_line += 1
 
-    if n_line >= len(doc):
+    if not doc.has(ctx.n_line):
         e = LackPartError()
-        e.pos = section_name, n_line - line_base
+        e.pos = ctx.section_name, ctx.n_line - ctx.line_base
         e.part = 'appendix title'
-        raise e
-    n_line_r = len(doc) - 1
-    while n_line_r >= n_line and type(doc[n_line_r]) is EmptyPara or type(doc[n_line_r]) is Break:
-        n_line_r -= 1
-    while n_line_r >= n_line and not is_thanks_title(doc[n_line_r])[0]:
-        if type(doc[n_line_r]) is not EmptyPara and type(doc[n_line_r]) is not Break:
-            if not is_normal(doc[n_line_r]):
-                check_normal(doc[n_line_r], n_line_r - line_base)
+        fail(e, ctx.errors)
+        return None, ctx.fmt
+    # the last element that is not an empty line, found reading forward so a lazy document is read in order
+    n_line_r = ctx.n_line - 1
+    n_line_end = ctx.n_line
+    while doc.has(n_line_end):
+        if type(doc[n_line_end]) not in (EmptyPara, Break):
+            n_line_r = n_line_end
+        n_line_end += 1
+    while n_line_r >= ctx.n_line and not is_thanks_title(ctx, doc[n_line_r])[0]:
+        if type(doc[n_line_r]) not in (EmptyPara, Break, MasterPage):
+            if not is_normal(ctx, doc[n_line_r]):
+                check_normal(ctx, doc[n_line_r], n_line_r - ctx.line_base)
         n_line_r -= 1
-    if n_line_r < n_line:
+    if n_line_r < ctx.n_line:
         e = LackPartError()
-        e.pos = section_name, n_line_r - line_base
+        e.pos = ctx.section_name, n_line_r - ctx.line_base
         e.part = 'thanks title'
-        raise e
+        fail(e, ctx.errors)
+        return None, ctx.fmt
     if type(doc[n_line_r - 1]) is not EmptyPara:
         e = LackEmptyLineBeforeError()
-        e.pos = section_name, n_line_r - line_base
+        e.pos = ctx.section_name, n_line_r - ctx.line_base
         e.part = 'thanks title'
-        raise e
-    ans.thanks_title = is_thanks_title(doc[n_line_r])[1]
+        fail(e, ctx.errors)
+    ans.thanks_title = is_thanks_title(ctx, doc[n_line_r])[1]
     n_line_r -= 1
 
-    while n_line < n_line_r:
-        if type(doc[n_line]) is Break or type(doc[n_line]) is EmptyPara:
-            n_line += 1
+    while ctx.n_line < n_line_r:
+        if type(doc[ctx.n_line]) is Break or type(doc[ctx.n_line]) is EmptyPara:
+            ctx.n_line += 1
             continue
-        if type(doc[n_line]) is Tbl:
+        if type(doc[ctx.n_line]) is Tbl:
             e = LackLabelBeforeError()
-            e.pos = section_name, n_line - line_base
+            e.pos = ctx.section_name, ctx.n_line - ctx.line_base
             e.part = 'table'
-            raise e
-        if is_appendix_title(doc[n_line])[0]:
+            fail(e, ctx.errors)
+            ctx.n_line += 1
+            continue
+        if is_appendix_title(ctx, doc[ctx.n_line])[0]:
             ans.appendixes.append(Appendix())
-            ans.appendixes[-1].append(is_appendix_title(doc[n_line])[1])
-            n_line += 1
+            ans.appendixes[-1].append(is_appendix_title(ctx, doc[ctx.n_line])[1])
+            ctx.n_line += 1
             continue
-        (label, label_content) = is_label(doc[n_line])
+        (label, label_content) = is_label(ctx, doc[ctx.n_line])
         if label:
-            if n_line + 1 < len(doc) and type(doc[n_line + 1]) is Tbl:
-                check_table(doc[n_line + 1], n_line + 1 - line_base)
-                if type(doc[n_line - 1]) is EmptyPara:
-                    if n_line + 2 < len(doc) and type(doc[n_line + 2]) is EmptyPara:
-                        ans.appendixes[-1].append(Table(label_content))
-                        n_line += 3
-                        continue
-                    else:
-                        e = LackEmptyLineAfterError()
-                        e.pos = section_name, n_line - line_base + 1
-                        e.part = 'table'
-                        raise e
-                else:
-                    e = LackEmptyLineBeforeError()
-                    e.pos = section_name, n_line - line_base
-                    e.part = 'table'
-                    raise e
+            if doc.has(ctx.n_line + 1) and type(doc[ctx.n_line + 1]) is Tbl:
+                check_table(ctx, doc[ctx.n_line + 1], ctx.n_line + 1 - ctx.line_base)
+                if ans.appendixes:
+                    ans.appendixes[-1].append(Table(label_content))
+                ctx.n_line += check_float_gaps(ctx, doc, 'table')
+                continue
             else:
                 e = LackPictureorTableNearError()
-                e.pos = section_name, n_line - line_base + 1
+                e.pos = ctx.section_name, ctx.n_line - ctx.line_base + 1
                 e.part = 'table'
-                raise e
-        if is_picture(doc[n_line]):
-            check_picture(doc[n_line], n_line - line_base)
-            if n_line + 1 < len(doc) and is_label(doc[n_line + 1])[0]:
-                if type(doc[n_line - 1]) is EmptyPara:
-                    if n_line + 2 < len(doc) and type(doc[n_line + 2]) is EmptyPara:
-                        ans.appendixes[-1].append(Picture(is_label(doc[n_line + 1])[1]))
-                        n_line += 3
-                        continue
-                    else:
-                        e = LackEmptyLineAfterError()
-                        e.pos = section_name, n_line - line_base + 1
-                        e.part = 'picture'
-                        raise e
-                else:
-                    e = LackEmptyLineBeforeError()
-                    e.pos = section_name, n_line - line_base
-                    e.part = 'picture'
-                    raise e
+                fail(e, ctx.errors)
+                ctx.n_line += 1
+                continue
+        if is_picture(doc[ctx.n_line]):
+            check_picture(ctx, doc[ctx.n_line], ctx.n_line - ctx.line_base)
+            if doc.has(ctx.n_line + 1) and is_label(ctx, doc[ctx.n_line + 1])[0]:
+                if ans.appendixes:
+                    ans.appendixes[-1].append(Picture(is_label(ctx, doc[ctx.n_line + 1])[1]))
+                ctx.n_line += check_float_gaps(ctx, doc, 'picture')
+                continue
             else:
                 e = LackLabelAfterError()
-                e.pos = section_name, n_line - line_base
+                e.pos = ctx.section_name, ctx.n_line - ctx.line_base
                 e.part = 'picture'
-                raise e
-        normal = is_normal(doc[n_line])
+                fail(e, ctx.errors)
+                ctx.n_line += 1
+                continue
+        normal = is_normal(ctx, doc[ctx.n_line])
         if normal:
-            ans.appendixes[-1].append(Normal())
-            n_line += 1
+            if ans.appendixes:
+                ans.appendixes[-1].append(Normal())
+            ctx.n_line += 1
             continue
         e = UnfamiliarPartError()
-        e.pos = section_name, n_line - line_base
-        raise e
-    return ans, fmt
+        e.pos = ctx.section_name, ctx.n_line - ctx.line_base
+        fail(e, ctx.errors)
+        ctx.n_line += 1
+    return ans, ctx.fmt
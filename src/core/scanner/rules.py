@@ -0,0 +1,92 @@
+import threading
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+
+from core.comm import matches, inherent
+from core.pp.elements import Element, Para, Span
+from core.pp.properties import exact
+from core.scanner.formats import Formats, PureParaProp
+
+# (align, size, weight, name_asia) of a pure paragraph
+Signature = Tuple[Any, Any, Any, Any]
+
+PURE_PARTS = (
+    'label',
+    'keywords',
+    'keywords_en',
+    'conclusion_title',
+    'references_title',
+    'appendix_title',
+    'thanks_title',
+)
+
+
+class Rules:
+    parts: Tuple[Tuple[str, PureParaProp], ...]
+    default_fmt: PureParaProp
+    heading_names: Tuple[str, ...]
+    table: Dict[tuple, FrozenSet[str]]
+
+    def __init__(self, parts: Tuple[Tuple[str, PureParaProp], ...], default_fmt: PureParaProp):
+        self.parts = parts
+        self.default_fmt = default_fmt
+        self.heading_names = tuple(name for name, _ in parts if name.startswith('heading'))
+        self.table = {}
+
+    def signature(self, para: Element) -> Optional[Signature]:
+        # master pages, tables and breaks match no part
+        if not isinstance(para, Para) or len(para) != 1 or type(para[0]) is not Span:
+            return None
+        para_prop = inherent(para.prop, self.default_fmt.para_prop)
+        font = inherent(para[0].prop, self.default_fmt.text_prop).font
+        return para_prop.align, font.size, font.weight, font.name_asia
+
+    def lookup(self, para: Element) -> FrozenSet[str]:
+        sig = self.signature(para)
+        if sig is None:
+            return frozenset()
+        key = tuple(exact(value) for value in sig)
+        ans = self.table.get(key)
+        if ans is None:
+            ans = self.table[key] = self.candidates(sig)
+        return ans
+
+    def candidates(self, sig: Signature) -> FrozenSet[str]:
+        align, size, weight, name_asia = sig
+        ans = []
+        for name, pure_para_prop in self.parts:
+            if pure_para_prop.para_prop is not None and not matches(align, pure_para_prop.para_prop.align):
+                continue
+            if pure_para_prop.text_prop is not None and pure_para_prop.text_prop.font is not None:
+                font = pure_para_prop.text_prop.font
+                if not (matches(size, font.size) and matches(weight, font.weight)
+                        and matches(name_asia, font.name_asia)):
+                    continue
+            ans.append(name)
+        return frozenset(ans)
+
+
+def compile_rules(formats: Formats) -> Rules:
+    parts = tuple(('heading{}'.format(i), f) for i, f in enumerate(formats.heading_fmts)) + \
+        tuple((name, getattr(formats, name + '_fmt')) for name in PURE_PARTS)
+    # properties are interned, so equal templates give equal keys even when loaded separately
+    key = tuple((name, f.para_prop, f.text_prop) for name, f in parts) + \
+        ((formats.default_fmt.para_prop, formats.default_fmt.text_prop),)
+    return compile_cached(key, parts, formats.default_fmt)
+
+
+rules_cache: Dict[tuple, Rules] = {}
+compile_stats: Dict[str, int] = {'hits': 0, 'misses': 0}
+compile_lock = threading.Lock()
+
+
+def compile_cached(key: tuple, parts: Tuple[Tuple[str, PureParaProp], ...], default_fmt: PureParaProp) -> Rules:
+    with compile_lock:
+        ans = rules_cache.get(key)
+        if ans is None:
+            compile_stats['misses'] += 1
+            ans = rules_cache[key] = Rules(parts, default_fmt)
+            while len(rules_cache) > 32:
+                del rules_cache[next(iter(rules_cache))]
+        else:
+            compile_stats['hits'] += 1
+    return ans
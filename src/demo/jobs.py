@@ -0,0 +1,104 @@
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from typing import Optional, Dict
+
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from core import ctrl
+from .models import CheckJob, PaperConfig
+
+STOPPED = 'This file can\'t be checked!\nThe checking process stopped.'
+
+
+def run_check(document: bytes, yaml_str: str, compiled: Optional[bytes]) -> str:
+    # runs in a worker process; the config is parsed there once per distinct YAML text
+    report = ctrl.check(document, ctrl.load_config(yaml_str, compiled), collect_all=True)
+    return json.dumps(report.to_dict(), ensure_ascii=False)
+
+
+def claim_job() -> Optional[CheckJob]:
+    # the documents are read only for the job that was claimed
+    for pk in CheckJob.objects.filter(status=CheckJob.QUEUED).order_by('id').values_list('pk', flat=True)[:8]:
+        # only one worker can move a job out of the queue
+        if CheckJob.objects.filter(pk=pk, status=CheckJob.QUEUED) \
+                .update(status=CheckJob.RUNNING, claimed=timezone.now(), attempts=F('attempts') + 1) == 1:
+            return CheckJob.objects.get(pk=pk)
+    return None
+
+
+def requeue_stale_jobs(stale_after: float, max_attempts: int) -> int:
+    # workers refresh the claims of the jobs they run, so a job claimed long ago lost its worker
+    deadline = timezone.now() - timedelta(seconds=stale_after)
+    stale = CheckJob.objects.filter(status=CheckJob.RUNNING, claimed__lt=deadline)
+    stale.filter(attempts__gte=max_attempts) \
+        .update(status=CheckJob.FAILED, result=STOPPED, document=None, finished=timezone.now())
+    return stale.update(status=CheckJob.QUEUED, claimed=None)
+
+
+def requeue_job(job: CheckJob, max_attempts: int):
+    # a job that keeps stopping its checking process is likely the one that stops it
+    if job.attempts >= max_attempts:
+        finish_job(job, CheckJob.FAILED, STOPPED)
+    else:
+        CheckJob.objects.filter(pk=job.pk).update(status=CheckJob.QUEUED, claimed=None)
+
+
+def finish_job(job: CheckJob, status: str, result: str):
+    CheckJob.objects.filter(pk=job.pk).update(status=status, result=result, document=None, finished=timezone.now())
+
+
+def submit_job(pool: ProcessPoolExecutor, job: CheckJob) -> Optional[Future]:
+    try:
+        paper_config = PaperConfig.objects.get(owner=job.owner, type=job.type)
+    except PaperConfig.DoesNotExist:
+        finish_job(job, CheckJob.FAILED, 'No configuration for {} of {}.'.format(job.type, job.owner))
+        return None
+    compiled = bytes(paper_config.compiled) if paper_config.compiled is not None else None
+    return pool.submit(run_check, bytes(job.document), paper_config.config, compiled)
+
+
+def run_worker(workers: int, interval: float = 1.0, once: bool = False, stale_after: float = 300.0,
+               max_attempts: int = 3):
+    pool = ProcessPoolExecutor(workers)
+    running: Dict[Future, CheckJob] = {}
+    try:
+        while True:
+            close_old_connections()
+            if len(running) > 0:
+                CheckJob.objects.filter(pk__in=[job.pk for job in running.values()]).update(claimed=timezone.now())
+            requeue_stale_jobs(stale_after, max_attempts)
+            while len(running) < workers:
+                job = claim_job()
+                if job is None:
+                    break
+                future = submit_job(pool, job)
+                if future is not None:
+                    running[future] = job
+            if len(running) == 0:
+                if once:
+                    return
+                time.sleep(interval)
+                continue
+            done, _ = wait(running, timeout=interval, return_when=FIRST_COMPLETED)
+            if any(isinstance(future.exception(), BrokenProcessPool) for future in done):
+                # a worker process died, which breaks the pool and every job still in it; those jobs are
+                # queued again, since only one of them may have caused it
+                done, _ = wait(running)
+                pool.shutdown(wait=False)
+                pool = ProcessPoolExecutor(workers)
+            for future in done:
+                job = running.pop(future)
+                try:
+                    finish_job(job, CheckJob.DONE, future.result())
+                except BrokenProcessPool:
+                    requeue_job(job, max_attempts)
+                except Exception as e:
+                    result = 'This file can\'t be checked!\n{}: {}'.format(type(e).__name__, e)
+                    finish_job(job, CheckJob.FAILED, result)
+    finally:
+        pool.shutdown()
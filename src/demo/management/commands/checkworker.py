@@ -0,0 +1,22 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from demo import jobs
+
+
+class Command(BaseCommand):
+    help = 'Run queued check jobs in a pool of worker processes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='worker processes')
+        parser.add_argument('--interval', type=float, default=1.0, help='seconds between polls of an empty queue')
+        parser.add_argument('--once', action='store_true', help='exit when the queue is empty')
+        parser.add_argument('--stale-after', type=float, default=300.0,
+                            help='seconds after which a running job whose worker stopped is queued again')
+        parser.add_argument('--max-attempts', type=int, default=3,
+                            help='times a job whose checking process stopped is run before it fails')
+
+    def handle(self, *args, **options):
+        jobs.run_worker(options['jobs'], options['interval'], options['once'], options['stale_after'],
+                        options['max_attempts'])
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('demo', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paperconfig',
+            name='compiled',
+            field=models.BinaryField(editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 19:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('demo', '0003_checkjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='checkjob',
+            name='claimed',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 20:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('demo', '0004_checkjob_claimed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paperconfig',
+            name='digest',
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+    ]
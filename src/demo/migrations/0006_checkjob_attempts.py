@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 21:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('demo', '0005_paperconfig_digest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='checkjob',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.db import models
 
+from core import ctrl
+
 
 # Create your models here.
 
@@ -7,3 +9,51 @@ class PaperConfig(models.Model):
     owner = models.CharField(max_length=1024)
     type = models.CharField(max_length=1024)
     config = models.TextField(max_length=21844)
+    # config compiled by ctrl.compile_config and the digest of its YAML, refreshed on every save
+    compiled = models.BinaryField(null=True, editable=False)
+    digest = models.CharField(max_length=64, null=True, editable=False)
+
+    def save(self, *args, **kwargs):
+        self.compiled = ctrl.compile_config(self.config)
+        self.digest = ctrl.config_digest(self.config)
+        super().save(*args, **kwargs)
+
+
+class CheckJob(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = [
+        (QUEUED, 'queued'),
+        (RUNNING, 'running'),
+        (DONE, 'done'),
+        (FAILED, 'failed'),
+    ]
+
+    owner = models.CharField(max_length=1024)
+    type = models.CharField(max_length=1024)
+    status = models.CharField(max_length=16, choices=STATUSES, default=QUEUED, db_index=True)
+    # the uploaded DOCX, dropped once the job has finished
+    document = models.BinaryField(null=True)
+    result = models.TextField(blank=True, default='')
+    created = models.DateTimeField(auto_now_add=True)
+    # when a worker claimed the job, refreshed while it runs
+    claimed = models.DateTimeField(null=True)
+    # how many times a worker has claimed the job
+    attempts = models.PositiveIntegerField(default=0)
+    finished = models.DateTimeField(null=True)
+
+
+def get_config(owner: str, type: str) -> ctrl.Config:
+    # configs are cached by the digest of their YAML, which is read on every call, so a config saved
+    # by another server process is picked up at once
+    pk, digest = PaperConfig.objects.filter(owner=owner, type=type).values_list('pk', 'digest').get()
+    config = ctrl.cached_config(digest) if digest is not None else None
+    if config is None:
+        paper_config = PaperConfig.objects.get(pk=pk)
+        if paper_config.compiled is None or paper_config.digest is None:
+            # configs saved before they were compiled are compiled on first use
+            paper_config.save(update_fields=['compiled', 'digest'])
+        config = ctrl.load_config(paper_config.config, bytes(paper_config.compiled))
+    return config
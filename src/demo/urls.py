@@ -4,4 +4,8 @@ from . import views
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('cache-stats/', views.cache_stats, name='cache_stats'),
+    path('check/', views.check_async, name='check'),
+    path('jobs/', views.submit, name='submit'),
+    path('jobs/<int:job_id>/', views.job, name='job'),
 ]
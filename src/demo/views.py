@@ -1,21 +1,60 @@
-from django.http import HttpResponseRedirect, HttpResponse
+import asyncio
+import json
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Union, BinaryIO, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.http import HttpResponse, JsonResponse, HttpResponseNotAllowed, HttpResponseBadRequest
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.shortcuts import render
+from django.utils.html import escape
 from .forms import UploadFileForm
-from utils import name_split, transport
 from core import ctrl
+from core.cache import ResultCache, MemoryStore, SQLiteStore
+from core.result import Report, unreadable
+from core.pp.engines.docx_stream import ElementMemo
 
-from .models import PaperConfig
+from .models import CheckJob, get_config
 
 
 # Create your views here.
 
+# reports of documents seen before, by document and config hash
+result_cache = ResultCache(
+    SQLiteStore(settings.RESULT_CACHE_PATH) if getattr(settings, 'RESULT_CACHE_PATH', None) else MemoryStore()
+)
+# paragraphs and tables of earlier uploads, so parsing a resubmission only builds what was edited;
+# the whole document is still checked
+element_memo = ElementMemo()
+# for the async view: checks run in these processes, at most CHECK_QUEUE_LIMIT accepted at a time
+check_executor: Optional[ProcessPoolExecutor] = None
+checks_in_flight = 0
+# requests may be served on several threads, each with its own event loop
+checks_lock = threading.Lock()
+
+
+def upload_source(f: UploadedFile) -> Union[str, BinaryIO]:
+    # Django spools big uploads into a unique temporary file and keeps small ones in memory
+    if hasattr(f, 'temporary_file_path'):
+        return f.temporary_file_path()
+    f.seek(0)
+    return f.file
 
-def handle_uploaded_file(f):
-    filename = '/tmp/tmp.' + name_split.main(f.name)[0][1]
-    with open(filename, 'wb+') as destination:
-        for chunk in f.chunks():
-            destination.write(chunk)
 
+def render_report(request, report: Report) -> HttpResponse:
+    # ?format=json gives the violations as data instead of a page
+    if request.GET.get('format') == 'json':
+        return JsonResponse(report.to_dict(), json_dumps_params={'ensure_ascii': False})
+    return HttpResponse(escape(report.text()).replace('\n', '\n<br/>'))
+
+
+def handle_uploaded_file(f: UploadedFile) -> Report:
     # with open('config.yaml', 'r') as file:
     #     yaml: str = file.read()
     #     PaperConfig(
@@ -23,18 +62,120 @@ def handle_uploaded_file(f):
     #         type='Bachelor\'s Thesis',
     #         config=yaml,
     #     ).save()
-    config: str = PaperConfig.objects.get(
+    config = get_config(
         owner='Beijing Institution of Technology',
         type='Bachelor\'s Thesis',
-    ).config
-    return ctrl.main(filename, config).replace('\n', '\n<br/>')
+    )
+    try:
+        return ctrl.check(upload_source(f), config, collect_all=True, cache=result_cache, memo=element_memo)
+    except Exception as e:
+        return unreadable(e)
 
 
 def index(request):
     if request.method == 'POST':
         form = UploadFileForm(request.POST, request.FILES)
         if form.is_valid():
-            return HttpResponse(handle_uploaded_file(request.FILES['file']))
+            return render_report(request, handle_uploaded_file(request.FILES['file']))
     else:
         form = UploadFileForm()
     return render(request, 'demo/index.html', {'form': form})
+
+
+def cache_stats(request):
+    return JsonResponse(result_cache.stats())
+
+
+def submit(request):
+    # queues the upload for the checkworker command and answers at once
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    form = UploadFileForm(request.POST, request.FILES)
+    if not form.is_valid():
+        return HttpResponseBadRequest('No file uploaded.')
+    f: UploadedFile = request.FILES['file']
+    f.seek(0)
+    job = CheckJob.objects.create(
+        owner='Beijing Institution of Technology',
+        type='Bachelor\'s Thesis',
+        document=f.read(),
+    )
+    return JsonResponse({'id': job.pk, 'status': job.status, 'url': reverse('job', args=[job.pk])}, status=202)
+
+
+def job(request, job_id: int):
+    job = get_object_or_404(CheckJob.objects.defer('document'), pk=job_id)
+    ans = {'id': job.pk, 'status': job.status}
+    if job.status == CheckJob.DONE:
+        ans['result'] = json.loads(job.result)
+    elif job.status == CheckJob.FAILED:
+        ans['error'] = job.result
+    return JsonResponse(ans)
+
+
+def get_check_executor() -> ProcessPoolExecutor:
+    global check_executor
+    with checks_lock:
+        if check_executor is None:
+            # spawned workers only import core, not the server with its threads and event loop
+            check_executor = ProcessPoolExecutor(settings.CHECK_WORKERS,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+        return check_executor
+
+
+def drop_check_executor(executor: ProcessPoolExecutor):
+    # a worker process that died breaks the pool for good, so the next check starts a new one
+    global check_executor
+    with checks_lock:
+        if check_executor is executor:
+            check_executor = None
+    executor.shutdown(wait=False)
+
+
+def start_check() -> bool:
+    # the limit holds per server process; every worker process of the server has its own count
+    global checks_in_flight
+    with checks_lock:
+        if checks_in_flight >= settings.CHECK_QUEUE_LIMIT:
+            return False
+        checks_in_flight += 1
+        return True
+
+
+def end_check():
+    global checks_in_flight
+    with checks_lock:
+        checks_in_flight -= 1
+
+
+async def check_async(request):
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    if not start_check():
+        response = HttpResponse('Too many papers are being checked now. Please try again later.', status=429)
+        response['Retry-After'] = '10'
+        return response
+    try:
+        files = await sync_to_async(lambda: request.FILES)()
+        if 'file' not in files:
+            return HttpResponseBadRequest('No file uploaded.')
+        source = upload_source(files['file'])
+        if not isinstance(source, str):
+            source = source.read()
+        config = await sync_to_async(get_config)(
+            owner='Beijing Institution of Technology',
+            type='Bachelor\'s Thesis',
+        )
+        executor = get_check_executor()
+        try:
+            ans = await asyncio.get_running_loop().run_in_executor(executor, ctrl.check, source, config, True)
+        except BrokenProcessPool:
+            drop_check_executor(executor)
+            response = HttpResponse('The paper could not be checked now. Please try again later.', status=503)
+            response['Retry-After'] = '10'
+            return response
+        except Exception as e:
+            ans = unreadable(e)
+    finally:
+        end_check()
+    return render_report(request, ans)